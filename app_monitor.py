@@ -1,90 +1,179 @@
+import time
+_process_started = time.perf_counter() # Start of the "imports" phase for --profile-startup
+import sys
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk, simpledialog
 import os
+import logging
 import threading
-import time
-from AppKit import NSWorkspace, NSObject
-from Foundation import NSLog
-from playsound import playsound
 from functools import partial # Added for callbacks with arguments
-import json
+import queue
+from startup_profile import StartupProfiler
+from log_pipeline import LogPipeline, console_handler, system_log_handler
+from audio_cache import SoundDecodeError
+from playback import mark_audio_started, mark_decoded
+from replacements import (ReplacementTransaction, backup_path_for, has_backup_conflict,
+                          REVERT_RESTORED, REVERT_BACKUP_MISSING, REVERT_ORIGINAL_PRESENT)
+from sound_library import FuzzyIndex
+from sound_metadata import describe as describe_sound_metadata
+from replacer_core import SoundReplacerCore, list_sound_files, APP_CONFIG_FILE, SOUNDS_DIR
+_imports_finished = time.perf_counter()
+
+# AppKit, Foundation and playsound are imported on first use (see play_sound_thread and
+# play_decoded_sound), so loading PyObjC stays off the path to the first window.
+logger = logging.getLogger("sound_replacer.gui")
+# Log records are only queued by the calling thread; a listener thread writes them to the
+# log file, the terminal and NSLog (see log_pipeline.py and start_logging())
+log_pipeline = LogPipeline()
+
+
+# Per-phase startup timings, printed by --profile-startup
+startup_profiler = StartupProfiler(started=_process_started)
+
+# Config, journal, scanning, replacements and launch monitoring live in the GUI-free core,
+# shared with sound_replacer_cli.py. Its state dicts are only mutated in place, so these names stay valid.
+core = SoundReplacerCore()
 
 # Global state
-monitored_apps = {}  # {"app_path": "sound_file_name.mp3"}
-sound_files = []
+monitored_apps = core.monitored_apps  # {"app_path": "sound_file_name.mp3"}
+sound_files = [] # Sounds under SOUNDS_DIR, relative to it (nested packs included), sorted
+sound_file_set = set(sound_files)
+sound_search_index = FuzzyIndex(sound_files) # Type-ahead search for the launch-sound comboboxes
 symlink_ui_sections = {} # Replaces symlink_row_data and dynamic_symlink_ui_container
-applied_file_modifications = {} # Stores info about direct file symlinks: {"original_path": {"backup_path": "...", "target_linked_to": "..."}}
-app_default_symlink_sources = {} # NEW: {"app_path": "default_source_sound_for_symlinks.wav"}
-
-APP_CONFIG_FILE = "app_monitor_config.json"
-SOUNDS_DIR = "sounds"
+applied_file_modifications = core.applied_file_modifications # Stores info about direct file symlinks: {"original_path": {"backup_path": "...", "target_linked_to": "..."}}, indexed per app
+app_default_symlink_sources = core.app_default_symlink_sources # NEW: {"app_path": "default_source_sound_for_symlinks.wav"}
+playback_settings = core.playback_settings # Tunables for sound playback, persisted in the config file
+scan_settings = core.scan_settings # Bundle scanner tunables, persisted in the config file
+transcode_settings = core.transcode_settings # Converting targets to the replaced sound's format, see transcode.py
+
+# Decoded PCM for launch sounds and previews, so repeated plays skip the disk and decoder
+sound_cache = core.sound_cache
+sound_inventory = core.sound_inventory
+replacement_journal = core.replacement_journal
+config_saver = core.config_saver
+# Dispatch path shared by every launch source (and by benchmarks using a scripted source)
+launch_dispatcher = core.launch_dispatcher
 
 # Global reference for the main notebook
 app_notebook = None
+app_tabs = {} # {"app_path": {"frame": tab_frame, "populated": bool, "widgets": {...}}}, see update_app_list()
+info_tab_frame = None # Shown in place of app tabs when nothing is monitored
+match_format_var = None # "Convert to Original's Format" checkbox, mirrors transcode_settings["match_format"]
+health_summary_label = None # Result of the last replacement health check, next to the top buttons
+
+HEALTH_STATE_LABELS = { # Status column text per replacements.STATE_*
+    "healthy": "OK",
+    "broken_target": "Target missing",
+    "overwritten": "Overwritten",
+    "missing": "File missing",
+    "orphaned_backup": "Orphaned backup",
+    "backup_missing": "No backup",
+    "unchecked": "Not checked",
+}
+
+# --- App Launch Monitoring ---
+def start_playback_executor():
+    """Starts the playback worker pool using the current playback_settings.
+
+    Sounds go through the in-process mixer when it can open the output
+    device, and through play_sound_thread (NSSound/playsound) otherwise.
+    The mixer is opened off the Tk thread: by start_audio_mixer_async()
+    after the first tab is drawn, or by whichever sound comes first.
+    """
+    return core.start_playback(play_launch_sound)
 
-# --- macOS Specific App Monitoring ---
-class AppDelegate(NSObject):
-    def applicationDidLaunch_(self, notification):
-        app_info = notification.userInfo()
-        launched_app_path = app_info.get('NSApplicationPath')
-        launched_app_name = app_info.get('NSApplicationName')
-        # NSLog(f"App launched: {launched_app_name} at {launched_app_path}")
-
-        if launched_app_path in monitored_apps:
-            sound_to_play = monitored_apps[launched_app_path]
-            full_sound_path = os.path.join(SOUNDS_DIR, sound_to_play)
-            NSLog(f"Monitored app launched: {launched_app_name}. Playing sound: {full_sound_path}")
-            try:
-                # Run playsound in a separate thread to avoid blocking GUI or notification handler
-                threading.Thread(target=play_sound_thread, args=(full_sound_path,), daemon=True).start()
-            except Exception as e:
-                NSLog(f"Error playing sound {full_sound_path}: {e}")
-                # Optionally show a GUI error if critical, but NSLog might be enough for background task
-                # messagebox.showerror("Sound Error", f"Could not play sound for {launched_app_name}: {e}")
 
+def start_audio_mixer_async():
+    """Imports NumPy/sounddevice and opens the output stream on a worker thread, ready for the first sound."""
+    threading.Thread(target=core.start_audio_mixer, name="audio-mixer-start", daemon=True).start()
 
-def play_sound_thread(sound_path):
+
+def play_launch_sound(sound_path):
+    if core.start_audio_mixer() is not None: # Waits for start_audio_mixer_async() if it is still opening
+        play_mixed_sound(sound_path)
+    else:
+        play_sound_thread(sound_path)
+
+
+def enqueue_sound(sound_path):
+    """Queues a sound on the playback pool. Returns False if the overflow policy dropped it."""
+    start_playback_executor()
+    return core.enqueue_sound(sound_path)
+
+
+def shutdown_playback_executor(timeout=1.0):
+    """Stops the playback pool; called from on_closing."""
+    core.shutdown_playback(timeout)
+
+
+def play_mixed_sound(sound_path):
     try:
-        playsound(sound_path)
+        core.play_mixed(sound_path)
+    except SoundDecodeError as e:
+        logger.warning("Mixer could not decode %s, falling back to playsound: %s", sound_path, e)
+        play_sound_thread(sound_path)
     except Exception as e:
-        NSLog(f"playsound error in thread: {e}")
-        # Consider how to report this error if necessary, maybe a log file or a status bar update
+        logger.error("Mixer error playing %s: %s", sound_path, e)
+        raise # Counted as a failed playback
 
-def start_app_monitoring():
-    # This function needs to run the Cocoa event loop without blocking Tkinter.
-    # Typically, this is done by running it in a separate thread.
-    try:
-        delegate = AppDelegate.alloc().init()
-        nc = NSWorkspace.sharedWorkspace().notificationCenter()
-        nc.addObserver_selector_name_object_(
-            delegate,
-            "applicationDidLaunch:",
-            "NSWorkspaceDidLaunchApplicationNotification",
-            None
-        )
-        NSLog("App monitoring started.")
-        # Keep this thread alive to process notifications
-        # This part is tricky as NSApplication.sharedApplication().run() would block.
-        # For background notifications, just adding the observer might be enough
-        # if the main application (Python script) is running an event loop (like Tkinter's).
-        # However, for robust ObjC event processing, a dedicated run loop is usually needed.
-        # Let's test if notifications are received without an explicit run loop in this thread.
-        # If not, we might need to use Foundation.NSRunLoop.currentRunLoop().run()
-        # or similar, but that would block the thread.
-        # A common pattern is to have the ObjC part run its own loop in a thread.
-        # For now, we assume adding the observer starts the machinery.
-        # Keeping the thread alive might be needed if the observer gets GC'd.
-        # For PyObjC, the main Python script's lifecycle often keeps objects alive.
-        while True: # Keep thread alive to ensure delegate isn't garbage collected prematurely.
-            time.sleep(10) # Check periodically or just keep thread running.
-                           # This is not ideal; proper ObjC runloop integration is better.
 
+def play_sound_thread(sound_path):
+    try:
+        decoded = sound_cache.get(sound_path)
+    except (OSError, SoundDecodeError) as e:
+        logger.warning("Sound cache could not decode %s, falling back to playsound: %s", sound_path, e)
+        decoded = None
+    mark_decoded() # For the launch latency metrics; a no-op outside the playback pool
+    try:
+        if decoded is not None:
+            play_decoded_sound(decoded)
+        else:
+            from playsound import playsound
+            mark_audio_started() # playsound blocks until the end, so this is as close as we get
+            playsound(sound_path)
+    except Exception as e:
+        logger.error("playsound error in thread: %s", e)
+        raise # Counted as a failed playback
+
+
+def play_decoded_sound(decoded):
+    """Plays already-decoded PCM through NSSound without touching the original file."""
+    from AppKit import NSSound
+    from Foundation import NSData
+    wav_bytes = decoded.to_wav_bytes()
+    data = NSData.dataWithBytes_length_(wav_bytes, len(wav_bytes))
+    sound = NSSound.alloc().initWithData_(data)
+    if sound is None:
+        raise RuntimeError(f"NSSound could not load decoded audio for {decoded.path}")
+    sound.play()
+    mark_audio_started()
+    # Like playsound, block this worker thread until the sound has finished.
+    time.sleep(decoded.duration)
+
+
+def warm_sound_cache():
+    """Decodes assigned launch sounds, then the rest of SOUNDS_DIR, into the sound cache."""
+    assigned = [os.path.join(SOUNDS_DIR, name) for name in set(monitored_apps.values()) if name and name != "None"]
+    library = [os.path.join(SOUNDS_DIR, name) for name in sound_files]
+    loaded = sound_cache.preload(assigned, evict=True)
+    loaded += sound_cache.preload(library)
+    logger.info("Sound cache warmed with %s sound(s): %s", loaded, sound_cache.stats())
+
+def start_app_monitoring(source=None):
+    """Starts the launch-event source on its own thread (with its own run loop on macOS)."""
+    try:
+        core.start_monitoring(source)
+        logger.info("App monitoring started (%s).", core.launch_source.name)
     except Exception as e:
-        NSLog(f"Failed to start app monitoring: {e}")
+        logger.error("Failed to start app monitoring: %s", e)
         # Fallback or error message to user
         # messagebox.showerror("Monitoring Error", f"Could not start app monitoring: {e}")
 
 
+def stop_app_monitoring():
+    core.stop_monitoring()
+
+
 def preview_sound(sound_path_or_name, parent_for_dialog):
     """Plays the given sound file. Handles relative paths from SOUNDS_DIR and absolute paths."""
     if not sound_path_or_name or sound_path_or_name == "None" or sound_path_or_name == "Not Set" or sound_path_or_name == "<Browse for target>":
@@ -102,11 +191,11 @@ def preview_sound(sound_path_or_name, parent_for_dialog):
         messagebox.showerror("File Not Found", f"The sound file was not found:\n{full_sound_path}", parent=parent_for_dialog)
         return
     
-    NSLog(f"Attempting to preview sound: {full_sound_path}")
+    logger.debug("Attempting to preview sound: %s", full_sound_path)
     try:
-        threading.Thread(target=play_sound_thread, args=(full_sound_path,), daemon=True).start()
+        enqueue_sound(full_sound_path)
     except Exception as e:
-        NSLog(f"Error trying to start preview thread for {full_sound_path}: {e}")
+        logger.error("Error trying to queue preview for %s: %s", full_sound_path, e)
         messagebox.showerror("Preview Error", f"Could not play sound: {e}", parent=parent_for_dialog)
 
 # --- Symlinking Feature Functions ---
@@ -121,17 +210,12 @@ def preview_sound(sound_path_or_name, parent_for_dialog):
 # --- New Symlinking Feature: From Custom Folder (Helper) ---
 # Modified to return list of sounds instead of showing UI
 def get_sounds_from_custom_folder(folder_path):
-    potential_sounds = []
     try:
-        for item in os.listdir(folder_path):
-            full_item_path = os.path.join(folder_path, item)
-            if item.lower().endswith((".wav", ".mp3", ".aiff", ".m4a")) and os.path.isfile(full_item_path):
-                potential_sounds.append(full_item_path)
-    except Exception as e:
+        return list_sound_files(folder_path)
+    except OSError as e:
         # Removed parent=root as this is now a utility function
         messagebox.showerror("Error", f"Could not read folder contents: {e}") 
         return []
-    return potential_sounds
 
 # --- Symlink Creation UI and Logic (New/Refactored) ---
 
@@ -180,54 +264,47 @@ def handle_save_symlink(row_index):
     if not messagebox.askyesno("Confirm Action", confirm_message, parent=root):
         return
 
-    backup_path = original_path + ".bak"
+    overwrite_backup = False
+    if has_backup_conflict(original_path):
+        if not messagebox.askyesno("Overwrite Backup?", 
+                                 f"Backup file {backup_path_for(original_path)} already exists. Overwrite it?", 
+                                 parent=root):
+            return
+        overwrite_backup = True
 
+    core.suspend_watch([original_path]) # Keep the bundle watcher off this file until it is recorded
+    txn = ReplacementTransaction(journal=replacement_journal)
     try:
-        # Handle existing original_path (file or symlink) and backup
-        if os.path.islink(original_path):
-            # If original_path is already a symlink, just remove it before creating the new one.
-            # No backup of the symlink itself is typically needed.
-            os.remove(original_path)
-            NSLog(f"Removed existing symlink at: {original_path}")
-        elif os.path.exists(original_path):
-            # If original_path is a file, attempt to back it up.
-            if os.path.exists(backup_path):
-                if not messagebox.askyesno("Overwrite Backup?", 
-                                         f"Backup file {backup_path} already exists. Overwrite it?", 
-                                         parent=root):
-                    return
-                os.remove(backup_path)
-                NSLog(f"Removed existing backup: {backup_path}")
-            os.rename(original_path, backup_path)
-            NSLog(f"Backed up {original_path} to {backup_path}")
-
-        # Create the new symlink
-        os.symlink(target_path, original_path)
+        # Back up original_path (or drop an existing symlink there) and create the new symlink, journalled
+        record = txn.apply(original_path, target_path, overwrite_backup=overwrite_backup)
+        txn.commit()
         messagebox.showinfo("Success", 
-                            f"Successfully applied symlink:\\n{original_path} \\n-> {target_path}\\n\\nOriginal file backed up as: {os.path.basename(backup_path)}", 
+                            f"Successfully applied symlink:\\n{original_path} \\n-> {target_path}\\n\\nOriginal file backed up as: {os.path.basename(record['backup_path'])}", 
                             parent=root)
-        NSLog(f"Symlink created: {original_path} -> {target_path}")
+        logger.info("Symlink created: %s -> %s", original_path, target_path)
 
         # Record the modification
-        applied_file_modifications[original_path] = {
-            "backup_path": backup_path,
-            "target_linked_to": target_path
-        }
-        save_config() # Save config immediately after successful modification
-        NSLog(f"Recorded symlink: {original_path} -> {target_path}")
+        applied_file_modifications[original_path] = record
+        save_config(on_saved=txn.finish) # Finish the journal entry once the record is on disk
+        core.recheck_health([original_path])
+        core.refresh_bundle_watch()
+        logger.debug("Recorded symlink: %s -> %s", original_path, target_path)
 
         # Note: We no longer need to call load_sound_files() here unless original_path was in SOUNDS_DIR
         # and we want to refresh that view for some reason. The primary action is modifying the original file path.
 
     except Exception as e:
+        txn.rollback()
         messagebox.showerror("Symlink Error", f"Could not apply symlink: {e}\\n\\nEnsure you have permissions to modify the original file location.", parent=root)
-        NSLog(f"Error applying symlink: {e}")
+        logger.error("Error applying symlink: %s", e)
+    finally:
+        core.resume_watch([original_path])
 
 def display_sounds_for_symlinking(original_sound_paths):
     global sections_host_frame_ref, root
 
     if sections_host_frame_ref is None:
-        NSLog("Error: sections_host_frame_ref is not initialized in setup_gui.")
+        logger.error("Error: sections_host_frame_ref is not initialized in setup_gui.")
         messagebox.showerror("UI Error", "Symlink UI container not ready.", parent=root)
         return
 
@@ -282,88 +359,140 @@ def display_sounds_for_symlinking(original_sound_paths):
     # sections_host_frame_ref.master.event_generate("<Configure>") # OBSOLETE, sections_host_frame_ref is removed
 
 # --- Sound Management ---
-def load_sound_files():
-    global sound_files
+def list_sound_library():
+    """Lists SOUNDS_DIR and its subfolders without touching Tk, so it can run on a worker thread.
+
+    Only folders that changed since the last run are re-listed (see sound_library.py).
+    Returns (created, names): created is True if the folder had to be made.
+    Raises OSError if it cannot be read.
+    """
     if not os.path.exists(SOUNDS_DIR):
         os.makedirs(SOUNDS_DIR)
+        return True, []
+    names = core.refresh_library()
+    logger.debug("Found %s sound(s) in %s", len(names), os.path.abspath(SOUNDS_DIR))
+    return False, names
+
+
+def apply_sound_library(created, names, error=None, announce=True):
+    """Tk side of loading the sound library: stores the list, reports problems, updates the dropdowns.
+
+    announce=False (library changes picked up while running) skips the dialogs.
+    """
+    global sound_files, sound_file_set, sound_search_index
+    sound_files = names
+    sound_file_set = set(names)
+    sound_search_index = FuzzyIndex(names)
+    if error is not None:
+        messagebox.showerror("Sound Load Error", f"Error loading sounds from '{SOUNDS_DIR}': {error}")
+        logger.error("Exception in load_sound_files: %s", error)
+    elif created and announce:
         messagebox.showinfo("Sounds Folder Created",
-                            f"A '{SOUNDS_DIR}' folder has been created. Please add your sound files (e.g., .mp3, .wav) there and restart.")
-        sound_files = []
-        return
+                            f"A '{SOUNDS_DIR}' folder has been created. Please add your sound files (e.g., .mp3, .wav, .aiff, .m4a) there; they are picked up automatically.")
+    elif not sound_files and announce:
+        messagebox.showwarning("No Sounds Found", f"No .mp3, .wav, .aiff or .m4a files found in the '{SOUNDS_DIR}' directory or its subfolders.")
+    update_sound_dropdown()
+
 
-    print(f"[Debug] Checking for sounds in: {os.path.abspath(SOUNDS_DIR)}")
+def start_library_watching(root_window):
+    """Picks up sounds added to, removed from or renamed in SOUNDS_DIR while the app runs."""
+    changes = queue.Queue()
     try:
-        all_items = os.listdir(SOUNDS_DIR)
-        print(f"[Debug] Items found in '{SOUNDS_DIR}': {all_items}")
-        sound_files = [
-            f for f in all_items
-            if os.path.isfile(os.path.join(SOUNDS_DIR, f)) and
-               (f.lower().endswith(".mp3") or f.lower().endswith(".wav"))
-        ]
-        print(f"[Debug] Filtered sound files: {sound_files}")
-        if not sound_files:
-            messagebox.showwarning("No Sounds Found", f"No .mp3 or .wav files found in the '{SOUNDS_DIR}' directory. Please ensure files have .mp3 or .wav extensions (case-insensitive).")
+        watcher = core.start_library_watch(changes.put)
     except Exception as e:
-        messagebox.showerror("Sound Load Error", f"Error loading sounds from '{SOUNDS_DIR}': {e}")
-        print(f"[Debug] Exception in load_sound_files: {e}")
-        sound_files = []
-    update_sound_dropdown()
+        logger.warning("Failed to watch the sounds folder: %s", e)
+        return
+
+    def _poll():
+        names = None
+        try:
+            while True:
+                names = changes.get_nowait() # Only the latest listing matters
+        except queue.Empty:
+            pass
+        if names is not None:
+            added = sorted(set(names) - sound_file_set)
+            logger.info("Sound library changed: %s sound(s), %s new", len(names), len(added))
+            apply_sound_library(False, names, announce=False)
+            core.index_sounds([os.path.join(SOUNDS_DIR, name) for name in added])
+        if core.library_watcher is watcher:
+            root_window.after(250, _poll)
+
+    root_window.after(250, _poll)
+
+
+def load_sound_files():
+    try:
+        created, names = list_sound_library()
+    except OSError as e:
+        apply_sound_library(False, [], e)
+        return
+    apply_sound_library(created, names)
+
+
+def load_sound_files_async(widget, on_loaded=None):
+    """Lists the sound library on a worker thread and applies it on the Tk thread (polled via widget.after)."""
+    results = queue.Queue()
+
+    def _worker():
+        try:
+            results.put(list_sound_library() + (None,))
+        except OSError as e:
+            results.put((False, [], e))
+
+    def _poll():
+        try:
+            created, names, error = results.get_nowait()
+        except queue.Empty:
+            widget.after(20, _poll)
+            return
+        apply_sound_library(created, names, error)
+        if on_loaded is not None:
+            on_loaded()
+
+    threading.Thread(target=_worker, name="sound-library", daemon=True).start()
+    widget.after(20, _poll)
 
 
 # --- Configuration Persistence ---
 def load_config():
-    global monitored_apps, sound_files, applied_file_modifications, app_default_symlink_sources
-    try:
-        if os.path.exists(APP_CONFIG_FILE):
-            with open(APP_CONFIG_FILE, 'r') as f:
-                data = json.load(f)
-                monitored_apps = data.get("monitored_apps", {})
-                applied_file_modifications = data.get("applied_file_modifications", {})
-                app_default_symlink_sources = data.get("app_default_symlink_sources", {})
-                # Ensure sound_files is reset or managed appropriately if loaded from config
-                # sound_files = data.get("sound_files", []) # Example if sound_files were also in config
-    except FileNotFoundError:
-        NSLog(f"Config file {APP_CONFIG_FILE} not found. Starting with empty configuration.")
-        monitored_apps = {}
-        applied_file_modifications = {}
-        app_default_symlink_sources = {}
-    except json.JSONDecodeError:
-        NSLog(f"Error decoding JSON from {APP_CONFIG_FILE}. Starting with empty/default configuration.")
-        # Optionally, attempt to backup the corrupted file and notify user
-        messagebox.showerror("Config Error", f"Could not parse {APP_CONFIG_FILE}. Check console for details. Using default settings.")
-        monitored_apps = {}
-        applied_file_modifications = {}
-        app_default_symlink_sources = {}
-    except Exception as e:
-        NSLog(f"Unexpected error loading config: {e}")
-        messagebox.showerror("Config Load Error", f"An unexpected error occurred: {e}")
-        # Fallback to defaults
-        monitored_apps = {}
-        applied_file_modifications = {}
-        app_default_symlink_sources = {}
-
-
-def save_config():
-    global monitored_apps, applied_file_modifications, app_default_symlink_sources, root
-    config_data = {
-        "monitored_apps": monitored_apps,
-        "applied_file_modifications": applied_file_modifications,
-        "app_default_symlink_sources": app_default_symlink_sources
-    }
-    try:
-        with open(APP_CONFIG_FILE, 'w') as f:
-            json.dump(config_data, f, indent=4)
-        NSLog(f"Configuration saved to {APP_CONFIG_FILE}")
-    except Exception as e:
-        NSLog(f"Error saving config: {e}")
-        messagebox.showerror("Config Save Error", f"Could not save configuration to {APP_CONFIG_FILE}: {e}", parent=root if 'root' in globals() and root else None)
+    for warning in core.load_config():
+        messagebox.showerror("Config Error", f"{warning} Check console for details.")
+    start_playback_executor()
+    recover_replacement_journal()
+
+
+def recover_replacement_journal():
+    """Finishes or undoes bundle changes that a crash interrupted. Called from load_config."""
+    report = core.recover_journal()
+    if report["replayed"] or report["rolled_back"]:
+        logger.info("Recovered from interrupted changes: replayed %s, rolled back %s.", len(report['replayed']), len(report['rolled_back']))
+    if report["failures"]:
+        logger.warning("Journal recovery could not undo some steps: %s", report['failures'])
+        messagebox.showwarning("Recovery Warning",
+                               f"{len(report['failures'])} file change(s) from an interrupted operation could not be undone. See console for details.")
+
+
+def save_config(on_saved=None):
+    """Schedules a config save and returns immediately.
+
+    Saves requested within a short window are coalesced into one atomic
+    write on the saver thread. on_saved() runs on that thread once the
+    changes are on disk.
+    """
+    core.save(on_saved)
 
 
 def save_config_and_notify():
-    """Saves the configuration and shows a notification message."""
+    """Saves the configuration now and shows a notification message."""
     global root # Ensure root is accessible for messagebox parent
-    save_config() # Calls the existing save_config function
-    messagebox.showinfo("Settings Saved", "All application settings have been successfully saved.", parent=root if root and root.winfo_exists() else None)
+    parent = root if root and root.winfo_exists() else None
+    save_config()
+    if config_saver.flush(timeout=10.0):
+        logger.debug("Configuration saved to %s", APP_CONFIG_FILE)
+        messagebox.showinfo("Settings Saved", "All application settings have been successfully saved.", parent=parent)
+    else:
+        messagebox.showerror("Config Save Error", f"Could not save configuration to {APP_CONFIG_FILE}: {config_saver.stats()['last_error']}", parent=parent)
 
 
 # --- GUI Functions ---
@@ -373,7 +502,7 @@ def add_app():
         initialdir="/Applications",
         filetypes=[("All files", "*.*")]  # Changed to be more general
     )
-    print(f"[Debug] filedialog.askopenfilename returned: {app_path}")
+    logger.debug("filedialog.askopenfilename returned: %s", app_path)
     if app_path and app_path.endswith(".app"):
         app_name = os.path.basename(app_path)
         if app_path not in monitored_apps:
@@ -381,6 +510,7 @@ def add_app():
             default_sound = sound_files[0] if sound_files else "None"
             monitored_apps[app_path] = default_sound
             update_app_list()
+            select_app_tab(app_path)
             save_config()
         else:
             messagebox.showinfo("App Exists", f"{app_name} is already being monitored.")
@@ -390,7 +520,7 @@ def add_app():
 
 def remove_app():
     messagebox.showinfo("Deprecated", "This global Remove App button is deprecated. Use the remove button within each app's tab.")
-    NSLog("Global remove_app button called. This should be handled by per-tab buttons.")
+    logger.warning("Global remove_app button called. This should be handled by per-tab buttons.")
 
 
 def remove_selected_app(app_path_to_remove):
@@ -405,60 +535,103 @@ def remove_selected_app(app_path_to_remove):
     if not messagebox.askyesno("Confirm Removal", f"Are you sure you want to stop monitoring {app_name} and revert its symlinks?"):
         return
 
-    del monitored_apps[app_path_to_remove]
-    NSLog(f"Stopped monitoring app: {app_path_to_remove}")
+    def _remove():
+        # Drops the app, its default symlink source and its scan index, and saves the config
+        core.remove_app(app_path_to_remove)
+        logger.info("Stopped monitoring app: %s", app_path_to_remove)
+        update_app_list() # Refresh notebook (removes tab)
 
-    # Revert symlinks associated with this app
-    # Symlinks are stored flat now, so we need to find which ones belong to this app.
-    paths_to_revert = []
-    for original_file_path in list(applied_file_modifications.keys()): # Iterate over copy
-        # A symlink belongs to an app if its original_file_path is within the app's bundle path
-        if original_file_path.startswith(app_path_to_remove + os.sep):
-            paths_to_revert.append(original_file_path)
-    
-    reverted_count = 0
-    failed_revert_count = 0
-    for original_path in paths_to_revert:
-        mod_info = applied_file_modifications.get(original_path)
-        if not mod_info:
-            continue
-        
-        backup_file = mod_info.get("backup_path")
-        try:
-            if os.path.islink(original_path):
-                os.remove(original_path)
-                NSLog(f"Removed symlink: {original_path}")
-            elif not os.path.exists(original_path):
-                NSLog(f"Original symlink path does not exist: {original_path}")
-            else:
-                NSLog(f"Path is not a symlink but was in records, removing file: {original_path}")
-                os.remove(original_path)
-
-            if backup_file and os.path.exists(backup_file):
-                os.rename(backup_file, original_path)
-                NSLog(f"Restored backup: {backup_file} to {original_path}")
-            elif backup_file:
-                NSLog(f"Backup file {backup_file} not found, cannot restore for {original_path}")
-                # Symlink removed, but original not restored. Keep record or inform?
-                messagebox.showwarning("Revert Warning", f"Backup for {os.path.basename(original_path)} not found. Symlink removed, original not restored.")
-            
-            del applied_file_modifications[original_path] # Remove from flat dict
-            reverted_count += 1
-        except Exception as e:
-            NSLog(f"Error reverting symlink for {original_path} during app removal: {e}")
-            messagebox.showerror("Revert Error", f"Could not revert {os.path.basename(original_path)}: {e}")
-            failed_revert_count +=1
+    # Revert symlinks associated with this app (those inside its bundle, via the per-app index)
+    records_to_revert = dict(applied_file_modifications.for_app(app_path_to_remove))
+    if not records_to_revert:
+        _remove()
+        return
+
+    def _reverted(report):
+        # The tab goes only once nothing is left to revert; a cancelled revert keeps it, with the skipped records
+        if applied_file_modifications.paths_for_app(app_path_to_remove):
+            messagebox.showwarning("App Not Removed", f"{app_name} is still monitored because some of its "
+                                   "replacements were not reverted. Remove it again to finish.", parent=root)
+        else:
+            _remove()
 
-    if paths_to_revert:
-        messagebox.showinfo("Symlink Reversion", f"For {app_name}:\nReverted {reverted_count} sound replacements.\nFailed to revert {failed_revert_count} (see console for details).")
+    # The app is being removed, so records are dropped even where nothing could be restored
+    start_bulk_revert(root, f"Reverting {app_name}", records_to_revert, forget_always=True, on_finished=_reverted)
 
-    # Remove app-specific default symlink source if it exists
-    if app_path_to_remove in app_default_symlink_sources:
-        del app_default_symlink_sources[app_path_to_remove]
-        NSLog(f"Removed default symlink source for {app_path_to_remove}")
 
-    save_config()
-    update_app_list() # Refresh notebook (removes tab)
+def revert_all_replacements():
+    """Reverts every recorded sound replacement, across all apps, in the background."""
+    if not applied_file_modifications:
+        messagebox.showinfo("Nothing to Revert", "There are no active sound replacements.", parent=root)
+        return
+    if not messagebox.askyesno("Confirm Revert All",
+                               f"Revert all {len(applied_file_modifications)} sound replacement(s) in every app?", parent=root):
+        return
+    start_bulk_revert(root, "Reverting All Replacements", dict(applied_file_modifications))
+
+
+def start_bulk_revert(parent, title, records, forget_always=False, on_finished=None):
+    """Reverts records ({original_path: record}) on a worker pool behind a progress dialog.
+
+    Shows one report at the end instead of a dialog per file, then calls on_finished(report) if given.
+    """
+    def _work(report_progress, cancel_event):
+        return core.revert(records,
+                           progress=lambda done, total, path: report_progress(done, total, os.path.basename(path)),
+                           cancel_event=cancel_event, forget_always=forget_always)
+
+    def _on_done(report):
+        core.record_revert(report) # Updates the records and saves; transactions finish once saved
+        logger.info("%s: %s in %.2fs", title, report.summary(), report.elapsed)
+        for app_path in list(app_tabs):
+            refresh_active_symlinks_for_app(app_path)
+        show_revert_report(parent, title, report)
+        if on_finished is not None:
+            on_finished(report)
+
+    run_with_progress_dialog(parent, title, _work, _on_done)
+
+
+def show_revert_report(parent, title, report):
+    """Shows a bulk revert report: a summary, one row per file, and an Export button."""
+    dialog = tk.Toplevel(parent)
+    dialog.title(f"{title} - Report")
+    dialog.transient(parent)
+    dialog.geometry("700x400")
+    summary = report.summary() + (" (cancelled)" if report.cancelled else "")
+    ttk.Label(dialog, text=summary, wraplength=660).pack(fill=tk.X, padx=10, pady=(10,5))
+
+    tree_frame = ttk.Frame(dialog)
+    tree_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+    tree = ttk.Treeview(tree_frame, columns=("outcome", "file", "reason"), show="headings")
+    tree.heading("outcome", text="Result")
+    tree.heading("file", text="Original File")
+    tree.heading("reason", text="Reason")
+    tree.column("outcome", width=110, stretch=False)
+    tree.column("file", width=380)
+    tree.column("reason", width=180)
+    scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=tree.yview)
+    tree.configure(yscrollcommand=scrollbar.set)
+    tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+    scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+    # Problems first, so they are not buried under hundreds of successful restores
+    for entry in sorted(report.entries, key=lambda e: (e["outcome"] == REVERT_RESTORED, e["original_path"])):
+        tree.insert("", tk.END, values=(entry["outcome"], entry["original_path"], entry["reason"]))
+
+    def _export():
+        path = filedialog.asksaveasfilename(title="Export Revert Report", defaultextension=".txt",
+                                            filetypes=(("Text", "*.txt"), ("JSON", "*.json")), parent=dialog)
+        if not path:
+            return
+        try:
+            report.export(path)
+        except OSError as e:
+            messagebox.showerror("Export Error", f"Could not write {path}: {e}", parent=dialog)
+
+    button_frame = ttk.Frame(dialog)
+    button_frame.pack(fill=tk.X, padx=10, pady=(5,10))
+    ttk.Button(button_frame, text="Close", command=dialog.destroy).pack(side=tk.RIGHT)
+    ttk.Button(button_frame, text="Export...", command=_export).pack(side=tk.RIGHT, padx=5)
 
 
 def populate_app_tab_content(tab_frame, app_path):
@@ -541,14 +714,15 @@ def populate_app_tab_content(tab_frame, app_path):
     current_launch_sound = monitored_apps.get(app_path, "None")
     ttk.Label(launch_sound_frame, text="Plays when app launches:").grid(row=0, column=0, sticky='w', padx=(0,5))
     
-    launch_sound_combo = ttk.Combobox(launch_sound_frame, state="readonly", width=30)
+    # Editable so typing filters the list (fuzzy match, see filter_launch_sound_combo)
+    launch_sound_combo = ttk.Combobox(launch_sound_frame, width=30)
     launch_sound_combo.grid(row=1, column=0, sticky='ew', pady=(5,0))
-    available_sounds_for_launch = ["None"] + sound_files
-    launch_sound_combo['values'] = available_sounds_for_launch
-    if current_launch_sound in available_sounds_for_launch:
+    launch_sound_combo['values'] = ["None"] + sound_search_index.search("")
+    if current_launch_sound == "None" or current_launch_sound in sound_file_set:
         launch_sound_combo.set(current_launch_sound)
-    elif available_sounds_for_launch:
-        launch_sound_combo.set(available_sounds_for_launch[0])
+    else:
+        launch_sound_combo.set("None")
+    launch_sound_combo.bind("<KeyRelease>", filter_launch_sound_combo)
     
     assign_launch_sound_button = ttk.Button(launch_sound_frame, text="Assign Launch Sound", 
                                           command=lambda p=app_path, c=launch_sound_combo, tf=scrollable_content_frame: assign_sound_to_app(p, c, tf))
@@ -558,6 +732,13 @@ def populate_app_tab_content(tab_frame, app_path):
                                              command=lambda c=launch_sound_combo, sf=scrollable_content_frame: preview_sound(c.get(), sf))
     preview_launch_sound_button.grid(row=1, column=2, sticky='e', padx=(5,0), pady=(5,0))
 
+    # Duration, loudness and format of the selected sound, from the metadata index
+    launch_sound_info_label = ttk.Label(launch_sound_frame, text="", style="Placeholder.TLabel")
+    launch_sound_info_label.grid(row=2, column=0, columnspan=3, sticky='w', pady=(3,0))
+    launch_sound_combo.bind("<<ComboboxSelected>>",
+                            lambda e, c=launch_sound_combo, l=launch_sound_info_label: update_launch_sound_info(c, l))
+    update_launch_sound_info(launch_sound_combo, launch_sound_info_label)
+
     # --- Sound Replacements (Symlinks) within this App ---
     app_symlinks_frame = ttk.LabelFrame(scrollable_content_frame, text=f"Manage Sound Replacements in {app_name}", padding=10)
     app_symlinks_frame.grid(row=3, column=0, sticky='nsew', padx=5, pady=5)
@@ -578,9 +759,21 @@ def populate_app_tab_content(tab_frame, app_path):
                                    command=lambda p=app_path, frame=create_symlink_frame: browse_app_sounds_for_tab(p, frame, "dynamic_content_area")) # Pass a key
     browse_app_button.grid(row=0, column=0, sticky='w', padx=(0,5), pady=(0,5))
 
+    # Default target used by "Apply Default to All"
+    default_source_frame = ttk.Frame(create_symlink_frame)
+    default_source_frame.grid(row=0, column=1, sticky='e', pady=(0,5))
+    current_default_source = app_default_symlink_sources.get(app_path)
+    default_source_label = ttk.Label(default_source_frame, text=f"Current: {current_default_source}" if current_default_source else "Current: Not Set",
+                                     wraplength=250, anchor="e")
+    default_source_label.pack(side=tk.LEFT, padx=(0,5))
+    ttk.Button(default_source_frame, text="Set Default...",
+               command=lambda p=app_path, l=default_source_label, f=create_symlink_frame: select_and_set_app_default_symlink_source(p, l, f)).pack(side=tk.LEFT, padx=2)
+    ttk.Button(default_source_frame, text="Clear",
+               command=lambda p=app_path, l=default_source_label, f=create_symlink_frame: clear_app_default_symlink_source(p, l, f)).pack(side=tk.LEFT, padx=2)
+
     # This frame will hold the list of original sounds for replacement
     symlink_creation_dynamic_content_frame = ttk.Frame(create_symlink_frame, relief="sunken", borderwidth=1)
-    symlink_creation_dynamic_content_frame.grid(row=1, column=0, sticky='nsew', pady=5)
+    symlink_creation_dynamic_content_frame.grid(row=1, column=0, columnspan=2, sticky='nsew', pady=5)
     symlink_creation_dynamic_content_frame.columnconfigure(0, weight=1)
     symlink_creation_dynamic_content_frame.rowconfigure(0, weight=1)
     # Add a placeholder to symlink_creation_dynamic_content_frame
@@ -615,18 +808,26 @@ def populate_app_tab_content(tab_frame, app_path):
                                            command=save_config_and_notify) 
     save_all_settings_button.grid(row=5, column=0, columnspan=2, pady=(0,10), sticky='sew') # Span across if header label also spans
 
+    # Widgets other code updates in place instead of rebuilding the tab
+    return {
+        'launch_sound_combo': launch_sound_combo,
+        'launch_sound_info_label': launch_sound_info_label,
+        'create_symlink_frame': create_symlink_frame,
+        'active_symlinks_frame': active_symlinks_display_frame
+    }
+
 
 def handle_save_symlink_for_tab(row_data_dict, app_path_context, parent_widget_for_dialogs):
     """Handles creating a symlink based on data from a row in the tab UI.
     parent_widget_for_dialogs is typically content_host_frame.winfo_toplevel() (the root window).
     """
-    global applied_file_modifications, root, app_notebook 
+    global applied_file_modifications, root
 
     original_path = row_data_dict['original_path']
-    target_path = row_data_dict['target_path_var'].get()
+    target_path = row_data_dict.get('target_path')
 
     if not target_path or target_path == "<Browse for target>":
-        messagebox.showwarning("Missing Target", "Please select a target sound file first using 'Browse...'.", parent=parent_widget_for_dialogs)
+        messagebox.showwarning("Missing Target", "Please select a target sound file first using 'Browse Target...'.", parent=parent_widget_for_dialogs)
         return
 
     if not os.path.exists(target_path):
@@ -637,145 +838,340 @@ def handle_save_symlink_for_tab(row_data_dict, app_path_context, parent_widget_f
     if not messagebox.askyesno("Confirm Sound Replacement", confirm_message, parent=parent_widget_for_dialogs):
         return
 
-    backup_path = original_path + ".bak"
-    try:
-        if os.path.islink(original_path):
-            os.remove(original_path)
-            NSLog(f"Removed existing symlink at: {original_path}")
-        elif os.path.exists(original_path):
-            if os.path.exists(backup_path):
-                if not messagebox.askyesno("Overwrite Backup?", 
-                                         f"Backup file {backup_path} already exists. Overwrite it?", 
-                                         parent=parent_widget_for_dialogs):
-                    return
-                os.remove(backup_path)
-                NSLog(f"Removed existing backup: {backup_path}")
-            os.rename(original_path, backup_path)
-            NSLog(f"Backed up {original_path} to {backup_path}")
+    overwrite_backup = False
+    if has_backup_conflict(original_path):
+        if not messagebox.askyesno("Overwrite Backup?", 
+                                 f"Backup file {backup_path_for(original_path)} already exists. Overwrite it?", 
+                                 parent=parent_widget_for_dialogs):
+            return
+        overwrite_backup = True
 
-        os.symlink(target_path, original_path)
-        NSLog(f"Symlink created: {original_path} -> {target_path}")
+    def _apply(link_target):
+        core.suspend_watch([original_path]) # Keep the bundle watcher off this file until it is recorded
+        txn = ReplacementTransaction(journal=replacement_journal)
+        try:
+            record = txn.apply(original_path, link_target, overwrite_backup=overwrite_backup)
+            if link_target != target_path:
+                record["converted_from"] = target_path # The sound the user picked
+            txn.commit()
+            logger.info("Symlink created: %s -> %s", original_path, link_target)
+
+            applied_file_modifications[original_path] = record
+            save_config(on_saved=txn.finish)
+            core.recheck_health([original_path])
+            core.refresh_bundle_watch()
+            messagebox.showinfo("Success", 
+                                f"Successfully replaced sound:\n{os.path.basename(original_path)} linked to {os.path.basename(target_path)}", 
+                                parent=parent_widget_for_dialogs)
+            
+            # Refresh the active symlinks list of this app's tab only
+            refresh_active_symlinks_for_app(app_path_context)
 
-        applied_file_modifications[original_path] = {
-            "backup_path": backup_path,
-            "target_linked_to": target_path
-        }
-        save_config() 
-        messagebox.showinfo("Success", 
-                            f"Successfully replaced sound:\n{os.path.basename(original_path)} linked to {os.path.basename(target_path)}", 
-                            parent=parent_widget_for_dialogs)
-        
-        # Refresh the active symlinks list
-        if app_notebook and root: 
-            try:
-                current_tab_widget_path_str = app_notebook.select()
-                if not current_tab_widget_path_str: 
-                    NSLog("No tab selected, cannot refresh active symlinks list.")
-                    return
-                
-                current_tab_frame = root.nametowidget(current_tab_widget_path_str)
-                current_tab_app_name = app_notebook.tab(current_tab_frame, "text")
-
-                if os.path.basename(app_path_context) == current_tab_app_name:
-                    target_refresh_frame = None
-                    # Find the 'Active Sound Replacements' frame within the current tab
-                    for l0_child in current_tab_frame.winfo_children(): # Usually Canvas + Scrollbar
-                        if isinstance(l0_child, tk.Canvas):
-                            # Get the scrollable_content_frame hosted in the canvas
-                            canvas_window_items = l0_child.find_withtag("all")
-                            if not canvas_window_items: continue # Should not happen if populated
-                            
-                            # Assuming the first item created with create_window is our scrollable frame
-                            # This relies on the structure established in populate_app_tab_content
-                            # A more robust way might be to store a direct reference if this proves fragile
-                            canvas_window_item_path = None
-                            for item_id in canvas_window_items:
-                                if l0_child.type(item_id) == "window":
-                                    canvas_window_item_path = l0_child.itemcget(item_id, "window")
-                                    break
-                            
-                            if canvas_window_item_path:
-                                scrollable_content_frame = root.nametowidget(canvas_window_item_path)
-                                for l1_child in scrollable_content_frame.winfo_children(): # Header, LaunchSoundFrame, AppSymlinksFrame etc.
-                                    if isinstance(l1_child, ttk.LabelFrame) and l1_child.cget("text").startswith(f"Manage Sound Replacements in"): 
-                                        # Now inside "Manage Sound Replacements in {app_name}"
-                                        for l2_child in l1_child.winfo_children(): # CreateSymlinkFrame, ActiveSymlinksDisplayFrame
-                                            if isinstance(l2_child, ttk.LabelFrame) and l2_child.cget("text") == "Active Sound Replacements":
-                                                target_refresh_frame = l2_child
-                                                break
-                                        if target_refresh_frame: break
-                                if target_refresh_frame: break
-
-
-                    if target_refresh_frame:
-                        refresh_active_symlinks_for_tab(app_path_context, target_refresh_frame)
-                    else:
-                        NSLog(f"Could not find 'Active Sound Replacements' frame in tab '{current_tab_app_name}' to refresh. Manual tab switch may be needed.")
-                else:
-                    NSLog(f"Symlink saved for '{os.path.basename(app_path_context)}', but current tab is '{current_tab_app_name}'. Active list not refreshed.")
-            except Exception as e:
-                NSLog(f"Error refreshing active symlinks list in tab: {e}")
+        except Exception as e:
+            rollback_failures = txn.rollback()
+            if rollback_failures:
+                logger.warning("Rollback after failed symlink left issues: %s", rollback_failures)
+            messagebox.showerror("Symlink Error", f"Could not apply symlink: {e}", parent=parent_widget_for_dialogs)
+            logger.error("Error applying symlink for tab: %s", e)
+        finally:
+            core.resume_watch([original_path])
+
+    if not transcode_settings.get("match_format"):
+        _apply(target_path)
+        return
+
+    # Converting can take a moment (and is cached), so it runs behind a progress dialog
+    cancel_events = []
+
+    def _work(report_progress, cancel_event):
+        cancel_events.append(cancel_event)
+        return core.prepare_targets([(original_path, target_path)], cancel_event=cancel_event,
+                                    progress=lambda done, total, path: report_progress(done, total, os.path.basename(target_path)))
+
+    def _on_done(result):
+        prepared, errors = result
+        if errors and any(event.is_set() for event in cancel_events):
+            logger.info("Conversion of %s cancelled; symlink not applied", target_path)
+            return
+        if errors:
+            messagebox.showerror("Conversion Error", f"Could not convert {os.path.basename(target_path)}:\n{errors[original_path]}",
+                                 parent=parent_widget_for_dialogs)
+            return
+        _apply(prepared[0][1])
+
+    run_with_progress_dialog(parent_widget_for_dialogs, f"Converting {os.path.basename(target_path)}", _work, _on_done)
+
+
+def batch_apply_replacements_for_tab(sound_list, rows_to_apply, parent_widget_for_dialogs):
+    """Applies many rows as one transaction: one confirmation, one config save, rollback on failure."""
+    app_path = sound_list['app_path']
+    app_name = os.path.basename(app_path)
+    pairs = [(row['original_path'], row['target_path']) for row in rows_to_apply if row.get('target_path')]
+    skipped_without_target = len(rows_to_apply) - len(pairs)
+    if not pairs:
+        messagebox.showwarning("Missing Target", "None of the selected sounds has a target sound file. Use 'Browse Target...' first.", parent=parent_widget_for_dialogs)
+        return
+
+    missing_targets = sorted({target for _, target in pairs if not os.path.exists(target)})
+    if missing_targets:
+        messagebox.showerror("Error", "Target sound file(s) do not exist:\n" + "\n".join(missing_targets[:10]), parent=parent_widget_for_dialogs)
+        return
+
+    confirm_message = f"This will replace {len(pairs)} sound(s) within {app_name} with symlinks to your target sounds.\n\nThe original files will be backed up. If any replacement fails, all of them are rolled back."
+    if skipped_without_target:
+        confirm_message += f"\n\n{skipped_without_target} selected sound(s) without a target will be skipped."
+    conflicts = [original for original, _ in pairs if has_backup_conflict(original)]
+    overwrite_backups = False
+    if conflicts:
+        answer = messagebox.askyesnocancel("Confirm Sound Replacements",
+                                           confirm_message + f"\n\n{len(conflicts)} backup file(s) already exist. Overwrite them?\n(Yes: overwrite, No: skip those sounds, Cancel: do nothing)",
+                                           parent=parent_widget_for_dialogs)
+        if answer is None:
+            return
+        if answer:
+            overwrite_backups = True
         else:
-            NSLog("app_notebook or root not available for refreshing active symlinks list.")
+            conflict_set = set(conflicts)
+            pairs = [pair for pair in pairs if pair[0] not in conflict_set]
+            if not pairs:
+                return
+    elif not messagebox.askyesno("Confirm Sound Replacements", confirm_message + "\n\nProceed?", parent=parent_widget_for_dialogs):
+        return
+
+    def _work(report_progress, cancel_event):
+        return core.apply(pairs, overwrite_backups=overwrite_backups,
+                          progress=lambda done, total, path: report_progress(done, total, os.path.basename(path)),
+                          cancel_event=cancel_event)
+
+    def _on_done(result):
+        core.record_apply(result) # Records the symlinks and saves (only if ok); the transaction finishes once saved
+        if result.ok:
+            logger.info("Batch applied %s symlink(s) in %s", len(result.applied), app_name)
+            messagebox.showinfo("Success", f"Successfully replaced {len(result.applied)} sound(s) in {app_name}.", parent=parent_widget_for_dialogs)
+        elif result.cancelled:
+            messagebox.showinfo("Cancelled", "Batch replacement cancelled. All changes were rolled back.", parent=parent_widget_for_dialogs)
+        else:
+            logger.warning("Batch apply failed at %s: %s; rollback issues: %s", result.failed_path, result.error, result.rollback_failures)
+            message = f"Could not replace {os.path.basename(result.failed_path)}: {result.error}\n\nAll changes made by this batch were rolled back."
+            if result.rollback_failures:
+                message += f"\n\n{len(result.rollback_failures)} step(s) could not be rolled back. See console for details."
+            messagebox.showerror("Symlink Error", message, parent=parent_widget_for_dialogs)
+        refresh_active_symlinks_for_app(app_path)
+
+    run_with_progress_dialog(parent_widget_for_dialogs, f"Replacing sounds in {app_name}", _work, _on_done)
+
+
+def apply_default_source_to_all_rows(sound_list, parent_widget_for_dialogs):
+    """Targets every scanned sound at the app's default symlink source and applies them as one batch."""
+    default_source = app_default_symlink_sources.get(sound_list['app_path'])
+    if not default_source:
+        messagebox.showwarning("No Default Source", "Set a default target sound for this app first ('Set Default...').", parent=parent_widget_for_dialogs)
+        return
+    rows = list(sound_list['rows'].values())
+    for row_data in rows:
+        row_data['target_path'] = default_source
+        sound_list['tree'].set(row_data['original_path'], "target", sound_row_target_text(row_data))
+    batch_apply_replacements_for_tab(sound_list, rows, parent_widget_for_dialogs)
+
+
+def run_with_progress_dialog(parent, title, work, on_done):
+    """Runs work(report_progress, cancel_event) on a background thread behind a modal progress dialog.
+
+    report_progress(done, total, text) may be called from the worker thread.
+    on_done(result) runs on the Tk thread with work's return value once it finishes.
+    """
+    dialog = tk.Toplevel(parent)
+    dialog.title(title)
+    dialog.transient(parent)
+    dialog.resizable(False, False)
+    status_label = ttk.Label(dialog, text="Starting...", width=50, anchor="w")
+    status_label.pack(fill=tk.X, padx=10, pady=(10,5))
+    progress_bar = ttk.Progressbar(dialog, orient="horizontal", length=360, mode="determinate")
+    progress_bar.pack(fill=tk.X, padx=10, pady=5)
+    cancel_event = threading.Event()
+    cancel_button = ttk.Button(dialog, text="Cancel", command=cancel_event.set)
+    cancel_button.pack(pady=(5,10))
+    dialog.protocol("WM_DELETE_WINDOW", cancel_event.set)
+    dialog.grab_set()
+
+    updates = queue.Queue()
+
+    def _worker():
+        try:
+            result = work(lambda done, total, text: updates.put(("progress", (done, total, text))), cancel_event)
+        except Exception as e: # Should not happen; work reports its own failures
+            logger.error("Background task '%s' raised: %s", title, e)
+            result = None
+        updates.put(("done", result))
+
+    def _poll():
+        try:
+            while True:
+                kind, payload = updates.get_nowait()
+                if kind == "progress":
+                    done, total, text = payload
+                    progress_bar.config(maximum=max(total, 1), value=done)
+                    status_label.config(text=f"{done}/{total}: {text}")
+                else:
+                    dialog.grab_release()
+                    dialog.destroy()
+                    if payload is not None:
+                        on_done(payload)
+                    return
+        except queue.Empty:
+            pass
+        if cancel_event.is_set():
+            cancel_button.config(state=tk.DISABLED)
+            status_label.config(text="Cancelling...")
+        dialog.after(50, _poll)
+
+    threading.Thread(target=_worker, name=f"task-{title}", daemon=True).start()
+    dialog.after(50, _poll)
 
-    except Exception as e:
-        messagebox.showerror("Symlink Error", f"Could not apply symlink: {e}", parent=parent_widget_for_dialogs)
-        NSLog(f"Error applying symlink for tab: {e}")
 
 def update_app_list():
-    global app_notebook, monitored_apps
+    """Syncs the notebook with monitored_apps, adding or removing only the tabs that changed.
+
+    Tabs are tracked by app path in app_tabs. A tab's content is built the
+    first time it is selected (see on_app_tab_changed), not here.
+    """
+    global app_notebook, info_tab_frame
     if not app_notebook:
-        NSLog("Notebook not initialized, cannot update app list/tabs.")
+        logger.warning("Notebook not initialized, cannot update app list/tabs.")
         return
 
-    selected_tab_path = None
-    try:
-        if app_notebook.tabs() and app_notebook.index("current") is not None:
-            current_tab_widget_path = app_notebook.select()
-            current_tab_text = app_notebook.tab(app_notebook.select(), "text")
-            for path in monitored_apps.keys():
-                if os.path.basename(path) == current_tab_text:
-                    selected_tab_path = path
-                    break
-    except tk.TclError: 
-        pass
-
-    for tab_id in list(app_notebook.tabs()):
-        app_notebook.forget(tab_id)
+    for app_path in [p for p in app_tabs if p not in monitored_apps]:
+        remove_app_tab(app_path)
+    for app_path in monitored_apps:
+        if app_path not in app_tabs:
+            add_app_tab(app_path)
 
     if not monitored_apps:
-        empty_frame = ttk.Frame(app_notebook, padding="20")
-        msg_label = ttk.Label(empty_frame, text="No applications are currently monitored. Click 'Add Monitored App' to begin.", justify=tk.CENTER, wraplength=300)
-        msg_label.pack(expand=True, padx=10, pady=10)
-        app_notebook.add(empty_frame, text=" Information ") 
+        if info_tab_frame is None:
+            info_tab_frame = ttk.Frame(app_notebook, padding="20")
+            msg_label = ttk.Label(info_tab_frame, text="No applications are currently monitored. Click 'Add Monitored App' to begin.", justify=tk.CENTER, wraplength=300)
+            msg_label.pack(expand=True, padx=10, pady=10)
+            app_notebook.add(info_tab_frame, text=" Information ") 
+    elif info_tab_frame is not None:
+        app_notebook.forget(info_tab_frame)
+        info_tab_frame.destroy()
+        info_tab_frame = None
+
+    ensure_app_tab_populated(get_selected_app_path())
+
+
+def add_app_tab(app_path):
+    """Adds an empty tab for app_path; its content is built on first selection."""
+    tab_frame = ttk.Frame(app_notebook, padding="10") 
+    app_notebook.add(tab_frame, text=os.path.basename(app_path), sticky="nsew")
+    app_tabs[app_path] = {'frame': tab_frame, 'populated': False, 'widgets': {}}
+    return tab_frame
+
+
+def remove_app_tab(app_path):
+    tab = app_tabs.pop(app_path, None)
+    if tab is None:
         return
+    create_symlink_frame = tab['widgets'].get('create_symlink_frame')
+    if create_symlink_frame is not None:
+        cancel_active_scan_for_tab(create_symlink_frame)
+    app_notebook.forget(tab['frame'])
+    tab['frame'].destroy()
+
+
+def ensure_app_tab_populated(app_path):
+    tab = app_tabs.get(app_path)
+    if tab is None or tab['populated']:
+        return
+    tab['widgets'] = populate_app_tab_content(tab['frame'], app_path)
+    tab['populated'] = True
+
+
+def on_app_tab_changed(event):
+    ensure_app_tab_populated(get_selected_app_path())
 
-    new_selection_index = None
-    tab_index = 0
-    for app_path, sound_name in monitored_apps.items(): 
-        app_name = os.path.basename(app_path)
-        tab_frame = ttk.Frame(app_notebook, padding="10") 
-        app_notebook.add(tab_frame, text=app_name, sticky="nsew")
-        
-        populate_app_tab_content(tab_frame, app_path)
-        
-        if app_path == selected_tab_path:
-            new_selection_index = tab_index
-        tab_index += 1
 
-    if new_selection_index is not None:
-        app_notebook.select(new_selection_index)
-    elif len(app_notebook.tabs()) > 0:
-        app_notebook.select(0) 
+def select_app_tab(app_path):
+    tab = app_tabs.get(app_path)
+    if tab is not None:
+        app_notebook.select(tab['frame'])
+
+
+def refresh_active_symlinks_for_app(app_path):
+    """Refreshes the 'Active Sound Replacements' list of app_path's tab, if it has been built."""
+    tab = app_tabs.get(app_path)
+    if tab is None or not tab['populated']:
+        return # Built fresh when the tab is first selected
+    refresh_active_symlinks_for_tab(app_path, tab['widgets']['active_symlinks_frame'])
+
+
+def update_launch_sound_info(launch_sound_combo, info_label):
+    """Shows the metadata of the sound selected in a launch-sound combobox (blank until it is indexed)."""
+    name = launch_sound_combo.get()
+    meta = core.sound_metadata.get(os.path.join(SOUNDS_DIR, name)) if name and name != "None" else None
+    info_label.config(text=describe_sound_metadata(meta) if meta else "")
+
+
+def apply_sound_metadata(results):
+    """Tk side of the metadata indexer: refreshes launch-sound info and the scanned-sound lists."""
+    indexed = {os.path.abspath(path) for path in results}
+    for tab in app_tabs.values():
+        widgets = tab['widgets']
+        combo, info_label = widgets.get('launch_sound_combo'), widgets.get('launch_sound_info_label')
+        if combo is not None and combo.winfo_exists():
+            update_launch_sound_info(combo, info_label)
+        sound_list = widgets.get('sound_list')
+        if sound_list is None or not sound_list['tree'].winfo_exists():
+            continue
+        tree = sound_list['tree']
+        for original_path in sound_list['rows']:
+            if os.path.abspath(original_path) in indexed and tree.exists(original_path):
+                tree.set(original_path, "info", sound_row_info_text(original_path))
+
+
+def start_metadata_indexing(root_window):
+    """Starts the background metadata indexer and queues the library and every scanned bundle sound."""
+    results = queue.Queue()
+    core.start_metadata_indexer(results.put)
+
+    def _poll():
+        try:
+            while True:
+                apply_sound_metadata(results.get_nowait())
+        except queue.Empty:
+            pass
+        if core.metadata_indexer is not None:
+            root_window.after(500, _poll)
+
+    root_window.after(500, _poll)
+    library = [os.path.join(SOUNDS_DIR, name) for name in sound_files]
+    core.index_sounds(library + core.sound_inventory.sound_paths())
+
+
+def filter_launch_sound_combo(event):
+    """Narrows a launch-sound combobox's list to fuzzy matches of what has been typed so far."""
+    if event.keysym in ("Up", "Down", "Return", "KP_Enter", "Escape", "Tab", "Left", "Right"):
+        return
+    combo = event.widget
+    matches = sound_search_index.search(combo.get())
+    combo['values'] = matches if combo.get().strip() else ["None"] + matches
 
 
 def update_sound_dropdown():
-    NSLog("Global update_sound_dropdown called - this should be handled per tab now.")
-    pass
+    """Pushes the current sound library into the launch-sound combobox of every built tab."""
+    available_sounds_for_launch = ["None"] + sound_search_index.search("") # The full list is reached by typing
+    for app_path, tab in app_tabs.items():
+        launch_sound_combo = tab['widgets'].get('launch_sound_combo')
+        if launch_sound_combo is None or not launch_sound_combo.winfo_exists():
+            continue
+        launch_sound_combo['values'] = available_sounds_for_launch
+        current_launch_sound = monitored_apps.get(app_path, "None")
+        launch_sound_combo.set(current_launch_sound if current_launch_sound in sound_file_set else "None")
+        update_launch_sound_info(launch_sound_combo, tab['widgets']['launch_sound_info_label'])
 
 
 def on_app_select(event):
-    NSLog("on_app_select (for old listbox) called - this is obsolete.")
+    logger.debug("on_app_select (for old listbox) called - this is obsolete.")
     pass
 
 
@@ -788,18 +1184,12 @@ def get_selected_app_path():
         if not selected_tab_widget_path: 
             return None
 
-        selected_tab_text = app_notebook.tab(selected_tab_widget_path, "text")
-
-        if selected_tab_text == " Information ": 
-            return None
-
-        for path in monitored_apps.keys():
-            if os.path.basename(path) == selected_tab_text:
+        for path, tab in app_tabs.items():
+            if str(tab['frame']) == selected_tab_widget_path:
                 return path
-        NSLog(f"Could not find app_path for selected tab: {selected_tab_text}")
-        return None
+        return None # Information tab, or nothing selected
     except tk.TclError as e:
-        NSLog(f"TclError in get_selected_app_path: {e}. Likely no actual app tab selected.")
+        logger.debug("TclError in get_selected_app_path: %s. Likely no actual app tab selected.", e)
         return None
 
 
@@ -821,13 +1211,188 @@ def setup_gui(root_window):
     add_app_button = ttk.Button(top_controls_frame, text="Add Monitored App", command=add_app)
     add_app_button.pack(side=tk.LEFT, padx=5) 
 
+    revert_all_button = ttk.Button(top_controls_frame, text="Revert All Replacements", command=revert_all_replacements)
+    revert_all_button.pack(side=tk.LEFT, padx=5)
+
+    check_button = ttk.Button(top_controls_frame, text="Check Replacements",
+                              command=lambda: start_health_check(root_window, announce=True))
+    check_button.pack(side=tk.LEFT, padx=5)
+
+    global match_format_var
+    match_format_var = tk.BooleanVar(master=root_window, value=False) # Set from the config by finish_startup()
+
+    def _toggle_match_format():
+        transcode_settings["match_format"] = match_format_var.get()
+        save_config()
+
+    match_format_check = ttk.Checkbutton(top_controls_frame, text="Convert to Original's Format",
+                                         variable=match_format_var, command=_toggle_match_format)
+    match_format_check.pack(side=tk.LEFT, padx=5)
+
+    global health_summary_label
+    health_summary_label = ttk.Label(top_controls_frame, text="", anchor="w")
+    health_summary_label.pack(side=tk.LEFT, padx=5, fill=tk.X, expand=True)
+
     app_notebook = ttk.Notebook(outer_main_frame)
     app_notebook.grid(row=1, column=0, sticky="nsew", padx=5, pady=5)
+    app_notebook.bind("<<NotebookTabChanged>>", on_app_tab_changed)
     outer_main_frame.rowconfigure(1, weight=1) 
-    
-    load_config()
-    load_sound_files()
-    update_app_list()  
+    # Config, tabs, the sound library and monitoring are loaded by finish_startup() once the window is up
+
+
+def finish_startup(root_window, on_finished=None):
+    """Loads everything the window does not need to appear. Runs from the first Tk event-loop turn.
+
+    on_finished() is called on the Tk thread once the sound library has been loaded too.
+    """
+    with startup_profiler.measure("config"):
+        load_config()
+        start_logging()
+        match_format_var.set(bool(transcode_settings.get("match_format")))
+    with startup_profiler.measure("tabs"):
+        update_app_list() # Registers empty tabs; content is built on first selection
+    with startup_profiler.measure("first tab"):
+        ensure_app_tab_populated(get_selected_app_path())
+    start_audio_mixer_async()
+    with startup_profiler.measure("monitoring"):
+        start_app_monitoring()
+        start_bundle_watching(root_window)
+        start_metrics_export()
+    if core.health_settings.get("check_on_startup", True) and applied_file_modifications:
+        startup_profiler.begin("health check")
+        start_health_check(root_window, on_done=lambda report: startup_profiler.end("health check"))
+
+    # Listing SOUNDS_DIR can be slow (network homes, large libraries), so it happens off the Tk thread
+    startup_profiler.begin("sound list")
+
+    def _on_sounds_loaded():
+        startup_profiler.end("sound list")
+        threading.Thread(target=warm_sound_cache, daemon=True).start()
+        start_metadata_indexing(root_window)
+        start_library_watching(root_window)
+        if on_finished is not None:
+            on_finished()
+
+    load_sound_files_async(root_window, _on_sounds_loaded)
+
+
+def gui_log_handlers():
+    """Where the GUI's log goes besides the log file: the terminal, and NSLog on macOS."""
+    return [console_handler(), system_log_handler()]
+
+
+def start_logging():
+    """Restarts the log pipeline with log_settings (level, rate limit, JSON-lines file) once the config is loaded."""
+    for warning in core.configure_logging(log_pipeline, gui_log_handlers()):
+        logger.warning(warning)
+
+
+def start_metrics_export():
+    """Starts the metrics endpoint/file enabled in metrics_settings (off by default)."""
+    try:
+        for target in core.start_metrics_export():
+            logger.info("Exporting metrics to %s", target)
+    except OSError as e:
+        logger.warning("Could not start the metrics endpoint: %s", e)
+
+
+def start_health_check(root_window, announce=False, on_done=None):
+    """Checks every recorded replacement on a worker thread, then updates the status column and summary.
+
+    The startup check stops at health_settings' time budget; the one the
+    user asks for (announce=True) runs to the end and reports problems.
+    """
+    records = dict(applied_file_modifications) # Copied here; the worker must not iterate the live dict
+    results = queue.Queue()
+    time_budget = None if announce else core.health_settings.get("time_budget_s")
+    if health_summary_label is not None:
+        health_summary_label.config(text=f"Checking {len(records)} replacement(s)...")
+
+    def _worker():
+        results.put(core.check_health(records, time_budget=time_budget))
+
+    def _poll():
+        try:
+            report = results.get_nowait()
+        except queue.Empty:
+            root_window.after(50, _poll)
+            return
+        logger.info("Replacement health check: %s in %.2fs", report.summary(), report.elapsed)
+        if health_summary_label is not None:
+            health_summary_label.config(text=report.summary() if records else "")
+        for app_path in list(app_tabs):
+            refresh_active_symlinks_for_app(app_path)
+        if announce:
+            problems = report.problems()
+            message = report.summary()
+            if problems:
+                message += "\n\n" + "\n".join(f"{HEALTH_STATE_LABELS.get(state, state)}: {os.path.basename(path)}"
+                                               for path, state, _ in problems[:15])
+                if len(problems) > 15:
+                    message += f"\n...and {len(problems) - 15} more"
+            messagebox.showinfo("Replacement Check", message, parent=root_window)
+        if on_done is not None:
+            on_done(report)
+
+    threading.Thread(target=_worker, name="health-check", daemon=True).start()
+    root_window.after(50, _poll)
+
+
+def start_bundle_watching(root_window):
+    """Watches bundles with replacements for app updates; changes are handled on the Tk thread."""
+    changes = queue.Queue()
+    try:
+        watcher = core.start_bundle_watch(changes.put)
+    except Exception as e:
+        logger.warning("Failed to start bundle watcher: %s", e)
+        return
+    if watcher is None:
+        return # Disabled in watch_settings
+    logger.info("Watching bundles for app updates (%s).", watcher.name)
+
+    def _poll():
+        try:
+            while True:
+                handle_bundle_changes(changes.get_nowait(), root_window)
+        except queue.Empty:
+            pass
+        if core.bundle_watcher is watcher:
+            root_window.after(250, _poll)
+
+    root_window.after(250, _poll)
+
+
+def handle_bundle_changes(changed_dirs, parent):
+    """Re-applies (or offers to re-apply) replacements that an app update overwrote."""
+    outcome = core.handle_bundle_changes(changed_dirs)
+    if not (outcome["reapplied"] or outcome["queued"] or outcome["removed"]):
+        return
+    logger.info("App update detected: re-applied %s, queued %s, removed %s, failed %s", len(outcome['reapplied']), len(outcome['queued']), len(outcome['removed']), outcome['failed'])
+    for app_path in list(app_tabs):
+        refresh_active_symlinks_for_app(app_path)
+    # Files removed after being queued land in removed_by_update too
+    gone = outcome["removed"] + [path for path, _ in outcome["failed"] if path in core.removed_by_update]
+    waiting = [path for path in outcome["queued"] if os.path.lexists(path)]
+    if waiting:
+        if messagebox.askyesno("App Updated",
+                               f"An app update replaced {len(waiting)} of your sound replacement(s). Re-apply them now?",
+                               parent=parent):
+            result = core.reapply_pending(waiting)
+            if result["failed"]:
+                messagebox.showerror("Re-apply Error",
+                                     "Could not re-apply:\n" + "\n".join(f"{os.path.basename(p)}: {reason}" for p, reason in result["failed"]),
+                                     parent=parent)
+            for app_path in list(app_tabs):
+                refresh_active_symlinks_for_app(app_path)
+    if gone:
+        if messagebox.askyesno("App Updated",
+                               f"An app update removed {len(gone)} replaced sound file(s), so they can't be re-applied:\n"
+                               + "\n".join(os.path.basename(p) for p in gone[:10])
+                               + "\n\nForget these replacements? Otherwise they stay listed and are re-applied if the files come back.",
+                               parent=parent):
+            core.forget_removed(gone)
+            for app_path in list(app_tabs):
+                refresh_active_symlinks_for_app(app_path)
 
 
 def assign_sound_to_app(app_path, sound_combo_widget, tab_frame_parent):
@@ -841,12 +1406,19 @@ def assign_sound_to_app(app_path, sound_combo_widget, tab_frame_parent):
     if not selected_sound: 
         messagebox.showwarning("Selection Error", "Please select a sound from the dropdown.", parent=tab_frame_parent)
         return
+    if selected_sound != "None" and selected_sound not in sound_file_set:
+        # Typed text rather than a picked entry: take the best match if there is exactly one
+        matches = sound_search_index.search(selected_sound, limit=2)
+        if len(matches) != 1:
+            messagebox.showwarning("Selection Error", f"No single sound matches '{selected_sound}'. Pick one from the dropdown.", parent=tab_frame_parent)
+            return
+        selected_sound = matches[0]
+        sound_combo_widget.set(selected_sound)
 
     monitored_apps[app_path] = selected_sound
     save_config()
-    NSLog(f"Assigned launch sound for {os.path.basename(app_path)}: {selected_sound}")
+    logger.info("Assigned launch sound for %s: %s", os.path.basename(app_path), selected_sound)
     messagebox.showinfo("Launch Sound Updated", f"Launch sound for {os.path.basename(app_path)} set to: {selected_sound}", parent=tab_frame_parent)
-    update_app_list() 
 
 
 def select_and_set_app_default_symlink_source(app_path, display_label_widget, tab_frame_parent):
@@ -863,10 +1435,10 @@ def select_and_set_app_default_symlink_source(app_path, display_label_widget, ta
         app_default_symlink_sources[app_path] = filepath
         display_label_widget.config(text=f"Current: {filepath}")
         save_config()
-        NSLog(f"Set default symlink source for {app_path} to {filepath}")
+        logger.info("Set default symlink source for %s to %s", app_path, filepath)
         messagebox.showinfo("Default Set", f"Default symlink source for {os.path.basename(app_path)} set.", parent=tab_frame_parent)
     else:
-        NSLog(f"No file selected for default symlink source for {app_path}.")
+        logger.debug("No file selected for default symlink source for %s.", app_path)
 
 def clear_app_default_symlink_source(app_path, display_label_widget, tab_frame_parent):
     global app_default_symlink_sources
@@ -874,7 +1446,7 @@ def clear_app_default_symlink_source(app_path, display_label_widget, tab_frame_p
         del app_default_symlink_sources[app_path]
         display_label_widget.config(text="Current: Not Set")
         save_config()
-        NSLog(f"Cleared default symlink source for {app_path}")
+        logger.info("Cleared default symlink source for %s", app_path)
         messagebox.showinfo("Default Cleared", f"Default symlink source for {os.path.basename(app_path)} cleared.", parent=tab_frame_parent)
     else:
         messagebox.showinfo("Info", f"No default symlink source was set for {os.path.basename(app_path)}.", parent=tab_frame_parent)
@@ -883,198 +1455,269 @@ def clear_app_default_symlink_source(app_path, display_label_widget, tab_frame_p
 def browse_app_sounds_for_tab(app_path, create_symlink_top_frame, content_area_key):
     content_host_frame = create_symlink_top_frame.widget_refs.get(content_area_key)
     if not content_host_frame:
-        NSLog(f"Error: Content area key '{content_area_key}' not found in create_symlink_top_frame refs.")
+        logger.error("Error: Content area key '%s' not found in create_symlink_top_frame refs.", content_area_key)
         messagebox.showerror("UI Error", "Symlink creation area not found.", parent=create_symlink_top_frame.winfo_toplevel())
         return
 
+    cancel_active_scan_for_tab(create_symlink_top_frame)
     for widget in content_host_frame.winfo_children():
         widget.destroy()
 
-    sound_paths_in_app = []
     default_relative_scan_dir = os.path.join("Contents", "Resources")
     current_scan_path = os.path.join(app_path, default_relative_scan_dir)
-    current_path_description_for_user = default_relative_scan_dir 
-    
-    initial_scan_done = False
+
     if os.path.isdir(current_scan_path): 
-        try:
-            NSLog(f"Scanning default path: {current_scan_path}")
-            for dirpath, _, filenames in os.walk(current_scan_path):
-                for filename in filenames:
-                    if filename.lower().endswith((".wav", ".mp3", ".aiff", ".m4a")):
-                        full_path = os.path.join(dirpath, filename)
-                        sound_paths_in_app.append(full_path)
-            initial_scan_done = True 
-            NSLog(f"Found {len(sound_paths_in_app)} sounds in default path.")
-        except Exception as e:
-            messagebox.showerror("Error", f"Could not read app resources from '{current_path_description_for_user}': {e}", parent=content_host_frame.winfo_toplevel())
+        logger.debug("Scanning default path: %s", current_scan_path)
+        start_bundle_scan_for_tab(
+            app_path, create_symlink_top_frame, content_host_frame, current_scan_path, default_relative_scan_dir,
+            on_empty=lambda: prompt_custom_scan_path_for_tab(app_path, create_symlink_top_frame, content_host_frame, default_relative_scan_dir, True))
     else:
-        NSLog(f"Default scan path not found or not a directory: {current_scan_path}")
-
-    if not sound_paths_in_app: 
-        prompt_title = "Scan Custom Path"
-        prompt_message_intro = f"No sounds found in app's default sound location ('{default_relative_scan_dir}')."
-        if not os.path.isdir(current_scan_path) and not initial_scan_done : 
-             prompt_message_intro = f"App's default sound location ('{default_relative_scan_dir}') not found."
-
-        custom_path_relative = simpledialog.askstring(
-            prompt_title,
-            f"{prompt_message_intro}\\n\\nEnter a path within '{os.path.basename(app_path)}' to scan (e.g., Contents/Frameworks/Some.framework/Versions/A/Resources), or leave blank to cancel:",
-            parent=content_host_frame.winfo_toplevel()
-        )
-        if custom_path_relative:
-            current_scan_path = os.path.join(app_path, custom_path_relative)
-            current_path_description_for_user = custom_path_relative 
-            NSLog(f"Attempting to scan custom path: {current_scan_path}")
-            if os.path.isdir(current_scan_path):
-                try:
-                    for dirpath, _, filenames in os.walk(current_scan_path):
-                        for filename in filenames:
-                            if filename.lower().endswith((".wav", ".mp3", ".aiff", ".m4a")):
-                                full_path = os.path.join(dirpath, filename)
-                                sound_paths_in_app.append(full_path)
-                    NSLog(f"Found {len(sound_paths_in_app)} sounds in custom path '{current_path_description_for_user}'.")
-                except Exception as e:
-                    messagebox.showerror("Error", f"Could not read from custom path '{current_path_description_for_user}': {e}", parent=content_host_frame.winfo_toplevel())
-                    ttk.Label(content_host_frame, text=f"Error scanning custom path '{current_path_description_for_user}'. No sounds listed.", style="Placeholder.TLabel").pack(padx=10, pady=10)
-                    return
-            else:
-                messagebox.showerror("Invalid Path", f"The custom path '{current_path_description_for_user}' (resolved to '{current_scan_path}') is not a valid directory.", parent=content_host_frame.winfo_toplevel())
-                ttk.Label(content_host_frame, text=f"Custom path '{current_path_description_for_user}' invalid. No sounds listed.", style="Placeholder.TLabel").pack(padx=10, pady=10)
-                return
-        else: 
-            NSLog("User cancelled custom path input or provided no input.")
-            placeholder_msg = f"No sounds found. Scan of '{default_relative_scan_dir}' was empty, and no custom path was provided."
-            if not initial_scan_done: 
-                placeholder_msg = f"App's default sound location ('{default_relative_scan_dir}') not found, and no custom path was provided."
-            
-            placeholder_widget = create_symlink_top_frame.widget_refs.get('placeholder_label')
-            if placeholder_widget:
-                placeholder_widget.config(text=placeholder_msg)
-                placeholder_widget.pack(padx=10, pady=10) 
-            else: 
-                ttk.Label(content_host_frame, text=placeholder_msg, style="Placeholder.TLabel").pack(padx=10, pady=10)
-            return
+        logger.info("Default scan path not found or not a directory: %s", current_scan_path)
+        prompt_custom_scan_path_for_tab(app_path, create_symlink_top_frame, content_host_frame, default_relative_scan_dir, False)
 
-    if not sound_paths_in_app:
-        final_msg = f"No common sound files found in '{os.path.basename(app_path)}' using path '{current_path_description_for_user}' (and its subfolders)."
-        NSLog(final_msg)
-        messagebox.showinfo("No Sounds Found", final_msg, parent=content_host_frame.winfo_toplevel())
-        
-        placeholder_widget = create_symlink_top_frame.widget_refs.get('placeholder_label')
-        if placeholder_widget:
-            placeholder_widget.config(text=f"No sound files found in '{current_path_description_for_user}'.")
-            placeholder_widget.pack(padx=10, pady=10)
-        else:
-            ttk.Label(content_host_frame, text=f"No sound files found in '{current_path_description_for_user}'.", style="Placeholder.TLabel").pack(padx=10, pady=10)
+
+def prompt_custom_scan_path_for_tab(app_path, create_symlink_top_frame, content_host_frame, default_relative_scan_dir, default_path_exists):
+    """Asks for a path inside the bundle when the default location had no sounds, then scans it."""
+    for widget in content_host_frame.winfo_children():
+        widget.destroy()
+
+    prompt_title = "Scan Custom Path"
+    prompt_message_intro = f"No sounds found in app's default sound location ('{default_relative_scan_dir}')."
+    if not default_path_exists: 
+         prompt_message_intro = f"App's default sound location ('{default_relative_scan_dir}') not found."
+
+    custom_path_relative = simpledialog.askstring(
+        prompt_title,
+        f"{prompt_message_intro}\n\nEnter a path within '{os.path.basename(app_path)}' to scan (e.g., Contents/Frameworks/Some.framework/Versions/A/Resources), or leave blank to cancel:",
+        parent=content_host_frame.winfo_toplevel()
+    )
+    if not custom_path_relative: 
+        logger.debug("User cancelled custom path input or provided no input.")
+        placeholder_msg = f"No sounds found. Scan of '{default_relative_scan_dir}' was empty, and no custom path was provided."
+        if not default_path_exists: 
+            placeholder_msg = f"App's default sound location ('{default_relative_scan_dir}') not found, and no custom path was provided."
+        ttk.Label(content_host_frame, text=placeholder_msg, style="Placeholder.TLabel").pack(padx=10, pady=10)
         return
 
-    NSLog(f"Proceeding to display {len(sound_paths_in_app)} found sound(s) from '{current_path_description_for_user}'.")
-
-    list_header_frame = ttk.Frame(content_host_frame)
-    list_header_frame.pack(fill=tk.X, pady=(5,2))
-    ttk.Label(list_header_frame, text="App Sound File (Original)", font=("TkDefaultFont", 10, "bold")).grid(row=0, column=0, padx=2, sticky='w')
-    ttk.Label(list_header_frame, text="Preview", font=("TkDefaultFont", 10, "bold")).grid(row=0, column=1, padx=2, sticky='w') 
-    ttk.Label(list_header_frame, text=" -> ", font=("TkDefaultFont", 10, "bold")).grid(row=0, column=2, padx=2, sticky='w') 
-    ttk.Label(list_header_frame, text="Your Sound (Target)", font=("TkDefaultFont", 10, "bold")).grid(row=0, column=3, columnspan=2, padx=2, sticky='w') 
-    ttk.Label(list_header_frame, text="Actions", font=("TkDefaultFont", 10, "bold")).grid(row=0, column=5, columnspan=2, padx=2, sticky='w') 
-
-    list_header_frame.columnconfigure(0, weight=3) 
-    list_header_frame.columnconfigure(1, weight=1) 
-    list_header_frame.columnconfigure(2, weight=0) 
-    list_header_frame.columnconfigure(3, weight=1) 
-    list_header_frame.columnconfigure(4, weight=2) 
-    list_header_frame.columnconfigure(5, weight=1) 
-    list_header_frame.columnconfigure(6, weight=1) 
-
-    canvas = tk.Canvas(content_host_frame)
-    scrollbar = ttk.Scrollbar(content_host_frame, orient="vertical", command=canvas.yview)
-    scrollable_frame = ttk.Frame(canvas)
-
-    scrollable_frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
-    
-    canvas_window = canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-    
-    def _on_sound_list_canvas_configure(event):
-        canvas.itemconfig(canvas_window, width=event.width)
-        canvas.configure(scrollregion=canvas.bbox("all")) 
-    canvas.bind("<Configure>", _on_sound_list_canvas_configure)
-
-    def _on_mousewheel_sound_list(event):
-        scroll_val = 0
-        if event.num == 4: 
-            scroll_val = -1
-        elif event.num == 5: 
-            scroll_val = 1
-        elif event.delta: 
-            scroll_val = int(-1*(event.delta/120))
-        
-        if scroll_val != 0:
-            canvas.yview_scroll(scroll_val, "units")
-            
-    canvas.bind("<MouseWheel>", _on_mousewheel_sound_list)
-    scrollable_frame.bind("<MouseWheel>", _on_mousewheel_sound_list) 
-    canvas.bind("<Button-4>", _on_mousewheel_sound_list)
-    canvas.bind("<Button-5>", _on_mousewheel_sound_list)
-    scrollable_frame.bind("<Button-4>", _on_mousewheel_sound_list)
-    scrollable_frame.bind("<Button-5>", _on_mousewheel_sound_list)
+    current_scan_path = os.path.join(app_path, custom_path_relative)
+    logger.debug("Attempting to scan custom path: %s", current_scan_path)
+    if not os.path.isdir(current_scan_path):
+        messagebox.showerror("Invalid Path", f"The custom path '{custom_path_relative}' (resolved to '{current_scan_path}') is not a valid directory.", parent=content_host_frame.winfo_toplevel())
+        ttk.Label(content_host_frame, text=f"Custom path '{custom_path_relative}' invalid. No sounds listed.", style="Placeholder.TLabel").pack(padx=10, pady=10)
+        return
+
+    def _on_custom_path_empty():
+        final_msg = f"No common sound files found in '{os.path.basename(app_path)}' using path '{custom_path_relative}' (and its subfolders)."
+        logger.info("%s", final_msg)
+        messagebox.showinfo("No Sounds Found", final_msg, parent=content_host_frame.winfo_toplevel())
+        for widget in content_host_frame.winfo_children():
+            widget.destroy()
+        ttk.Label(content_host_frame, text=f"No sound files found in '{custom_path_relative}'.", style="Placeholder.TLabel").pack(padx=10, pady=10)
+
+    start_bundle_scan_for_tab(app_path, create_symlink_top_frame, content_host_frame, current_scan_path, custom_path_relative,
+                              on_empty=_on_custom_path_empty)
+
+
+def cancel_active_scan_for_tab(create_symlink_top_frame):
+    scanner = getattr(create_symlink_top_frame, "active_scan", None)
+    if scanner is not None:
+        scanner.cancel()
+        create_symlink_top_frame.active_scan = None
+
+
+def start_bundle_scan_for_tab(app_path, create_symlink_top_frame, content_host_frame, scan_path, path_description, on_empty):
+    """Scans scan_path on a background pool and streams found sounds into the tab in batches.
+
+    The scanner thread only puts results on a queue; the Tk thread drains it from an after() poll.
+    on_empty is called (on the Tk thread) if a scan that was not cancelled finds nothing.
+    """
+    status_frame = ttk.Frame(content_host_frame)
+    status_frame.pack(fill=tk.X, pady=(5,2))
+    progress_label = ttk.Label(status_frame, text=f"Scanning '{path_description}'...", anchor="w")
+    progress_label.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=2)
+    cancel_button = ttk.Button(status_frame, text="Cancel Scan", width=12)
+    cancel_button.pack(side=tk.RIGHT, padx=2)
+
+    scanner = core.make_scanner(scan_path, bundle_path=app_path)
+    create_symlink_top_frame.active_scan = scanner
+    cancel_button.config(command=scanner.cancel)
+
+    results_queue = queue.Queue()
+    scanner.start(
+        on_batch=lambda batch, progress: results_queue.put(("batch", batch, progress.snapshot())),
+        on_done=lambda found, error: results_queue.put(("done", found, error))
+    )
+    sound_list = {} # Created on the first batch by create_sound_list_for_tab
+
+    def _finish(found, error):
+        if getattr(create_symlink_top_frame, "active_scan", None) is scanner:
+            create_symlink_top_frame.active_scan = None
+        cancel_button.pack_forget()
+        progress = scanner.progress
+        if error is not None:
+            messagebox.showerror("Error", f"Could not read app resources from '{path_description}': {error}", parent=content_host_frame.winfo_toplevel())
+            progress_label.config(text=f"Error scanning '{path_description}'. No sounds listed.")
+            return
+        if progress.cancelled:
+            progress_label.config(text=f"Scan cancelled after {progress.dirs_scanned} folder(s); showing {len(found)} sound(s) found so far.")
+            logger.info("Scan of %s cancelled: %s", scan_path, progress.snapshot())
+            return
+        logger.info("Found %s sounds in '%s': %s", len(found), path_description, progress.snapshot())
+        if not found:
+            on_empty()
+            return
+        pruned = f", {progress.dirs_pruned} skipped by prune_patterns" if progress.dirs_pruned else ""
+        progress_label.config(text=f"Found {len(found)} sound(s) in {progress.dirs_scanned} folder(s) of '{path_description}' "
+                                   f"({progress.dirs_reused} unchanged since last scan{pruned}, {progress.elapsed:.1f}s).")
+
+    def _poll():
+        if not content_host_frame.winfo_exists():
+            scanner.cancel() # Tab was rebuilt or closed mid-scan
+            return
+        try:
+            while True:
+                kind, payload, extra = results_queue.get_nowait()
+                if kind == "batch":
+                    if not sound_list:
+                        sound_list.update(create_sound_list_for_tab(app_path, content_host_frame))
+                    add_sound_rows_for_tab(sound_list, payload)
+                    progress_label.config(text=f"Scanning '{path_description}'... {extra['dirs_scanned']} folder(s), {extra['sounds_found']} sound(s) found")
+                else:
+                    _finish(payload, extra)
+                    return
+        except queue.Empty:
+            pass
+        content_host_frame.after(50, _poll)
+
+    content_host_frame.after(50, _poll)
 
-    canvas.configure(yscrollcommand=scrollbar.set)
 
-    canvas.pack(side="left", fill="both", expand=True)
+def create_sound_list_for_tab(app_path, content_host_frame):
+    """Builds the scan-results list and its action bar. Returns the list state dict.
+
+    Results live in a ttk.Treeview, whose rows are not widgets, so only the
+    visible rows are drawn and memory stays flat however many sounds are found.
+    Preview acts on the first selected row; Browse and Replace act on every selected row.
+    """
+    actions_frame = ttk.Frame(content_host_frame)
+    actions_frame.pack(fill=tk.X, pady=(5,2))
+
+    list_frame = ttk.Frame(content_host_frame)
+    list_frame.pack(fill=tk.BOTH, expand=True)
+    tree = ttk.Treeview(list_frame, columns=("original", "info", "target"), show="headings", selectmode="extended", height=12)
+    tree.heading("original", text="App Sound File (Original)", anchor="w")
+    tree.heading("info", text="Length / Peak", anchor="w")
+    tree.heading("target", text="Your Sound (Target)", anchor="w")
+    tree.column("original", width=320, stretch=True, anchor="w")
+    tree.column("info", width=110, stretch=False, anchor="w")
+    tree.column("target", width=220, stretch=True, anchor="w")
+    scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=tree.yview)
+    tree.configure(yscrollcommand=scrollbar.set)
+    tree.pack(side="left", fill="both", expand=True)
     scrollbar.pack(side="right", fill="y")
 
-    current_symlink_options = [] 
-    default_target_sound_for_app = app_default_symlink_sources.get(app_path, "")
+    sound_list = {
+        'app_path': app_path,
+        'content_host_frame': content_host_frame,
+        'tree': tree,
+        'default_target': app_default_symlink_sources.get(app_path, ""),
+        'rows': {} # {original_path (also the Treeview item id): row_data}
+    }
 
-    for i, original_path_candidate in enumerate(sound_paths_in_app):
+    ttk.Button(actions_frame, text="Preview Original", width=15,
+               command=lambda: preview_selected_sound_row(sound_list, 'original_path')).pack(side=tk.LEFT, padx=2)
+    ttk.Button(actions_frame, text="Browse Target...", width=15,
+               command=lambda: browse_target_for_selected_sound_rows(sound_list)).pack(side=tk.LEFT, padx=2)
+    ttk.Button(actions_frame, text="Preview Target", width=15,
+               command=lambda: preview_selected_sound_row(sound_list, 'target_path')).pack(side=tk.LEFT, padx=2)
+    ttk.Button(actions_frame, text="Replace", width=10,
+               command=lambda: replace_selected_sound_row(sound_list)).pack(side=tk.LEFT, padx=2)
+    ttk.Button(actions_frame, text="Apply Default to All", width=18,
+               command=lambda: apply_default_source_to_all_rows(sound_list, content_host_frame.winfo_toplevel())).pack(side=tk.RIGHT, padx=2)
+
+    tree.bind("<Double-1>", lambda e: preview_selected_sound_row(sound_list, 'original_path'))
+    return sound_list
+
+
+def add_sound_rows_for_tab(sound_list, sound_paths_in_app):
+    """Appends one Treeview row per found sound to a list made by create_sound_list_for_tab."""
+    app_path = sound_list['app_path']
+    tree = sound_list['tree']
+    default_target_sound_for_app = sound_list['default_target']
+
+    for original_path_candidate in sound_paths_in_app:
+        if original_path_candidate in sound_list['rows']:
+            continue
         row_data = {
             'original_path': original_path_candidate,
-            'target_path_var': tk.StringVar(value=default_target_sound_for_app if default_target_sound_for_app else "<Browse for target>"),
-            'target_display_label': None
+            'target_path': default_target_sound_for_app or None
         }
+        rel_original_path = os.path.relpath(original_path_candidate, start=app_path)
+        tree.insert("", "end", iid=original_path_candidate,
+                    values=(rel_original_path, sound_row_info_text(original_path_candidate), sound_row_target_text(row_data)))
+        sound_list['rows'][original_path_candidate] = row_data
+    tab = app_tabs.get(app_path)
+    if tab is not None:
+        tab['widgets']['sound_list'] = sound_list # So apply_sound_metadata() can fill in the info column
+    core.index_sounds(sound_paths_in_app) # Unanalyzed sounds get their info filled in once indexed
 
-        row_frame = ttk.Frame(scrollable_frame)
-        row_frame.pack(fill=tk.X, pady=1, padx=1)
-        row_frame.columnconfigure(0, weight=3) 
-        row_frame.columnconfigure(1, weight=1) 
-        row_frame.columnconfigure(2, weight=0) 
-        row_frame.columnconfigure(3, weight=1) 
-        row_frame.columnconfigure(4, weight=2) 
-        row_frame.columnconfigure(5, weight=1) 
-        row_frame.columnconfigure(6, weight=1) 
 
-        rel_original_path = os.path.relpath(original_path_candidate, start=app_path)
-        ttk.Label(row_frame, text=rel_original_path, wraplength=250, anchor="w").grid(row=0, column=0, sticky="ew", padx=(0,2))
+def sound_row_info_text(original_path):
+    meta = core.sound_metadata.get(original_path)
+    if not meta:
+        return ""
+    if meta.get("error"):
+        return "?"
+    return f"{meta['duration_s']:.1f} s / {meta['peak_dbfs']:.0f} dB"
 
-        preview_original_button = ttk.Button(row_frame, text="Preview Original", width=15,
-                                           command=lambda orig_path=original_path_candidate, p_widget=content_host_frame: preview_sound(orig_path, p_widget.winfo_toplevel()))
-        preview_original_button.grid(row=0, column=1, sticky="ew", padx=2)
 
-        ttk.Label(row_frame, text="->").grid(row=0, column=2, padx=2)
-        
-        select_target_button = ttk.Button(row_frame, text="Browse...", width=10,
-                                          command=lambda r_data=row_data: select_target_for_symlink_row(r_data, content_host_frame.winfo_toplevel()))
-        select_target_button.grid(row=0, column=3, sticky="ew", padx=2)
+def sound_row_target_text(row_data):
+    target_path = row_data.get('target_path')
+    return os.path.basename(target_path) if target_path else "<Browse for target>"
 
-        row_data['target_display_label'] = ttk.Label(row_frame, textvariable=row_data['target_path_var'], wraplength=200, anchor="w")
-        row_data['target_display_label'].grid(row=0, column=4, sticky="ew", padx=2)
-        
-        save_button = ttk.Button(row_frame, text="Replace", width=10,
-                                 command=lambda r_data=row_data: handle_save_symlink_for_tab(r_data, app_path, content_host_frame.winfo_toplevel()))
-        save_button.grid(row=0, column=5, sticky="ew", padx=2)
 
-        preview_target_button = ttk.Button(row_frame, text="Preview Target", width=15, 
-                                           command=lambda r_data=row_data, p_widget=content_host_frame: preview_sound(r_data['target_path_var'].get(), p_widget.winfo_toplevel()))
-        preview_target_button.grid(row=0, column=6, sticky="ew", padx=2)
-        
-        current_symlink_options.append(row_data)
-    
-    content_host_frame.update_idletasks()
-    canvas.configure(scrollregion=canvas.bbox("all"))
+def get_selected_sound_rows(sound_list):
+    tree = sound_list['tree']
+    return [sound_list['rows'][item_id] for item_id in tree.selection() if item_id in sound_list['rows']]
+
+
+def preview_selected_sound_row(sound_list, path_key):
+    parent = sound_list['content_host_frame'].winfo_toplevel()
+    selected_rows = get_selected_sound_rows(sound_list)
+    if not selected_rows:
+        messagebox.showwarning("No Sound Selected", "Select a sound in the list first.", parent=parent)
+        return
+    preview_sound(selected_rows[0].get(path_key), parent)
+
+
+def browse_target_for_selected_sound_rows(sound_list):
+    parent = sound_list['content_host_frame'].winfo_toplevel()
+    selected_rows = get_selected_sound_rows(sound_list)
+    if not selected_rows:
+        messagebox.showwarning("No Sound Selected", "Select a sound in the list first.", parent=parent)
+        return
+    filepath = select_target_for_symlink_row(selected_rows[0], parent)
+    if not filepath:
+        return
+    for row_data in selected_rows:
+        row_data['target_path'] = filepath
+        sound_list['tree'].set(row_data['original_path'], "target", sound_row_target_text(row_data))
+
+
+def replace_selected_sound_row(sound_list):
+    parent = sound_list['content_host_frame'].winfo_toplevel()
+    selected_rows = get_selected_sound_rows(sound_list)
+    if not selected_rows:
+        messagebox.showwarning("No Sound Selected", "Select a sound in the list first.", parent=parent)
+        return
+    if len(selected_rows) == 1:
+        handle_save_symlink_for_tab(selected_rows[0], sound_list['app_path'], parent)
+    else:
+        batch_apply_replacements_for_tab(sound_list, selected_rows, parent)
 
 
 def select_target_for_symlink_row(row_data_dict, parent_widget):
+    """Asks for a target sound file and stores it on the row. Returns the chosen path or None."""
     desktop_path = os.path.expanduser("~/Desktop")
     filepath = filedialog.askopenfilename(
         title="Select Target Sound File to Link From",
@@ -1083,7 +1726,9 @@ def select_target_for_symlink_row(row_data_dict, parent_widget):
         parent=parent_widget
     )
     if filepath:
-        row_data_dict['target_path_var'].set(filepath)
+        row_data_dict['target_path'] = filepath
+        return filepath
+    return None
 
 
 def refresh_active_symlinks_for_tab(app_path, target_frame):
@@ -1092,15 +1737,13 @@ def refresh_active_symlinks_for_tab(app_path, target_frame):
         widget.destroy()
 
     active_symlinks_for_this_app = []
-    for original_file, mod_info in applied_file_modifications.items():
-        normalized_app_path = os.path.normpath(app_path)
-        normalized_original_file = os.path.normpath(original_file)
-        if normalized_original_file.startswith(normalized_app_path + os.sep):
-            active_symlinks_for_this_app.append({
-                'original_path': original_file,
-                'target_linked_to': mod_info.get('target_linked_to', '<Unknown Target>'),
-                'backup_path': mod_info.get('backup_path', '<No Backup Info>')
-            })
+    for original_file, mod_info in applied_file_modifications.for_app(app_path):
+        active_symlinks_for_this_app.append({
+            'original_path': original_file,
+            'target_linked_to': mod_info.get('target_linked_to', '<Unknown Target>'),
+            'converted_from': mod_info.get('converted_from'),
+            'backup_path': mod_info.get('backup_path', '<No Backup Info>')
+        })
 
     if not active_symlinks_for_this_app:
         ttk.Label(target_frame, text="No active sound replacements (symlinks) for this app.", style="Placeholder.TLabel").pack(padx=10, pady=10)
@@ -1110,10 +1753,12 @@ def refresh_active_symlinks_for_tab(app_path, target_frame):
     header_frame.pack(fill=tk.X, pady=(5,2))
     ttk.Label(header_frame, text="Original App Sound (Replaced)", font=("TkDefaultFont", 10, "bold")).grid(row=0, column=0, padx=2, sticky='w')
     ttk.Label(header_frame, text="Currently Linked To", font=("TkDefaultFont", 10, "bold")).grid(row=0, column=1, padx=2, sticky='w')
-    ttk.Label(header_frame, text="Action", font=("TkDefaultFont", 10, "bold")).grid(row=0, column=2, padx=2, sticky='w')
+    ttk.Label(header_frame, text="Status", font=("TkDefaultFont", 10, "bold")).grid(row=0, column=2, padx=2, sticky='w')
+    ttk.Label(header_frame, text="Action", font=("TkDefaultFont", 10, "bold")).grid(row=0, column=3, padx=2, sticky='w')
     header_frame.columnconfigure(0, weight=2)
     header_frame.columnconfigure(1, weight=2)
     header_frame.columnconfigure(2, weight=1)
+    header_frame.columnconfigure(3, weight=1)
 
     list_frame = ttk.Frame(target_frame)
     list_frame.pack(fill=tk.BOTH, expand=True)
@@ -1124,21 +1769,29 @@ def refresh_active_symlinks_for_tab(app_path, target_frame):
         row_frame.columnconfigure(0, weight=2)
         row_frame.columnconfigure(1, weight=2)
         row_frame.columnconfigure(2, weight=1)
+        row_frame.columnconfigure(3, weight=1)
 
         rel_original_path = os.path.relpath(symlink_info['original_path'], start=app_path)
         ttk.Label(row_frame, text=rel_original_path, wraplength=250, anchor="w").grid(row=0, column=0, sticky="ew", padx=(0,2))
         
         target_basename = os.path.basename(symlink_info['target_linked_to'])
+        if symlink_info['converted_from']: # Linked to a converted copy; show the sound the user picked
+            target_basename = os.path.basename(symlink_info['converted_from']) + " (converted)"
         ttk.Label(row_frame, text=target_basename, wraplength=200, anchor="w").grid(row=0, column=1, sticky="ew", padx=2)
 
+        state, _ = core.replacement_health.results.get(symlink_info['original_path'], ("unchecked", ""))
+        status_label = ttk.Label(row_frame, text=HEALTH_STATE_LABELS.get(state, state), anchor="w",
+                                 foreground="" if state in ("healthy", "unchecked") else "red")
+        status_label.grid(row=0, column=2, sticky="ew", padx=2)
+
         revert_button = ttk.Button(row_frame, text="Revert", width=10,
                                    command=lambda op=symlink_info['original_path'], ap=app_path, tf=target_frame: \
                                        revert_selected_symlink(op, ap, tf.winfo_toplevel(), tf))
-        revert_button.grid(row=0, column=2, sticky="ew", padx=2)
+        revert_button.grid(row=0, column=3, sticky="ew", padx=2)
 
         preview_active_target_button = ttk.Button(row_frame, text="Preview Target", width=15,
                                                 command=lambda path=symlink_info['target_linked_to'], p_widget=target_frame: preview_sound(path, p_widget.winfo_toplevel()))
-        preview_active_target_button.grid(row=0, column=3, sticky="ew", padx=2)
+        preview_active_target_button.grid(row=0, column=4, sticky="ew", padx=2)
 
 def revert_selected_symlink(original_path_to_revert, app_path_context, parent_widget_for_dialogs, active_symlinks_list_frame_to_refresh):
     global applied_file_modifications
@@ -1151,65 +1804,86 @@ def revert_selected_symlink(original_path_to_revert, app_path_context, parent_wi
     mod_info = applied_file_modifications.get(original_path_to_revert)
     if not mod_info:
         messagebox.showerror("Error", "Symlink information not found in records. Cannot revert.", parent=parent_widget_for_dialogs)
-        NSLog(f"Attempted to revert {original_path_to_revert}, but no record found.")
+        logger.warning("Attempted to revert %s, but no record found.", original_path_to_revert)
         return
 
     backup_file = mod_info.get("backup_path")
-    reverted_successfully = False
+    core.suspend_watch([original_path_to_revert]) # Keep the bundle watcher off this file until its record is updated
+    txn = ReplacementTransaction(journal=replacement_journal, kind="revert")
     try:
-        if os.path.islink(original_path_to_revert):
-            os.remove(original_path_to_revert)
-            NSLog(f"Removed symlink: {original_path_to_revert}")
-        elif not os.path.exists(original_path_to_revert):
-            NSLog(f"Original symlink path did not exist: {original_path_to_revert}. No symlink to remove.")
-        else:
-            NSLog(f"Path {original_path_to_revert} exists but is not a symlink. Proceeding to restore backup if possible.")
-
-        if backup_file and os.path.exists(backup_file):
-            os.rename(backup_file, original_path_to_revert)
-            NSLog(f"Restored backup: {backup_file} to {original_path_to_revert}")
-            reverted_successfully = True
-        elif backup_file:
+        outcome = txn.revert(original_path_to_revert, backup_file)
+        if outcome == REVERT_RESTORED:
+            logger.info("Restored backup: %s to %s", backup_file, original_path_to_revert)
+        elif outcome == REVERT_BACKUP_MISSING:
             messagebox.showwarning("Revert Warning", f"Backup file '{os.path.basename(backup_file)}' not found. Symlink (if any) removed, but original could not be restored.", parent=parent_widget_for_dialogs)
-            NSLog(f"Backup file {backup_file} not found for {original_path_to_revert}.")
-            if not os.path.islink(original_path_to_revert) and not os.path.exists(original_path_to_revert):
-                 reverted_successfully = True 
+            logger.warning("Backup file %s not found for %s.", backup_file, original_path_to_revert)
+        elif outcome == REVERT_ORIGINAL_PRESENT:
+            logger.warning("Path %s exists but is not a symlink, and there is no backup to restore.", original_path_to_revert)
         else: 
             messagebox.showwarning("Revert Warning", f"No backup information found for {os.path.basename(original_path_to_revert)}. Symlink (if any) removed, original not restored.", parent=parent_widget_for_dialogs)
-            NSLog(f"No backup path recorded for {original_path_to_revert}.")
-            if not os.path.islink(original_path_to_revert) and not os.path.exists(original_path_to_revert):
-                 reverted_successfully = True
+            logger.warning("No backup path recorded for %s.", original_path_to_revert)
+
+        reverted_successfully = outcome != REVERT_ORIGINAL_PRESENT
+        if reverted_successfully:
+            txn.forget(original_path_to_revert)
+        txn.commit()
 
         if reverted_successfully:
             del applied_file_modifications[original_path_to_revert]
-            save_config()
+            save_config(on_saved=txn.finish)
+            core.recheck_health([original_path_to_revert])
+            core.refresh_bundle_watch()
             messagebox.showinfo("Revert Successful", f"Successfully reverted sound replacement for {os.path.basename(original_path_to_revert)}.", parent=parent_widget_for_dialogs)
-            NSLog(f"Reverted and removed record for {original_path_to_revert}")
+            logger.info("Reverted and removed record for %s", original_path_to_revert)
         else:
+            txn.finish()
             messagebox.showerror("Revert Issue", f"Could not fully revert {os.path.basename(original_path_to_revert)}. See console for details.", parent=parent_widget_for_dialogs)
 
     except Exception as e:
+        txn.rollback()
         messagebox.showerror("Revert Error", f"Error reverting {os.path.basename(original_path_to_revert)}: {e}", parent=parent_widget_for_dialogs)
-        NSLog(f"Exception during revert of {original_path_to_revert}: {e}")
+        logger.error("Exception during revert of %s: %s", original_path_to_revert, e)
+    finally:
+        core.resume_watch([original_path_to_revert])
 
     refresh_active_symlinks_for_tab(app_path_context, active_symlinks_list_frame_to_refresh)
 
 if __name__ == "__main__":
     global root 
-    print(f"Tkinter version: {tk.TkVersion}") 
+    # Queue log records from here on; the config's log file is added by start_logging()
+    log_pipeline.install()
+    log_pipeline.start(gui_log_handlers())
+    # --profile-startup: print how long each startup phase took, then close the app
+    profile_startup = "--profile-startup" in sys.argv[1:]
+    startup_profiler.record("imports", _process_started, _imports_finished)
+    logger.debug("Tkinter version: %s", tk.TkVersion) 
     if not os.path.exists(SOUNDS_DIR):
         os.makedirs(SOUNDS_DIR)
-        print(f"'{SOUNDS_DIR}' directory created. Please add sound files there.")
-
-    monitor_thread = threading.Thread(target=start_app_monitoring, daemon=True)
-    monitor_thread.start()
+        logger.info("'%s' directory created. Please add sound files there.", SOUNDS_DIR)
 
-    root = tk.Tk()
-    setup_gui(root)
+    with startup_profiler.measure("window"):
+        root = tk.Tk()
+        setup_gui(root)
+        root.update() # Map and draw the window before any config, tab or sound-library work
 
     def on_closing():
-        save_config() 
+        save_config()
+        if not core.close(): # Flushes pending config writes
+            messagebox.showerror("Config Save Error", f"Could not save configuration to {APP_CONFIG_FILE}: {config_saver.stats()['last_error']}", parent=root)
+        logger.info("Config saver stats at exit: %s", config_saver.stats())
+        logger.info("Sound cache stats at exit: %s", sound_cache.stats())
+        stop_app_monitoring()
+        core.stop_bundle_watch()
+        shutdown_playback_executor()
+        logger.info("Log pipeline stats at exit: %s", log_pipeline.stats())
+        log_pipeline.stop() # Writes out whatever is still queued
         root.destroy()
 
+    def on_startup_finished():
+        if profile_startup:
+            print(startup_profiler.format_report())
+            on_closing()
+
     root.protocol("WM_DELETE_WINDOW", on_closing)
+    root.after(0, finish_startup, root, on_startup_finished)
     root.mainloop() 
\ No newline at end of file
@@ -0,0 +1,247 @@
+"""Decoded-audio cache used for launch sounds and previews.
+
+Sounds are decoded once into raw PCM and kept in memory, so playing a sound
+again does not reopen or re-decode the file. Entries are evicted least
+recently used first once the memory budget is exceeded, and an entry is
+dropped automatically when the file's size or mtime changes on disk.
+"""
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import wave
+from collections import OrderedDict
+
+DEFAULT_CACHE_BUDGET_BYTES = 64 * 1024 * 1024
+
+_numpy_module = None
+
+
+def numpy_or_none():
+    """NumPy, imported on first use so it doesn't slow down startup. None if it isn't installed."""
+    global _numpy_module
+    if _numpy_module is None:
+        try:
+            import numpy
+            _numpy_module = numpy
+        except ImportError:  # Optional; the pure-Python fallbacks are much slower on long files
+            _numpy_module = False
+    return _numpy_module or None
+
+
+class SoundDecodeError(Exception):
+    """Raised when a sound file cannot be decoded to PCM."""
+
+
+class DecodedSound:
+    """Interleaved PCM frames plus the format needed to play them back."""
+    __slots__ = ("path", "frames", "sample_rate", "channels", "sample_width")
+
+    def __init__(self, path, frames, sample_rate, channels, sample_width):
+        self.path = path
+        self.frames = frames
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = sample_width
+
+    @property
+    def nbytes(self):
+        return len(self.frames)
+
+    @property
+    def frame_count(self):
+        return len(self.frames) // (self.channels * self.sample_width)
+
+    @property
+    def duration(self):
+        return self.frame_count / float(self.sample_rate) if self.sample_rate else 0.0
+
+    def to_wav_bytes(self):
+        """Wraps the PCM frames in a WAV container, for players that want file data."""
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav_out:
+            wav_out.setnchannels(self.channels)
+            wav_out.setsampwidth(self.sample_width)
+            wav_out.setframerate(self.sample_rate)
+            wav_out.writeframes(self.frames)
+        return buffer.getvalue()
+
+
+def _read_pcm_wav(path, source_path=None):
+    with wave.open(path, "rb") as wav_in:
+        return DecodedSound(
+            source_path or path,
+            wav_in.readframes(wav_in.getnframes()),
+            wav_in.getframerate(),
+            wav_in.getnchannels(),
+            wav_in.getsampwidth(),
+        )
+
+
+def _converter_command(source_path, wav_path):
+    """Returns the command that converts source_path to 16-bit PCM WAV, or None."""
+    if sys.platform == "darwin" and shutil.which("afconvert"):
+        return ["afconvert", "-f", "WAVE", "-d", "LEI16", source_path, wav_path]
+    if shutil.which("ffmpeg"):
+        return ["ffmpeg", "-v", "error", "-y", "-i", source_path,
+                "-f", "wav", "-acodec", "pcm_s16le", wav_path]
+    return None
+
+
+def decode_sound(path):
+    """Decodes a sound file to PCM.
+
+    Plain PCM .wav files are read directly; anything else (.mp3, .m4a, .aiff,
+    compressed .wav) goes through afconvert on macOS or ffmpeg elsewhere.
+    """
+    if path.lower().endswith(".wav"):
+        try:
+            return _read_pcm_wav(path)
+        except (wave.Error, EOFError):
+            pass  # Not plain PCM, let the converter handle it.
+
+    fd, wav_path = tempfile.mkstemp(suffix=".wav")
+    os.close(fd)
+    try:
+        command = _converter_command(path, wav_path)
+        if command is None:
+            raise SoundDecodeError(f"No decoder available for {path} (need afconvert or ffmpeg)")
+        result = subprocess.run(command, capture_output=True)
+        if result.returncode != 0:
+            raise SoundDecodeError(f"{command[0]} failed for {path}: {result.stderr.decode(errors='replace').strip()}")
+        return _read_pcm_wav(wav_path, source_path=path)
+    except (OSError, wave.Error, EOFError) as e:
+        raise SoundDecodeError(f"Could not decode {path}: {e}") from e
+    finally:
+        try:
+            os.remove(wav_path)
+        except OSError:
+            pass
+
+
+class SoundCache:
+    """Thread-safe LRU cache of DecodedSound objects bounded by total PCM bytes."""
+
+    def __init__(self, budget_bytes=DEFAULT_CACHE_BUDGET_BYTES, decoder=decode_sound):
+        self._budget_bytes = budget_bytes
+        self._decoder = decoder
+        self._entries = OrderedDict()  # {abs_path: (stat_key, DecodedSound)}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _stat_key(path):
+        st = os.stat(path)  # Follows symlinks, so retargeting a link invalidates too.
+        return (st.st_size, st.st_mtime_ns, st.st_ino)
+
+    def get(self, path):
+        """Returns the decoded sound for path, decoding it on a miss.
+
+        Raises OSError if the file is missing and SoundDecodeError if it
+        cannot be decoded.
+        """
+        key = os.path.abspath(path)
+        stat_key = self._stat_key(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == stat_key:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                self._drop(key)
+                self.invalidations += 1
+            self.misses += 1
+
+        # Decode outside the lock so a slow file does not stall other lookups.
+        decoded = self._decoder(key)
+        with self._lock:
+            self._store(key, stat_key, decoded, evict=True)
+        return decoded
+
+    def preload(self, paths, evict=False):
+        """Decodes paths into the cache ahead of time.
+
+        With evict=False, sounds that would only fit by evicting something are
+        skipped, so warming the library never pushes out assigned sounds.
+        Returns the number of newly cached sounds.
+        """
+        loaded = 0
+        for path in paths:
+            key = os.path.abspath(path)
+            try:
+                stat_key = self._stat_key(key)
+                with self._lock:
+                    entry = self._entries.get(key)
+                    if entry is not None and entry[0] == stat_key:
+                        continue
+                    if not evict and self._bytes >= self._budget_bytes:
+                        break
+                decoded = self._decoder(key)
+            except (OSError, SoundDecodeError):
+                continue
+            with self._lock:
+                if self._store(key, stat_key, decoded, evict=evict):
+                    loaded += 1
+        return loaded
+
+    def invalidate(self, path=None):
+        """Drops one entry, or the whole cache when path is None."""
+        with self._lock:
+            if path is None:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+                self._bytes = 0
+            elif os.path.abspath(path) in self._entries:
+                self._drop(os.path.abspath(path))
+                self.invalidations += 1
+
+    def set_budget(self, budget_bytes):
+        with self._lock:
+            self._budget_bytes = budget_bytes
+            self._evict_to(budget_bytes)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "budget_bytes": self._budget_bytes,
+            }
+
+    # Helpers below expect self._lock to be held.
+    def _store(self, key, stat_key, decoded, evict):
+        if decoded.nbytes > self._budget_bytes:
+            return False  # Larger than the whole budget; play it uncached.
+        if key in self._entries:
+            self._drop(key)
+        if self._bytes + decoded.nbytes > self._budget_bytes:
+            if not evict:
+                return False
+            self._evict_to(self._budget_bytes - decoded.nbytes)
+        self._entries[key] = (stat_key, decoded)
+        self._bytes += decoded.nbytes
+        return True
+
+    def _drop(self, key):
+        _, decoded = self._entries.pop(key)
+        self._bytes -= decoded.nbytes
+
+    def _evict_to(self, target_bytes):
+        while self._entries and self._bytes > target_bytes:
+            _, (_, decoded) = self._entries.popitem(last=False)
+            self._bytes -= decoded.nbytes
+            self.evictions += 1
@@ -0,0 +1,443 @@
+"""In-process software mixer that plays every sound through one pre-opened output stream.
+
+When each sound goes to its own NSSound/playsound call, overlapping
+sounds compete for the device and every call pays for opening it.
+AudioMixer keeps one output stream open instead and sums the active
+voices in NumPy for every block the stream asks for:
+
+  - each voice has its own gain, applied on top of the master gain
+  - at most max_voices play at once; a sound past the limit replaces the
+    one that has been playing longest
+  - a block that would clip is scaled down by a limiter, which lets go
+    again over release_s
+
+Sounds are converted once to the mixer's rate and channel count as
+float32 and kept while they are in use, so replaying a cached sound
+costs no conversion.
+
+The sink decides where mixed blocks go:
+
+  SoundDeviceSink  the default output device, through the optional
+                   sounddevice package (PortAudio)
+  NullSink         discards blocks, at real-time pace or as fast as they
+                   can be mixed; for measuring latency and throughput
+                   without audio hardware
+  WaveFileSink     writes blocks to a 16-bit WAV file
+
+NumPy and sounddevice are imported on first use. Without them, callers
+keep using the system player.
+"""
+import logging
+import math
+import threading
+import time
+import wave
+from collections import OrderedDict
+
+from audio_cache import numpy_or_none
+
+logger = logging.getLogger("sound_replacer.mixer")
+
+DEFAULT_SAMPLE_RATE = 48000
+DEFAULT_CHANNELS = 2
+DEFAULT_BLOCK_FRAMES = 512
+DEFAULT_MAX_VOICES = 8
+CONVERTED_BUDGET_BYTES = 32 * 1024 * 1024 # Converted float32 sounds kept for replays
+
+_sounddevice_module = None
+
+
+def _sounddevice():
+    """sounddevice, imported on first use. None if it (or the PortAudio library) isn't installed."""
+    global _sounddevice_module
+    if _sounddevice_module is None:
+        try:
+            import sounddevice
+            _sounddevice_module = sounddevice
+        except (ImportError, OSError): # OSError: the package is there but PortAudio isn't
+            _sounddevice_module = False
+    return _sounddevice_module or None
+
+
+def sounddevice_available():
+    return _sounddevice() is not None
+
+
+def pcm_to_float(decoded, sample_rate, channels):
+    """decoded's PCM as a contiguous float32 (frames, channels) array at sample_rate, in -1..1."""
+    np = numpy_or_none()
+    width, source_channels = decoded.sample_width, decoded.channels
+    frame_bytes = width * source_channels
+    raw = decoded.frames[: len(decoded.frames) // frame_bytes * frame_bytes]
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif width == 3:
+        packed = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        values = packed[:, 0] | (packed[:, 1] << 8) | (packed[:, 2] << 16)
+        samples = np.where(values >= 1 << 23, values - (1 << 24), values).astype(np.float32) / float(1 << 23)
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+    else:
+        raise ValueError(f"Unsupported sample width {width} in {decoded.path}")
+    samples = samples.reshape(-1, source_channels)
+
+    if source_channels != channels:
+        if channels == 1:
+            samples = samples.mean(axis=1, keepdims=True)
+        elif source_channels == 1:
+            samples = np.repeat(samples, channels, axis=1)
+        elif source_channels > channels:
+            samples = samples[:, :channels]
+        else:
+            samples = np.concatenate([samples, np.zeros((len(samples), channels - source_channels), np.float32)], axis=1)
+
+    if decoded.sample_rate != sample_rate and len(samples) > 1:
+        # Linear interpolation: plenty for short UI sounds, and cheap enough to do on the playback worker
+        count = int(round(len(samples) * sample_rate / float(decoded.sample_rate)))
+        positions = np.arange(count) * (decoded.sample_rate / float(sample_rate))
+        source = np.arange(len(samples))
+        samples = np.stack([np.interp(positions, source, samples[:, c]) for c in range(channels)], axis=1)
+    return np.ascontiguousarray(samples, dtype=np.float32)
+
+
+class Voice:
+    """One sound in the mix.
+
+    started is set (and started_at, monotonic, recorded) when its first
+    block is mixed; finished when it has played out, was stopped or was
+    replaced. gain may be changed while it plays.
+    """
+
+    __slots__ = ("name", "samples", "gain", "position", "started_at", "started", "finished", "stopped")
+
+    def __init__(self, samples, gain=1.0, name=None):
+        self.name = name
+        self.samples = samples
+        self.gain = gain
+        self.position = 0
+        self.started_at = None
+        self.started = threading.Event()
+        self.finished = threading.Event()
+        self.stopped = False
+
+    def stop(self):
+        """Silences the voice from the next block on."""
+        self.stopped = True
+
+
+class AudioMixer:
+    """Mixes voices into one output stream owned by sink. See the module docstring.
+
+    Raises RuntimeError if NumPy isn't installed.
+    """
+
+    def __init__(self, sink, sample_rate=DEFAULT_SAMPLE_RATE, channels=DEFAULT_CHANNELS,
+                 block_frames=DEFAULT_BLOCK_FRAMES, max_voices=DEFAULT_MAX_VOICES, gain=1.0, release_s=0.25):
+        self._np = numpy_or_none()
+        if self._np is None:
+            raise RuntimeError("The audio mixer needs NumPy")
+        if max_voices < 1 or block_frames < 1:
+            raise ValueError("max_voices and block_frames must both be at least 1")
+        self.sink = sink
+        self.sample_rate = int(sample_rate)
+        self.channels = int(channels)
+        self.block_frames = int(block_frames)
+        self.max_voices = int(max_voices)
+        self.gain = float(gain)
+        self.release_s = float(release_s)
+        self.running = False
+        self._voices = [] # Oldest first
+        self._pending = []
+        self._cond = threading.Condition()
+        self._limiter_gain = 1.0
+        self._converted = OrderedDict() # {id(decoded): (decoded, samples)}; holding decoded keeps its id unique
+        self._converted_bytes = 0
+        self._convert_lock = threading.Lock()
+        self.voices_started = 0
+        self.voices_stolen = 0
+        self.blocks = 0
+        self.limited_blocks = 0
+        self.render_errors = 0
+
+    def start(self):
+        """Opens the sink's stream. Raises whatever the sink raises (no device, no sounddevice)."""
+        with self._cond:
+            self.running = True
+        try:
+            self.sink.start(self)
+        except Exception:
+            with self._cond:
+                self.running = False
+            raise
+        return self
+
+    def stop(self):
+        """Closes the stream; voices still playing are cut off and marked finished."""
+        with self._cond:
+            self.running = False
+            voices, self._voices, self._pending = self._voices + self._pending, [], []
+            self._cond.notify_all()
+        self.sink.stop()
+        for voice in voices:
+            voice.finished.set()
+
+    def samples_for(self, decoded):
+        """decoded converted to the mixer's format, from the conversion cache when possible."""
+        key = id(decoded)
+        with self._convert_lock:
+            entry = self._converted.get(key)
+            if entry is not None and entry[0] is decoded:
+                self._converted.move_to_end(key)
+                return entry[1]
+        samples = pcm_to_float(decoded, self.sample_rate, self.channels)
+        with self._convert_lock:
+            if key in self._converted:
+                self._converted_bytes -= self._converted.pop(key)[1].nbytes
+            if samples.nbytes <= CONVERTED_BUDGET_BYTES:
+                self._converted[key] = (decoded, samples)
+                self._converted_bytes += samples.nbytes
+                while self._converted_bytes > CONVERTED_BUDGET_BYTES:
+                    _, (_, evicted) = self._converted.popitem(last=False)
+                    self._converted_bytes -= evicted.nbytes
+        return samples
+
+    def play(self, decoded, gain=1.0):
+        """Adds a DecodedSound to the mix from the next block on. Returns its Voice.
+
+        Raises RuntimeError if the mixer isn't running.
+        """
+        voice = Voice(self.samples_for(decoded), gain=gain, name=decoded.path)
+        with self._cond:
+            if not self.running:
+                raise RuntimeError("The audio mixer is not running")
+            self._pending.append(voice)
+            self._cond.notify_all()
+        return voice
+
+    def stop_all(self):
+        with self._cond:
+            for voice in self._voices + self._pending:
+                voice.stop()
+
+    def wait_for_voices(self, timeout):
+        """Waits up to timeout seconds for something to play. Returns True if there is."""
+        with self._cond:
+            if not self._voices and not self._pending and self.running:
+                self._cond.wait(timeout)
+            return bool(self._voices or self._pending)
+
+    def render(self, frames, out=None):
+        """Mixes the next frames frames into out (or a new array) and returns it.
+
+        Runs on the sink's thread (PortAudio's callback for a device), so it
+        never blocks on anything but a short lock.
+        """
+        np = self._np
+        if out is None:
+            out = np.zeros((frames, self.channels), dtype=np.float32)
+        else:
+            out.fill(0.0)
+        stolen = []
+        with self._cond:
+            if self._pending:
+                for voice in self._pending:
+                    if len(self._voices) >= self.max_voices:
+                        stolen.append(self._voices.pop(0))
+                    self._voices.append(voice)
+                self.voices_started += len(self._pending)
+                self.voices_stolen += len(stolen)
+                self._pending = []
+            voices = list(self._voices)
+        self.blocks += 1
+        for voice in stolen:
+            voice.finished.set()
+        if not voices:
+            self._limiter_gain = 1.0
+            return out
+
+        now = time.monotonic()
+        finished = []
+        for voice in voices:
+            if voice.stopped:
+                finished.append(voice)
+                continue
+            chunk = voice.samples[voice.position:voice.position + frames]
+            if voice.gain == 1.0:
+                out[:len(chunk)] += chunk
+            else:
+                out[:len(chunk)] += chunk * np.float32(voice.gain)
+            if voice.started_at is None:
+                voice.started_at = now
+                voice.started.set()
+            voice.position += len(chunk)
+            if voice.position >= len(voice.samples):
+                finished.append(voice)
+        if finished:
+            with self._cond:
+                self._voices = [voice for voice in self._voices if voice not in finished]
+            for voice in finished:
+                voice.finished.set()
+
+        if self.gain != 1.0:
+            out *= np.float32(self.gain)
+        # Limiter: drop at once to the gain that keeps this block in range, recover over release_s
+        peak = float(np.abs(out).max())
+        target = 1.0 / peak if peak > 1.0 else 1.0
+        if target < self._limiter_gain:
+            self._limiter_gain = target
+        elif self._limiter_gain < 1.0:
+            recovery = math.exp(-frames / (self.sample_rate * self.release_s)) if self.release_s > 0 else 0.0
+            self._limiter_gain = min(target, 1.0 - (1.0 - self._limiter_gain) * recovery)
+        if self._limiter_gain < 1.0:
+            out *= np.float32(self._limiter_gain)
+            np.clip(out, -1.0, 1.0, out=out) # Rounding can leave a hair over full scale
+            self.limited_blocks += 1
+        return out
+
+    def stats(self):
+        with self._cond:
+            active = len(self._voices) + len(self._pending)
+        return {
+            "sink": self.sink.name,
+            "sample_rate": self.sample_rate,
+            "block_frames": self.block_frames,
+            "active_voices": active,
+            "max_voices": self.max_voices,
+            "voices_started": self.voices_started,
+            "voices_stolen": self.voices_stolen,
+            "blocks": self.blocks,
+            "limited_blocks": self.limited_blocks,
+            "render_errors": self.render_errors,
+            "converted_bytes": self._converted_bytes,
+        }
+
+
+class SoundDeviceSink:
+    """The system output device through sounddevice, opened once in start() and kept open."""
+
+    name = "sounddevice"
+
+    def __init__(self, device=None, latency="low"):
+        self.device = device
+        self.latency = latency
+        self.status_errors = 0 # Underruns and other problems PortAudio reported to the callback
+        self._stream = None
+
+    def start(self, mixer):
+        sd = _sounddevice()
+        if sd is None:
+            raise RuntimeError("Playing through the mixer needs the sounddevice package and PortAudio")
+
+        def _callback(outdata, frames, time_info, status):
+            if status:
+                self.status_errors += 1
+            try:
+                mixer.render(frames, out=outdata)
+            except Exception:
+                # Raising here would abort the stream for good; play silence instead
+                mixer.render_errors += 1
+                outdata.fill(0)
+
+        self._stream = sd.OutputStream(samplerate=mixer.sample_rate, channels=mixer.channels, dtype="float32",
+                                       blocksize=mixer.block_frames, latency=self.latency, device=self.device,
+                                       callback=_callback)
+        self._stream.start()
+
+    def stop(self):
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+
+class _ThreadedSink:
+    """Pulls blocks from the mixer on its own thread and hands them to consume().
+
+    Blocks are only mixed while something plays. With realtime=True they
+    come at the pace a device would ask for them; otherwise as fast as the
+    mixer can produce them.
+    """
+
+    name = "threaded"
+
+    def __init__(self, realtime=True):
+        self.realtime = realtime
+        self.frames_written = 0
+        self.late_blocks = 0 # Real-time blocks that were mixed after their deadline
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self, mixer):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, args=(mixer,), name=f"mixer-{self.name}", daemon=True)
+        self._thread.start()
+
+    def _run(self, mixer):
+        block_seconds = mixer.block_frames / float(mixer.sample_rate)
+        deadline = None
+        while not self._stop_event.is_set():
+            if not mixer.wait_for_voices(0.1):
+                deadline = None # Idle; the next sound starts a fresh block clock
+                continue
+            try:
+                block = mixer.render(mixer.block_frames)
+            except Exception as e:
+                mixer.render_errors += 1
+                logger.error("Mixer render failed: %s", e)
+                continue
+            self.consume(block)
+            self.frames_written += len(block)
+            if not self.realtime:
+                continue
+            now = time.monotonic()
+            deadline = (deadline or now) + block_seconds
+            if deadline > now:
+                self._stop_event.wait(deadline - now)
+            elif now - deadline > block_seconds:
+                self.late_blocks += 1
+                deadline = now
+
+    def consume(self, block):
+        pass
+
+    def stop(self, timeout=2.0):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+class NullSink(_ThreadedSink):
+    """Discards mixed blocks; for latency and throughput measurements without audio hardware."""
+
+    name = "null"
+
+
+class WaveFileSink(_ThreadedSink):
+    """Writes mixed blocks to a 16-bit WAV file (silence between sounds is left out)."""
+
+    name = "wav"
+
+    def __init__(self, path, realtime=False):
+        super().__init__(realtime=realtime)
+        self.path = path
+        self._wav = None
+
+    def start(self, mixer):
+        self._wav = wave.open(self.path, "wb")
+        self._wav.setnchannels(mixer.channels)
+        self._wav.setsampwidth(2)
+        self._wav.setframerate(mixer.sample_rate)
+        super().start(mixer)
+
+    def consume(self, block):
+        np = numpy_or_none()
+        self._wav.writeframes((np.clip(block, -1.0, 1.0) * 32767.0).astype("<i2").tobytes())
+
+    def stop(self, timeout=2.0):
+        super().stop(timeout)
+        if self._wav is not None:
+            self._wav.close()
+            self._wav = None
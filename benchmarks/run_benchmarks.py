@@ -0,0 +1,431 @@
+"""Times scanning, applying/reverting, config load/save, tab construction and the audio mixer on synthetic data.
+
+  python benchmarks/run_benchmarks.py                      # Full run, written to benchmarks/results/
+  python benchmarks/run_benchmarks.py --quick              # Smaller sizes, for a quick check
+  python benchmarks/run_benchmarks.py --only scan,config --compare benchmarks/results/baseline.json
+  xvfb-run python benchmarks/run_benchmarks.py --only tabs # Tab construction needs a display
+
+Each result is the median (and min/max) of --repeat runs. Results are
+written as JSON with the Python version, platform and git commit, so
+runs can be compared over time with --compare. Everything happens in a
+temporary folder; the real config and sounds folder are never touched.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from replacer_core import SoundReplacerCore  # noqa: E402
+from synthetic_apps import build_app, write_wav  # noqa: E402
+
+RESULTS_FORMAT_VERSION = 1
+DEFAULT_RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+# Sizes per run mode; --quick keeps a run under a few seconds
+SIZES = {
+    "full": {
+        "apps": [
+            {"name": "Small", "sounds": 200, "lproj": 30, "frameworks": 4, "framework_depth": 4, "decoys": 2000},
+            {"name": "Large", "sounds": 3000, "lproj": 60, "frameworks": 12, "framework_depth": 7, "decoys": 30000},
+        ],
+        "apply_batches": [100, 1000],
+        "config_records": [10, 1000, 100000],
+        "tab_apps": 50, "tab_active_rows": 200, "tab_list_rows": 5000,
+        "mixer_voices": [1, 8, 32], "mixer_plays": 50,
+    },
+    "quick": {
+        "apps": [
+            {"name": "Small", "sounds": 200, "lproj": 30, "frameworks": 4, "framework_depth": 4, "decoys": 2000},
+        ],
+        "apply_batches": [100],
+        "config_records": [10, 1000],
+        "tab_apps": 10, "tab_active_rows": 50, "tab_list_rows": 1000,
+        "mixer_voices": [1, 8], "mixer_plays": 20,
+    },
+}
+
+
+class Skip(Exception):
+    """Raised by a benchmark that cannot run here (e.g. no display for Tk)."""
+
+
+def timed(func):
+    started = time.perf_counter()
+    func()
+    return time.perf_counter() - started
+
+
+def summarize(benchmark, params, times, **extra):
+    return {
+        "benchmark": benchmark,
+        "params": params,
+        "repeats": len(times),
+        "times_s": times,
+        "median_s": statistics.median(times),
+        "min_s": min(times),
+        "max_s": max(times),
+        "extra": extra,
+    }
+
+
+def new_core(workspace):
+    os.makedirs(os.path.join(workspace, "sounds"), exist_ok=True)
+    core = SoundReplacerCore(workspace)
+    core.load_config()
+    return core
+
+
+# --- Benchmarks ---
+
+def bench_scan(workspace, sizes, repeat):
+    """The scan behind "Browse App Sounds": cold (empty inventory) and warm (incremental rescan)."""
+    results = []
+    for spec in sizes["apps"]:
+        app = build_app(os.path.join(workspace, "apps"), **spec)
+        core = new_core(os.path.join(workspace, f"scan-{spec['name']}"))
+        batches = []
+
+        def scan():
+            scanner = core.make_scanner(app.app_path)
+            found = scanner.scan(on_batch=lambda paths, progress: batches.append(len(paths)))
+            expected = len(app.sound_paths) + len(app.lproj_sound_paths)  # Nothing is pruned by default
+            if len(found) != expected:
+                raise RuntimeError(f"Scan found {len(found)} sounds, expected {expected}")
+
+        def cold():
+            core.sound_inventory.invalidate(app.app_path)
+            scan()
+
+        params = {"app": spec["name"], "sounds": spec["sounds"], "files": app.file_count}
+        results.append(summarize("scan_cold", params, [timed(cold) for _ in range(repeat)]))
+        results.append(summarize("scan_warm", params, [timed(scan) for _ in range(repeat)]))
+        core.close()
+    return results
+
+
+def bench_apply_revert(workspace, sizes, repeat):
+    """Batch apply (all-or-nothing symlinks) and parallel revert, including recording them in the config."""
+    results = []
+    largest = max(sizes["apply_batches"])
+    app = build_app(os.path.join(workspace, "apps"), name="ApplyTarget", sounds=largest, lproj=4,
+                    frameworks=2, framework_depth=2, decoys=0)
+    core = new_core(os.path.join(workspace, "apply"))
+    target = os.path.join(core.sounds_dir, "replacement.wav")
+    write_wav(target)
+    for batch in sizes["apply_batches"]:
+        pairs = [(path, target) for path in app.sound_paths[:batch]]
+        apply_times, revert_times = [], []
+        for _ in range(repeat):
+            def apply():
+                result = core.apply(pairs, match_format=False)
+                core.record_apply(result)
+                if not result.ok:
+                    raise RuntimeError(f"Apply failed: {result.error}")
+            apply_times.append(timed(apply))
+            core.config_saver.flush()
+
+            def revert():
+                core.record_revert(core.revert(core.records_for(app.app_path)))
+            revert_times.append(timed(revert))
+            core.config_saver.flush()
+        results.append(summarize("apply", {"files": batch}, apply_times))
+        results.append(summarize("revert", {"files": batch}, revert_times))
+    core.close()
+    return results
+
+
+def _fake_records(count, apps=50):
+    records = {}
+    for i in range(count):
+        original = f"/Applications/Synthetic{i % apps}.app/Contents/Resources/Sounds/sound_{i:06d}.wav"
+        records[original] = {"backup_path": original + ".bak", "target_linked_to": f"/Users/me/Sounds/pick_{i % 97}.wav"}
+    return records
+
+
+def bench_config(workspace, sizes, repeat):
+    """load_config and save (full write, then a one-record change) per storage backend and record count.
+
+    config_mark_dirty is the part of a one-record save that runs on the caller's (UI) thread;
+    config_query_app is the storage backend's records_for_app() for one of the 50 apps.
+    """
+    results = []
+    for count in sizes["config_records"]:
+        records = _fake_records(count)
+        for backend in ("json", "sqlite"):
+            params = {"records": count, "backend": backend}
+            save_times, change_times, mark_times, query_times, load_times = [], [], [], [], []
+            for attempt in range(repeat):
+                folder = os.path.join(workspace, f"config-{backend}-{count}-{attempt}")
+                os.makedirs(folder)
+                core = SoundReplacerCore(folder)
+                core.storage_backend = backend
+                core.load_config()
+                core.applied_file_modifications.update(records)
+                core.monitored_apps.update({os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(path)))): None
+                                            for path in records})
+
+                def save():
+                    core.save()
+                    core.config_saver.flush()
+                save_times.append(timed(save))
+                changed = next(iter(records))
+                core.applied_file_modifications[changed] = dict(records[changed], target_linked_to="/tmp/changed.wav")
+                change_times.append(timed(save))
+                core.applied_file_modifications[changed] = dict(records[changed])
+                mark_times.append(timed(core.save))
+                core.config_saver.flush()
+                app_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(changed))))
+                found = {}
+                query_times.append(timed(lambda: found.update(core.config_saver.backend.records_for_app(app_path))))
+                if changed not in found:
+                    raise RuntimeError(f"records_for_app({app_path}) did not return {changed}")
+                core.close()
+
+                loaded = SoundReplacerCore(folder)
+                load_times.append(timed(loaded.load_config))
+                if len(loaded.applied_file_modifications) != count:
+                    raise RuntimeError(f"Loaded {len(loaded.applied_file_modifications)} records, expected {count}")
+                loaded.close()
+            results.append(summarize("config_save_full", params, save_times))
+            results.append(summarize("config_save_one_change", params, change_times))
+            results.append(summarize("config_mark_dirty", params, mark_times))
+            results.append(summarize("config_query_app", params, query_times))
+            results.append(summarize("config_load", params, load_times))
+    return results
+
+
+def bench_tabs(workspace, sizes, repeat):
+    """Builds the main window's tabs: the notebook, one populated tab, and a long scan-results list."""
+    import tkinter as tk
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        raise Skip(f"no display ({e}); run under xvfb-run")
+    root.withdraw()
+    previous_dir = os.getcwd()
+    folder = os.path.join(workspace, "tabs")
+    os.makedirs(os.path.join(folder, "sounds"))
+    os.chdir(folder) # app_monitor keeps its config next to the working directory
+    try:
+        import app_monitor # Its log records go nowhere: the log pipeline is only installed by the app's main
+        app_monitor.setup_gui(root)
+        apps = [f"/Applications/Synthetic{i}.app" for i in range(sizes["tab_apps"])]
+        records = {f"{apps[0]}/Contents/Resources/sound_{i:05d}.wav":
+                   {"backup_path": f"{apps[0]}/Contents/Resources/sound_{i:05d}.wav.bak",
+                    "target_linked_to": "/Users/me/Sounds/pick.wav"}
+                   for i in range(sizes["tab_active_rows"])}
+        list_rows = [f"{apps[0]}/Contents/Resources/Sounds/list_{i:06d}.wav" for i in range(sizes["tab_list_rows"])]
+
+        def clear():
+            app_monitor.monitored_apps.clear()
+            app_monitor.applied_file_modifications.clear()
+            app_monitor.update_app_list()
+            root.update_idletasks()
+
+        notebook_times, populate_times, list_times = [], [], []
+        for _ in range(repeat):
+            clear()
+            app_monitor.monitored_apps.update({app: "None" for app in apps})
+            app_monitor.applied_file_modifications.update(records)
+
+            def notebook():
+                app_monitor.update_app_list() # Adds every tab and populates the selected one
+                root.update_idletasks()
+            notebook_times.append(timed(notebook))
+
+            def populate():
+                tab = app_monitor.app_tabs[apps[0]]
+                tab['populated'] = False
+                for child in tab['frame'].winfo_children():
+                    child.destroy()
+                app_monitor.ensure_app_tab_populated(apps[0])
+                root.update_idletasks()
+            populate_times.append(timed(populate))
+
+            host = tk.Frame(root)
+
+            def sound_list():
+                listing = app_monitor.create_sound_list_for_tab(apps[0], host)
+                app_monitor.add_sound_rows_for_tab(listing, list_rows)
+                root.update_idletasks()
+            list_times.append(timed(sound_list))
+            host.destroy()
+        clear()
+    finally:
+        os.chdir(previous_dir)
+        root.destroy()
+    return [
+        summarize("tabs_notebook", {"apps": len(apps)}, notebook_times),
+        summarize("tabs_populate", {"active_rows": len(records)}, populate_times),
+        summarize("tabs_sound_list", {"rows": len(list_rows)}, list_times),
+    ]
+
+
+def bench_mixer(workspace, sizes, repeat):
+    """The audio mixer on a null sink: mixing one second of overlapping voices, and play() to first block."""
+    from audio_cache import decode_sound
+    from audio_mixer import AudioMixer, NullSink
+    from audio_cache import numpy_or_none
+    if numpy_or_none() is None:
+        raise Skip("numpy is not installed")
+    os.makedirs(workspace)
+    path = os.path.join(workspace, "voice.wav")
+    write_wav(path, frames=44100, sample_rate=44100) # One second; resampled to the mixer's 48 kHz
+    decoded = decode_sound(path)
+    results = []
+    for voices in sizes["mixer_voices"]:
+        mixer = AudioMixer(NullSink(realtime=False), max_voices=voices)
+        mixer.running = True # render() is driven here, not by the sink's thread
+
+        def mix_second():
+            for _ in range(voices):
+                mixer.play(decoded, gain=1.0 / voices)
+            while mixer.stats()["active_voices"]:
+                mixer.render(mixer.block_frames)
+        times = [timed(mix_second) for _ in range(repeat)]
+        results.append(summarize("mixer_render_1s", {"voices": voices}, times,
+                                 realtime_factor=round(1.0 / statistics.median(times), 1)))
+
+    # Start latency at device pace: up to one block while other sounds play, about zero when idle
+    mixer = AudioMixer(NullSink(realtime=True)).start()
+    latencies = []
+    try:
+        for _ in range(sizes["mixer_plays"]):
+            requested = time.monotonic()
+            voice = mixer.play(decoded, gain=0.1)
+            if not voice.started.wait(1.0):
+                raise RuntimeError("The mixer did not start a voice within a second")
+            latencies.append(voice.started_at - requested)
+            time.sleep(0.003)
+    finally:
+        mixer.stop()
+    results.append(summarize("mixer_start_latency", {"block_frames": mixer.block_frames}, latencies,
+                             late_blocks=mixer.sink.late_blocks))
+    return results
+
+
+BENCHMARKS = {
+    "scan": bench_scan,
+    "apply": bench_apply_revert,
+    "config": bench_config,
+    "tabs": bench_tabs,
+    "mixer": bench_mixer,
+}
+
+
+# --- Results ---
+
+def git_commit():
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True)
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "git_commit": git_commit(),
+    }
+
+
+def result_key(result):
+    return result["benchmark"], json.dumps(result["params"], sort_keys=True)
+
+
+def compare(baseline, current):
+    """Lines comparing each benchmark's median with the baseline's."""
+    previous = {result_key(result): result for result in baseline.get("results", [])}
+    lines = [f"Compared with {baseline.get('environment', {}).get('git_commit') or 'baseline'} "
+             f"({baseline.get('started_at', '?')}):"]
+    for result in current["results"]:
+        before = previous.get(result_key(result))
+        label = f"{result['benchmark']} {result['params']}"
+        if before is None:
+            lines.append(f"  {label}: {result['median_s'] * 1000:.1f} ms (new)")
+            continue
+        ratio = result["median_s"] / before["median_s"] if before["median_s"] else float("inf")
+        lines.append(f"  {label}: {before['median_s'] * 1000:.1f} -> {result['median_s'] * 1000:.1f} ms "
+                     f"({(ratio - 1) * 100:+.0f}%)")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Sound Replacer on synthetic app bundles.")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes for a fast check")
+    parser.add_argument("--only", help=f"comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement (default 3)")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare medians with")
+    parser.add_argument("--keep-workspace", action="store_true", help="leave the generated bundles in place")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format="%(name)s %(levelname)s: %(message)s")
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+    sizes = SIZES["quick" if args.quick else "full"]
+    run = {
+        "format_version": RESULTS_FORMAT_VERSION,
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "mode": "quick" if args.quick else "full",
+        "environment": environment(),
+        "results": [],
+        "skipped": [],
+    }
+
+    workspace = tempfile.mkdtemp(prefix="sound-replacer-bench-")
+    try:
+        for name in names:
+            print(f"{name}...", flush=True)
+            try:
+                results = BENCHMARKS[name](os.path.join(workspace, name), sizes, max(1, args.repeat))
+            except Skip as e:
+                print(f"  skipped: {e}")
+                run["skipped"].append({"benchmark": name, "reason": str(e)})
+                continue
+            for result in results:
+                print(f"  {result['benchmark']} {result['params']}: median {result['median_s'] * 1000:.1f} ms "
+                      f"(min {result['min_s'] * 1000:.1f}, max {result['max_s'] * 1000:.1f})")
+            run["results"].extend(results)
+    finally:
+        if args.keep_workspace:
+            print(f"Workspace kept at {workspace}")
+        else:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+    output = args.output
+    if output is None:
+        os.makedirs(DEFAULT_RESULTS_DIR, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(DEFAULT_RESULTS_DIR, f"{stamp}-{run['environment']['git_commit'] or 'nogit'}.json")
+    with open(output, "w") as f:
+        json.dump(run, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        print("\n".join(compare(baseline, run)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
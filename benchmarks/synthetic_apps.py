@@ -0,0 +1,122 @@
+"""Builds synthetic .app bundles shaped like real ones, for the benchmarks.
+
+A generated bundle has what makes real bundles slow or tricky to scan:
+
+  Contents/Resources/<lang>.lproj/          many localization folders, each with a sound
+  Contents/Resources/Sounds/<group>/        the sounds a user would replace
+  Contents/Frameworks/<F>.framework/        deep Versions/A/Resources trees, with the
+                                            usual Versions/Current and top-level symlinks
+  Contents/PlugIns/, _CodeSignature/, ...   decoys: images, nibs, plists, ".wav.txt"
+                                            files and folders named like sounds
+
+Sound files are tiny valid WAVs, so applying and reverting them behaves
+like it does on real sounds. Layout is deterministic for a given seed.
+"""
+import os
+import random
+import wave
+from collections import namedtuple
+
+from bundle_scanner import SOUND_EXTENSIONS
+
+SyntheticApp = namedtuple("SyntheticApp", "app_path sound_paths lproj_sound_paths file_count")
+
+LANGUAGES = ("en", "de", "fr", "es", "it", "ja", "ko", "zh_CN", "zh_TW", "pt_BR", "pt_PT", "ru", "nl", "sv",
+             "da", "fi", "nb", "pl", "tr", "cs", "hu", "el", "he", "ar", "th", "id", "ms", "vi", "uk", "ro",
+             "sk", "hr", "ca", "hi", "es_419", "fr_CA", "en_GB", "en_AU", "Base")
+DECOY_EXTENSIONS = (".png", ".nib", ".plist", ".strings", ".car", ".icns", ".dylib", ".json", ".wav.txt", ".mp3.sig")
+
+
+def write_wav(path, frames=400, sample_rate=8000):
+    with wave.open(path, "wb") as wav_out:
+        wav_out.setnchannels(1)
+        wav_out.setsampwidth(2)
+        wav_out.setframerate(sample_rate)
+        wav_out.writeframes(b"\x00\x00" * frames)
+
+
+def _touch(path, size=0):
+    with open(path, "wb") as f:
+        if size:
+            f.write(b"\x00" * size)
+
+
+def build_app(parent_dir, name="Synthetic", sounds=200, lproj=30, frameworks=4, framework_depth=4,
+              decoys=1000, seed=0):
+    """Creates parent_dir/<name>.app and returns a SyntheticApp.
+
+    sounds is the number of replaceable sounds outside .lproj folders, spread
+    over Resources/Sounds and the frameworks' Resources. Each .lproj folder
+    also gets a localized sound, listed in lproj_sound_paths.
+    """
+    rng = random.Random(seed)
+    app_path = os.path.join(parent_dir, f"{name}.app")
+    contents = os.path.join(app_path, "Contents")
+    resources = os.path.join(contents, "Resources")
+    file_count = 0
+
+    os.makedirs(os.path.join(contents, "MacOS"))
+    _touch(os.path.join(contents, "MacOS", name), 4096)
+    _touch(os.path.join(contents, "Info.plist"), 512)
+    os.makedirs(os.path.join(contents, "_CodeSignature"))
+    _touch(os.path.join(contents, "_CodeSignature", "CodeResources"), 1024)
+    file_count += 3
+
+    # Localization folders, each with strings, a nib and a localized alert sound
+    lproj_sound_paths = []
+    for language in (LANGUAGES * (lproj // len(LANGUAGES) + 1))[:lproj]:
+        folder = os.path.join(resources, f"{language}.lproj")
+        if os.path.isdir(folder):
+            folder = os.path.join(resources, f"{language}_{len(lproj_sound_paths)}.lproj")
+        os.makedirs(folder)
+        _touch(os.path.join(folder, "Localizable.strings"), 256)
+        _touch(os.path.join(folder, "MainMenu.nib"), 256)
+        sound_path = os.path.join(folder, "Alert.wav")
+        write_wav(sound_path)
+        lproj_sound_paths.append(sound_path)
+        file_count += 3
+
+    # Frameworks: Versions/A/Resources/<nested>/..., with Current and top-level symlinks like real ones
+    sound_dirs = []
+    for f in range(frameworks):
+        framework = os.path.join(contents, "Frameworks", f"Synth{f}.framework")
+        version = os.path.join(framework, "Versions", "A")
+        folder = os.path.join(version, "Resources")
+        for depth in range(framework_depth):
+            folder = os.path.join(folder, f"Level{depth}")
+            sound_dirs.append(folder)
+        os.makedirs(folder)
+        _touch(os.path.join(version, f"Synth{f}"), 2048)
+        os.symlink("A", os.path.join(framework, "Versions", "Current"))
+        os.symlink("Versions/Current/Resources", os.path.join(framework, "Resources"))
+        file_count += 1
+
+    groups = max(1, sounds // 50)
+    for g in range(groups):
+        folder = os.path.join(resources, "Sounds", f"Group{g}")
+        os.makedirs(folder)
+        sound_dirs.append(folder)
+
+    sound_paths = []
+    for i in range(sounds):
+        folder = rng.choice(sound_dirs)
+        extension = SOUND_EXTENSIONS[i % len(SOUND_EXTENSIONS)]
+        path = os.path.join(folder, f"sound_{i:05d}{extension}")
+        if extension == ".wav":
+            write_wav(path)
+        else:
+            _touch(path, 512) # Scanned and replaced by name; never decoded by the benchmarks
+        sound_paths.append(path)
+        file_count += 1
+
+    # Decoys: non-sound files everywhere, plus folders whose names end like sounds
+    decoy_dirs = sound_dirs + [resources, os.path.join(contents, "PlugIns", "Helper.bundle", "Contents", "Resources")]
+    os.makedirs(decoy_dirs[-1])
+    for i in range(decoys):
+        folder = rng.choice(decoy_dirs)
+        _touch(os.path.join(folder, f"decoy_{i:06d}{DECOY_EXTENSIONS[i % len(DECOY_EXTENSIONS)]}"))
+        file_count += 1
+    for i in range(max(1, decoys // 500)):
+        os.makedirs(os.path.join(rng.choice(decoy_dirs), f"Fake{i}.wav"))
+
+    return SyntheticApp(app_path, sorted(sound_paths), lproj_sound_paths, file_count)
@@ -0,0 +1,244 @@
+"""Parallel, streaming scanner for sound files inside app bundles.
+
+Subdirectories are listed with os.scandir on a small thread pool, so large
+Electron/Chromium bundles are walked concurrently. Found sounds are handed
+to an on_batch callback as they are discovered instead of all at the end,
+and a scan can be cancelled part-way through.
+
+When given a SoundInventoryIndex, directories whose mtime/inode match the
+index are answered from it instead of being listed again.
+"""
+import fnmatch
+import os
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from sound_inventory import dir_signature
+
+SOUND_EXTENSIONS = (".wav", ".mp3", ".aiff", ".m4a")
+DEFAULT_PRUNE_PATTERNS = () # Nothing is skipped unless scan_settings asks; pruned folders may hold sounds
+
+
+def compile_prune_patterns(patterns):
+    """Compiles glob patterns for directory names into one case-insensitive regex (or None)."""
+    if not patterns:
+        return None
+    return re.compile("|".join(fnmatch.translate(p) for p in patterns), re.IGNORECASE)
+
+
+class ScanProgress:
+    """Counters for a scan in progress. Updated only by the coordinating thread."""
+
+    def __init__(self):
+        self.dirs_scanned = 0
+        self.dirs_pruned = 0
+        self.dirs_reused = 0
+        self.files_seen = 0
+        self.sounds_found = 0
+        self.errors = []  # [(path, message)] for directories that could not be read
+        self.cancelled = False
+        self.done = False
+        self.started_at = time.monotonic()
+        self.finished_at = None
+
+    @property
+    def elapsed(self):
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def snapshot(self):
+        return {
+            "dirs_scanned": self.dirs_scanned,
+            "dirs_pruned": self.dirs_pruned,
+            "dirs_reused": self.dirs_reused,
+            "files_seen": self.files_seen,
+            "sounds_found": self.sounds_found,
+            "errors": len(self.errors),
+            "cancelled": self.cancelled,
+            "done": self.done,
+            "elapsed": self.elapsed,
+        }
+
+
+class BundleScanner:
+    """Finds sound files under root_path.
+
+    prune_patterns are glob patterns matched against directory names (e.g.
+    "*.lproj"); matching directories are skipped entirely. max_depth limits
+    how many levels below root_path are entered (None means unlimited).
+    Symlinked directories are not followed, matching os.walk's default.
+
+    inventory/bundle_path enable incremental scans against a
+    SoundInventoryIndex; the index is updated and saved when the scan ends.
+
+    on_finished(progress, error), if given, is called on the scanning
+    thread whenever scan() ends: error is None or the OSError it raised.
+    """
+
+    def __init__(self, root_path, extensions=SOUND_EXTENSIONS, prune_patterns=DEFAULT_PRUNE_PATTERNS,
+                 max_depth=None, workers=4, batch_size=100, batch_interval=0.1,
+                 inventory=None, bundle_path=None, on_finished=None):
+        self.root_path = root_path
+        self.extensions = tuple(ext.lower() for ext in extensions)
+        self._prune_re = compile_prune_patterns(prune_patterns)
+        self.settings_key = repr((sorted(prune_patterns or ()), max_depth, sorted(self.extensions)))
+        self.inventory = inventory
+        self.bundle_path = bundle_path or root_path
+        self._cached_dirs = {}
+        self.max_depth = max_depth
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.progress = ScanProgress()
+        self.on_finished = on_finished
+        self._cancel_event = threading.Event()
+        self._thread = None
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def _scan_dir(self, path, depth):
+        """Lists one directory, or reuses its index entry if the directory is unchanged.
+
+        Returns (path, sound_paths, [(subdir, depth)], files_seen, pruned,
+        (path, error) or None, index_record, reused).
+        """
+        sounds = []
+        subdirs = []
+        files_seen = 0
+        pruned = 0
+        descend = self.max_depth is None or depth < self.max_depth
+        try:
+            # Take the signature before listing, so a change mid-listing forces a re-list next time.
+            signature = dir_signature(path)
+            cached = self._cached_dirs.get(path)
+            if cached is not None and cached.get("sig") == signature:
+                return (path, cached["sounds"], [(subdir, depth + 1) for subdir in cached["subdirs"]],
+                        cached["files"], cached.get("pruned", 0), None, cached, True)
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                    except OSError:
+                        is_dir = False
+                    if is_dir:
+                        if self._prune_re is not None and self._prune_re.match(entry.name):
+                            pruned += 1
+                        elif descend:
+                            subdirs.append((entry.path, depth + 1))
+                    else:
+                        files_seen += 1
+                        if entry.name.lower().endswith(self.extensions):
+                            sounds.append(entry.path)
+        except OSError as e:
+            return path, [], [], 0, 0, (path, str(e)), None, False
+        sounds.sort()
+        record = {"sig": signature, "sounds": sounds, "subdirs": [subdir for subdir, _ in subdirs],
+                  "files": files_seen, "pruned": pruned}
+        return path, sounds, subdirs, files_seen, pruned, None, record, False
+
+    def scan(self, on_batch=None):
+        """Scans synchronously and returns every sound path found.
+
+        on_batch(list_of_paths, progress) is called from this thread whenever
+        batch_size sounds have accumulated or batch_interval has passed.
+        Raises OSError if root_path itself cannot be read.
+        """
+        try:
+            found = self._scan(on_batch)
+        except OSError as e:
+            self.progress.finished_at = time.monotonic()
+            if self.on_finished is not None:
+                self.on_finished(self.progress, e)
+            raise
+        if self.on_finished is not None:
+            self.on_finished(self.progress, None)
+        return found
+
+    def _scan(self, on_batch):
+        progress = self.progress
+        found = []
+        batch = []
+        visited = {}  # {dir_path: index_record} for the inventory
+        if self.inventory is not None:
+            self._cached_dirs = self.inventory.get_scan(self.bundle_path, self.root_path, self.settings_key)
+        last_flush = time.monotonic()
+
+        def flush():
+            nonlocal batch, last_flush
+            if on_batch is not None and batch:
+                on_batch(batch, progress)
+            batch = []
+            last_flush = time.monotonic()
+
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bundle-scan")
+        try:
+            pending = {pool.submit(self._scan_dir, self.root_path, 0)}
+            is_root = True
+            while pending:
+                done, pending = wait(pending, timeout=self.batch_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path, sounds, subdirs, files_seen, pruned, error, record, reused = future.result()
+                    if error is not None:
+                        if is_root:
+                            raise OSError(error[1])
+                        progress.errors.append(error)
+                    else:
+                        visited[path] = record
+                    is_root = False
+                    if reused:
+                        progress.dirs_reused += 1
+                    progress.dirs_scanned += 1
+                    progress.dirs_pruned += pruned
+                    progress.files_seen += files_seen
+                    progress.sounds_found += len(sounds)
+                    found.extend(sounds)
+                    batch.extend(sounds)
+                    if not self.cancelled:
+                        for subdir, depth in subdirs:
+                            pending.add(pool.submit(self._scan_dir, subdir, depth))
+                if self.cancelled:
+                    progress.cancelled = True
+                    break
+                if len(batch) >= self.batch_size or time.monotonic() - last_flush >= self.batch_interval:
+                    flush()
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+        flush()
+        if self.inventory is not None:
+            self.inventory.update_scan(self.bundle_path, self.root_path, self.settings_key, visited,
+                                       complete=not progress.cancelled)
+            try:
+                self.inventory.save()
+            except OSError as e:
+                progress.errors.append((self.inventory.index_path, str(e)))
+        progress.done = True
+        progress.finished_at = time.monotonic()
+        return found
+
+    def start(self, on_batch=None, on_done=None):
+        """Runs scan() on a background thread.
+
+        on_done(found_paths, error) is called on that thread when the scan
+        ends; error is None on success (including cancellation).
+        """
+        def run():
+            try:
+                found = self.scan(on_batch)
+            except OSError as e:
+                self.progress.done = True
+                self.progress.finished_at = time.monotonic()
+                if on_done is not None:
+                    on_done([], e)
+                return
+            if on_done is not None:
+                on_done(found, None)
+
+        self._thread = threading.Thread(target=run, name="bundle-scan-coordinator", daemon=True)
+        self._thread.start()
+        return self._thread
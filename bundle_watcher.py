@@ -0,0 +1,339 @@
+"""Filesystem watchers that notice when app bundles holding our replacements change.
+
+A BundleWatcher watches a set of directories (the folders that contain
+replaced sounds, plus each bundle root) on its own thread. Events are
+debounced: an app update touches thousands of files in a burst, so the
+callback fires once, with the set of affected directories, after the
+burst has been quiet for `debounce` seconds (or `max_delay` after it
+began, whichever comes first).
+
+Backends:
+  FSEventsBundleWatcher - macOS, FSEvents stream with WatchRoot, so a
+                          bundle being replaced wholesale is reported.
+  InotifyBundleWatcher  - Linux, inotify via ctypes.
+  PollingBundleWatcher  - stats every watched directory periodically;
+                          works anywhere.
+
+Watches are re-established after every flush, so a directory that was
+deleted and recreated (as an update does) is picked up again.
+"""
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+from sound_inventory import dir_signature
+
+logger = logging.getLogger("sound_replacer.watch")
+
+class BundleWatcher:
+    """Base class: debouncing, the watched-path set and the worker thread.
+
+    Subclasses implement _sync_watches() (make the OS watches match
+    self._paths), _wait_for_events(timeout) (return changed directory
+    paths, waiting at most timeout seconds) and _close().
+    """
+    name = "base"
+
+    def __init__(self, debounce=2.0, max_delay=10.0):
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._paths = set()
+        self._paths_changed = True
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._callback = None
+        self._pending = set()
+        self._first_event = None
+        self._last_event = None
+        self.flushes = 0
+        self.events = 0
+
+    def set_paths(self, paths):
+        """Replaces the set of watched directories. Missing ones are retried on each flush."""
+        with self._lock:
+            self._paths = {os.path.normpath(p) for p in paths}
+            self._paths_changed = True
+
+    def watched_paths(self):
+        with self._lock:
+            return set(self._paths)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, callback):
+        """Starts watching; callback(set_of_changed_dirs) is called on the watcher thread."""
+        if self.running:
+            return
+        self._callback = callback
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f"bundle-watch-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        try:
+            while not self._stop_event.is_set():
+                with self._lock:
+                    resync, self._paths_changed = self._paths_changed, False
+                if resync:
+                    self._sync_watches()
+                for path in self._wait_for_events(self._next_timeout()):
+                    self._note(path)
+                self._maybe_flush()
+        finally:
+            self._close()
+
+    def _note(self, path):
+        now = time.monotonic()
+        self.events += 1
+        if not self._pending:
+            self._first_event = now
+        self._last_event = now
+        self._pending.add(os.path.normpath(path))
+
+    def _next_timeout(self):
+        if not self._pending:
+            return 0.5  # Idle; wake up now and then to notice stop() and set_paths()
+        now = time.monotonic()
+        return max(0.0, min(self._last_event + self.debounce, self._first_event + self.max_delay) - now)
+
+    def _maybe_flush(self):
+        if not self._pending:
+            return
+        now = time.monotonic()
+        if now - self._last_event < self.debounce and now - self._first_event < self.max_delay:
+            return
+        changed, self._pending = self._pending, set()
+        self.flushes += 1
+        # Directories may have been replaced by the burst; point the watches at the new ones.
+        self._sync_watches()
+        if self._callback is not None:
+            try:
+                self._callback(changed)
+            except Exception:
+                # Keep watching; a failed handler must not end the watcher thread
+                logger.exception("Bundle change handler failed for %d folder(s)", len(changed))
+
+    def _sync_watches(self):
+        raise NotImplementedError
+
+    def _wait_for_events(self, timeout):
+        raise NotImplementedError
+
+    def _close(self):
+        pass
+
+
+class PollingBundleWatcher(BundleWatcher):
+    """Compares each watched directory's (mtime, inode) every `interval` seconds."""
+    name = "poll"
+
+    def __init__(self, interval=2.0, debounce=2.0, max_delay=10.0):
+        super().__init__(debounce=debounce, max_delay=max_delay)
+        self.interval = interval
+        self._signatures = {}
+
+    @staticmethod
+    def _signature(path):
+        try:
+            return dir_signature(path)
+        except OSError:
+            return None
+
+    def _sync_watches(self):
+        paths = self.watched_paths()
+        self._signatures = {path: self._signatures.get(path, self._signature(path)) for path in paths}
+
+    def _wait_for_events(self, timeout):
+        self._stop_event.wait(min(timeout, self.interval))
+        changed = []
+        for path, old in list(self._signatures.items()):
+            new = self._signature(path)
+            if new != old:
+                self._signatures[path] = new
+                changed.append(path)
+        return changed
+
+
+# inotify constants from <sys/inotify.h>
+_IN_MODIFY = 0x002
+_IN_ATTRIB = 0x004
+_IN_MOVED_FROM = 0x040
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_DELETE_SELF = 0x400
+_IN_MOVE_SELF = 0x800
+_IN_Q_OVERFLOW = 0x4000
+_IN_IGNORED = 0x8000
+_IN_ONLYDIR = 0x01000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_WATCH_MASK = (_IN_MODIFY | _IN_ATTRIB | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+               | _IN_DELETE_SELF | _IN_MOVE_SELF | _IN_ONLYDIR)
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class InotifyBundleWatcher(BundleWatcher):
+    """inotify watches on every watched directory and on the parent of each bundle root.
+
+    inotify follows inodes, not paths: when an update moves a bundle away
+    and puts a new one in its place, the old watches report IN_MOVE_SELF /
+    IN_DELETE_SELF and the flush re-adds watches on the new directories.
+    """
+    name = "inotify"
+
+    def __init__(self, debounce=2.0, max_delay=10.0):
+        super().__init__(debounce=debounce, max_delay=max_delay)
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"inotify_init1 failed: {os.strerror(errno)}")
+        self._wd_paths = {}  # {wd: path}
+        self._path_wds = {}  # {path: wd}
+
+    def _sync_watches(self):
+        wanted = self.watched_paths()
+        for path in wanted:
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), _WATCH_MASK)
+            if wd < 0:
+                self._drop_path(path)  # Does not exist (yet); retried on the next flush
+                continue
+            old_wd = self._path_wds.get(path)
+            if old_wd is not None and old_wd != wd:
+                self._remove_wd(old_wd)  # The path now names a new directory
+            self._wd_paths[wd] = path
+            self._path_wds[path] = wd
+        for path in [p for p in self._path_wds if p not in wanted]:
+            self._drop_path(path)
+
+    def _drop_path(self, path):
+        wd = self._path_wds.pop(path, None)
+        if wd is not None:
+            self._remove_wd(wd)
+
+    def _remove_wd(self, wd):
+        if self._wd_paths.pop(wd, None) is not None:
+            self._libc.inotify_rm_watch(self._fd, wd)
+
+    def _wait_for_events(self, timeout):
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        changed = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size + length
+            if mask & _IN_Q_OVERFLOW:
+                # The kernel queue overflowed (wd -1) and events were lost; treat everything as changed.
+                logger.warning("inotify event queue overflowed; rescanning all watched folders")
+                changed.extend(self.watched_paths())
+                continue
+            path = self._wd_paths.get(wd)
+            if path is None:
+                continue
+            if mask & _IN_IGNORED:
+                # The kernel dropped this watch (directory deleted); forget it so the flush re-adds it.
+                self._wd_paths.pop(wd, None)
+                if self._path_wds.get(path) == wd:
+                    del self._path_wds[path]
+            changed.append(path)
+        return changed
+
+    def _close(self):
+        try:
+            os.close(self._fd)
+        except OSError:
+            pass
+
+
+class FSEventsBundleWatcher(BundleWatcher):
+    """FSEvents stream over the watched directories, pumped on the watcher thread's run loop.
+
+    Requires PyObjC's FSEvents bindings. kFSEventStreamCreateFlagWatchRoot
+    makes FSEvents report when a watched path itself is moved or replaced.
+    """
+    name = "fsevents"
+
+    def __init__(self, debounce=2.0, max_delay=10.0):
+        super().__init__(debounce=debounce, max_delay=max_delay)
+        import CoreFoundation  # Imported lazily; only available on macOS with PyObjC
+        import FSEvents
+        self._fsevents = FSEvents
+        self._cf = CoreFoundation
+        self._stream = None
+        self._stream_paths = None
+        self._received = []
+
+    def _on_events(self, stream, info, count, paths, flags, event_ids):
+        for path in paths[:count]:
+            # Events name the directory that changed; a root-changed event names the watched path.
+            self._received.append(path.rstrip("/") or "/")
+
+    def _stop_stream(self):
+        fs = self._fsevents
+        if self._stream is not None:
+            fs.FSEventStreamStop(self._stream)
+            fs.FSEventStreamInvalidate(self._stream)
+            fs.FSEventStreamRelease(self._stream)
+            self._stream = None
+
+    def _sync_watches(self):
+        # Keep the stream unless the watched set changed: WatchRoot already follows replaced roots.
+        paths = sorted(p for p in self.watched_paths() if os.path.isdir(p))
+        if paths == self._stream_paths and self._stream is not None:
+            return
+        self._stop_stream()
+        self._stream_paths = paths
+        if not paths:
+            return
+        fs = self._fsevents
+        self._stream = fs.FSEventStreamCreate(
+            None, self._on_events, None, paths, fs.kFSEventStreamEventIdSinceNow,
+            min(self.debounce, 1.0), fs.kFSEventStreamCreateFlagNoDefer | fs.kFSEventStreamCreateFlagWatchRoot)
+        fs.FSEventStreamScheduleWithRunLoop(self._stream, self._cf.CFRunLoopGetCurrent(), self._cf.kCFRunLoopDefaultMode)
+        fs.FSEventStreamStart(self._stream)
+
+    def _wait_for_events(self, timeout):
+        if self._stream is None:
+            self._stop_event.wait(timeout)
+        else:
+            self._cf.CFRunLoopRunInMode(self._cf.kCFRunLoopDefaultMode, max(timeout, 0.01), True)
+        received, self._received = self._received, []
+        return received
+
+    def _close(self):
+        self._stop_stream()
+
+
+def default_bundle_watcher(debounce=2.0, max_delay=10.0):
+    """FSEvents on macOS, inotify on Linux, polling elsewhere (or if the native API is unavailable)."""
+    try:
+        if sys.platform == "darwin":
+            return FSEventsBundleWatcher(debounce=debounce, max_delay=max_delay)
+        if sys.platform.startswith("linux"):
+            return InotifyBundleWatcher(debounce=debounce, max_delay=max_delay)
+    except (ImportError, OSError, AttributeError):
+        pass
+    return PollingBundleWatcher(debounce=debounce, max_delay=max_delay)
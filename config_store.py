@@ -0,0 +1,539 @@
+"""Persistence for the app's configuration.
+
+ConfigSaver is a write-behind saver: callers mark the config dirty and
+return immediately, and a background thread writes the changes after a
+short delay, so a burst of changes turns into one write. What callers
+hand over is a partial snapshot: the small sections whole, and only the
+records of INCREMENTAL_SECTIONS that changed, so marking the config
+dirty costs as much as the change, not as much as the whole config.
+
+The changes go to a storage backend:
+  - JSONConfigBackend rewrites one JSON file atomically (temp file + fsync
+    + rename), so a crash never leaves a half-written config behind;
+  - SQLiteConfigBackend keeps one row per app / modification, indexed by
+    app path and original path, and only writes the rows that changed;
+    records_for_app() is an index lookup.
+
+open_config_backend() picks one, migrating a large JSON config to SQLite
+once.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import sqlite3
+except ImportError:  # Python builds without sqlite3 just keep using JSON
+    sqlite3 = None
+
+# Sections of the config that are dicts of per-key entries
+# Settings sections (and the launch rules, keyed by rule name), stored key by key in SQLite's settings table
+SETTINGS_SECTIONS = ("playback_settings", "scan_settings", "watch_settings", "health_settings",
+                     "transcode_settings", "metrics_settings", "log_settings", "launch_rules")
+CONFIG_SECTIONS = ("monitored_apps", "applied_file_modifications", "app_default_symlink_sources") + SETTINGS_SECTIONS
+# Sections that partial snapshots only carry the changed entries of; removed entries map to DELETED
+INCREMENTAL_SECTIONS = ("applied_file_modifications",)
+
+# "auto" moves to SQLite once this many file modifications are recorded
+SQLITE_AUTO_THRESHOLD = 500
+
+
+def write_json_atomic(path, data, indent=None):
+    """Writes data as JSON to path via a temp file in the same directory, fsync and rename."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix="." + os.path.basename(path) + ".", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=indent)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return  # Not supported on every platform; the rename itself is still atomic.
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
+
+class _Deleted:
+    def __repr__(self):
+        return "DELETED"
+
+
+DELETED = _Deleted()  # Marks an entry of an incremental section that was removed
+
+
+def merge_changes(older, newer):
+    """One partial snapshot equivalent to applying older, then newer."""
+    merged = dict(newer)
+    for section in INCREMENTAL_SECTIONS:
+        if section in older:
+            merged[section] = {**older[section], **newer.get(section, {})}
+    return merged
+
+
+def apply_changes(data, changes):
+    """Applies a partial snapshot to a full config dict, in place."""
+    for section, value in changes.items():
+        if section not in INCREMENTAL_SECTIONS:
+            data[section] = value
+            continue
+        entries = data.setdefault(section, {})
+        for key, entry in value.items():
+            if entry is DELETED:
+                entries.pop(key, None)
+            else:
+                entries[key] = entry
+    return data
+
+
+def owning_app_path(original_path, app_paths):
+    """Returns the app in app_paths whose bundle contains original_path (the innermost one), or None."""
+    return app_owner(app_paths)(original_path)
+
+
+def app_owner(app_paths):
+    """owning_app_path() for many paths: owner(original_path) walks up its folders instead of trying every app."""
+    apps = {}
+    for app_path in sorted(app_paths, key=len):  # On a tie after normalizing, the longer spelling wins
+        apps[os.path.normpath(app_path)] = app_path
+
+    def owner(original_path):
+        folder = os.path.dirname(os.path.normpath(original_path))
+        while folder not in apps:
+            parent = os.path.dirname(folder)
+            if parent == folder:
+                return None
+            folder = parent
+        return apps[folder]
+    return owner
+
+
+class JSONConfigBackend:
+    """The whole config as one JSON file, rewritten atomically on every save.
+
+    Keeps the config as last loaded/written, so write_changes() can apply
+    a partial snapshot to it and write the file out whole.
+    """
+    name = "json"
+
+    def __init__(self, path, indent=4):
+        self.path = path
+        self.indent = indent
+        self._data = {}
+        self._lock = threading.Lock()  # Guards _data: written on the saver thread, queried from others
+
+    def load(self):
+        """Returns the config dict, or None if the file does not exist. Raises ValueError if it is corrupt."""
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        # The caller gets its own section dicts; records are shared, but they are replaced, never edited
+        with self._lock:
+            self._data = {section: dict(value) if isinstance(value, dict) else value for section, value in data.items()}
+        return data
+
+    def write(self, snapshot):
+        with self._lock:
+            write_json_atomic(self.path, snapshot, indent=self.indent)
+            self._data = snapshot
+
+    def write_changes(self, changes):
+        """Writes the config with a partial snapshot (see the module docstring) applied."""
+        with self._lock:
+            write_json_atomic(self.path, apply_changes(self._data, changes), indent=self.indent)
+
+    def records_for_app(self, app_path):
+        """{original_path: record} for the saved records app_path owns (see owning_app_path). Scans every record."""
+        with self._lock:
+            owner = app_owner(self._data.get("monitored_apps", {}))
+            return {path: record for path, record in self._data.get("applied_file_modifications", {}).items()
+                    if owner(path) == app_path}
+
+    def close(self):
+        pass
+
+
+class SQLiteConfigBackend:
+    """The config as SQLite tables.
+
+    applied_file_modifications rows carry the owning app's path, indexed,
+    so records_for_app() is an index lookup. write_changes() touches only
+    the rows of the records a partial snapshot carries, plus the rows of
+    the small sections that differ from what was last written, in a single
+    transaction; its cost follows the change, not the number of records.
+    """
+    name = "sqlite"
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS monitored_apps (
+            app_path TEXT PRIMARY KEY,
+            sound TEXT
+        );
+        CREATE TABLE IF NOT EXISTS file_modifications (
+            original_path TEXT PRIMARY KEY,
+            app_path TEXT,
+            record TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS file_modifications_by_app ON file_modifications (app_path);
+        CREATE TABLE IF NOT EXISTS default_sources (
+            app_path TEXT PRIMARY KEY,
+            source TEXT
+        );
+        CREATE TABLE IF NOT EXISTS settings (
+            section TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT,
+            PRIMARY KEY (section, key)
+        );
+    """
+
+    def __init__(self, path):
+        if sqlite3 is None:
+            raise RuntimeError("sqlite3 is not available in this Python build")
+        self.path = path
+        self._lock = threading.Lock()
+        # Loaded on the UI thread, written on the saver thread; the lock serializes both.
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.executescript(self._SCHEMA)
+        self._sections = {}  # The small (non-incremental) sections as last loaded/written, to diff against
+
+    def load(self):
+        """Returns the config dict (empty sections if the database is new)."""
+        with self._lock:
+            conn = self._conn
+            data = {
+                "monitored_apps": dict(conn.execute("SELECT app_path, sound FROM monitored_apps")),
+                "applied_file_modifications": {path: json.loads(record) for path, record in
+                                               conn.execute("SELECT original_path, record FROM file_modifications")},
+                "app_default_symlink_sources": dict(conn.execute("SELECT app_path, source FROM default_sources")),
+            }
+            data.update({section: {} for section in SETTINGS_SECTIONS})
+            for section, key, value in conn.execute("SELECT section, key, value FROM settings"):
+                if section in SETTINGS_SECTIONS:
+                    data[section][key] = json.loads(value)
+            self._sections = self._small_sections(data)
+            return data
+
+    @staticmethod
+    def _small_sections(data):
+        # A deep copy (settings hold lists), but only of the sections that stay small
+        return json.loads(json.dumps({section: value for section, value in data.items()
+                                      if section in CONFIG_SECTIONS and section not in INCREMENTAL_SECTIONS}))
+
+    def records_for_app(self, app_path):
+        """{original_path: record} for the saved records app_path owns (see owning_app_path), via the app_path index."""
+        with self._lock:
+            rows = self._conn.execute("SELECT original_path, record FROM file_modifications WHERE app_path = ?",
+                                      (app_path,)).fetchall()
+        return {path: json.loads(record) for path, record in rows}
+
+    def write(self, snapshot):
+        """Replaces whatever the database holds with a full snapshot (used to migrate a JSON config)."""
+        self._transaction(snapshot, replace=True)
+
+    def write_changes(self, changes):
+        """Writes a partial snapshot (see the module docstring)."""
+        self._transaction(changes, replace=False)
+
+    def _transaction(self, changes, replace):
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                last = self._sections
+                if replace:
+                    for table in ("monitored_apps", "file_modifications", "default_sources", "settings"):
+                        conn.execute(f"DELETE FROM {table}")
+                    last = {}
+                self._write_changes(last, changes)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            # Sections a partial snapshot leaves out are unchanged
+            self._sections = {**last, **self._small_sections(changes)}
+
+    def _write_changes(self, last, changes):
+        conn = self._conn
+        old_apps = last.get("monitored_apps", {})
+        apps = changes.get("monitored_apps", old_apps)
+        owner = app_owner(apps)
+
+        def diff(section):
+            if section not in changes:
+                return [], []
+            old, new = last.get(section, {}), changes[section]
+            changed = [(key, value) for key, value in new.items() if old.get(key, _MISSING) != value]
+            removed = [key for key in old if key not in new]
+            return changed, removed
+
+        changed, removed = diff("monitored_apps")
+        conn.executemany("DELETE FROM monitored_apps WHERE app_path = ?", [(k,) for k in removed])
+        conn.executemany("INSERT OR REPLACE INTO monitored_apps (app_path, sound) VALUES (?, ?)", changed)
+
+        records = changes.get("applied_file_modifications", {})
+        conn.executemany("DELETE FROM file_modifications WHERE original_path = ?",
+                         [(path,) for path, record in records.items() if record is DELETED])
+        conn.executemany("INSERT OR REPLACE INTO file_modifications (original_path, app_path, record) VALUES (?, ?, ?)",
+                         [(path, owner(path), json.dumps(record)) for path, record in records.items()
+                          if record is not DELETED])
+        if set(apps) != set(old_apps):
+            # Apps added or removed can change which app owns a record. Re-tag the unowned records, those of
+            # removed apps, and those inside an added app's bundle (a range scan on the primary key).
+            removed_apps = list(set(old_apps) - set(apps))
+            candidates = set()
+            for path, in conn.execute("SELECT original_path FROM file_modifications WHERE app_path IS NULL"):
+                candidates.add(path)
+            for app_path in removed_apps:
+                candidates.update(path for path, in conn.execute(
+                    "SELECT original_path FROM file_modifications WHERE app_path = ?", (app_path,)))
+            for app_path in set(apps) - set(old_apps):
+                prefix = os.path.normpath(app_path) + os.sep
+                upper = prefix[:-1] + chr(ord(os.sep) + 1)
+                candidates.update(path for path, in conn.execute(
+                    "SELECT original_path FROM file_modifications WHERE original_path >= ? AND original_path < ?",
+                    (prefix, upper)))
+            candidates.difference_update(records)  # Just written with the new owner
+            conn.executemany("UPDATE file_modifications SET app_path = ? WHERE original_path = ?",
+                             [(owner(path), path) for path in candidates])
+
+        changed, removed = diff("app_default_symlink_sources")
+        conn.executemany("DELETE FROM default_sources WHERE app_path = ?", [(k,) for k in removed])
+        conn.executemany("INSERT OR REPLACE INTO default_sources (app_path, source) VALUES (?, ?)", changed)
+
+        for section in SETTINGS_SECTIONS:
+            changed, removed = diff(section)
+            conn.executemany("DELETE FROM settings WHERE section = ? AND key = ?", [(section, k) for k in removed])
+            conn.executemany("INSERT OR REPLACE INTO settings (section, key, value) VALUES (?, ?, ?)",
+                             [(section, key, json.dumps(value)) for key, value in changed])
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_MISSING = object()
+
+
+def open_config_backend(json_path, sqlite_path, preferred="auto"):
+    """Returns (backend, data) for the config, migrating JSON to SQLite when asked to.
+
+    preferred is "json", "sqlite" or "auto". An existing SQLite database
+    always wins. Otherwise the JSON file is read; with "sqlite", or with
+    "auto" and more than SQLITE_AUTO_THRESHOLD file modifications, it is
+    copied into a new database once and renamed to <json_path>.migrated.
+    data is None when no config exists yet. Raises ValueError for a
+    corrupt JSON file.
+    """
+    if sqlite3 is not None and os.path.exists(sqlite_path):
+        backend = SQLiteConfigBackend(sqlite_path)
+        return backend, backend.load()
+
+    json_backend = JSONConfigBackend(json_path)
+    data = json_backend.load()
+    if data is not None:
+        preferred = data.get("storage_backend", preferred)
+    modifications = len((data or {}).get("applied_file_modifications", {}))
+    use_sqlite = sqlite3 is not None and (
+        preferred == "sqlite" or (preferred == "auto" and modifications > SQLITE_AUTO_THRESHOLD))
+    if not use_sqlite:
+        return json_backend, data
+
+    backend = SQLiteConfigBackend(sqlite_path)
+    if data is not None:
+        try:
+            backend.write({section: data.get(section, {}) for section in CONFIG_SECTIONS})
+        except Exception:
+            backend.close()
+            for leftover in (sqlite_path, sqlite_path + "-wal", sqlite_path + "-shm"):
+                try:
+                    os.remove(leftover)  # Leave the JSON config as the only copy
+                except OSError:
+                    pass
+            raise
+        os.replace(json_path, json_path + ".migrated")
+    return backend, data
+
+
+class ConfigSaver:
+    """Coalescing background writer for a config backend.
+
+    changes_func() must return a JSON-serializable partial snapshot of the
+    state (see the module docstring) holding what changed since its last
+    call. It is called on the caller's thread in mark_dirty(), so the
+    writer thread never reads state that is being mutated, and should cost
+    no more than the change. Partial snapshots not yet written are merged,
+    and handed to backend.write_changes() on the writer thread.
+    on_error(exception) is called on the writer thread when a write fails.
+    """
+
+    def __init__(self, backend, changes_func, delay=0.5, on_error=None):
+        self.backend = backend
+        self._changes_func = changes_func
+        self.delay = delay
+        self._on_error = on_error
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self._flush_requested = False
+        self._pending = None  # Unwritten changes, merged into one partial snapshot
+        self._pending_callbacks = []
+        self._dirty_since = None
+        self._requested_generation = 0
+        self._written_generation = 0
+        self.requests = 0
+        self.writes = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_write_seconds = 0.0
+        self.max_write_seconds = 0.0
+        self.total_write_seconds = 0.0
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="config-saver", daemon=True)
+            self._thread.start()
+
+    def mark_dirty(self, on_saved=None):
+        """Schedules a save of the current state. on_saved() runs on the writer thread once it is on disk."""
+        changes = self._changes_func()
+        with self._cond:
+            self._ensure_thread()
+            self._pending = changes if self._pending is None else merge_changes(self._pending, changes)
+            if on_saved is not None:
+                self._pending_callbacks.append(on_saved)
+            if self._dirty_since is None:
+                self._dirty_since = time.monotonic()
+            self.requests += 1
+            self._requested_generation += 1
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """Writes any pending changes now and waits for them. Returns True if everything is on disk."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            target = self._requested_generation
+            failures_before = self.failures
+            if self._written_generation >= target:
+                return True
+            self._flush_requested = True
+            self._cond.notify_all()
+            while self._written_generation < target:
+                if self.failures > failures_before:
+                    return False  # The write failed; the changes stay pending for a retry.
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def stop(self, timeout=5.0):
+        """Flushes pending changes and stops the writer thread. Returns flush()'s result."""
+        flushed = self.flush(timeout)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self._stopping = False
+        return flushed
+
+    def stats(self):
+        with self._cond:
+            return {
+                "requests": self.requests,
+                "writes": self.writes,
+                "coalesced": max(0, self.requests - self.writes - (1 if self._pending is not None else 0)),
+                "failures": self.failures,
+                "pending": self._pending is not None,
+                "last_write_ms": self.last_write_seconds * 1000.0,
+                "max_write_ms": self.max_write_seconds * 1000.0,
+                "avg_write_ms": (self.total_write_seconds / self.writes * 1000.0) if self.writes else 0.0,
+                "last_error": str(self.last_error) if self.last_error else None,
+            }
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._stopping:
+                    self._cond.wait()
+                if self._pending is None and self._stopping:
+                    return
+                # Let a burst of changes collect, unless someone is waiting on flush().
+                while not (self._flush_requested or self._stopping):
+                    remaining = self._dirty_since + self.delay - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                changes = self._pending
+                callbacks = self._pending_callbacks
+                generation = self._requested_generation
+                self._pending = None
+                self._pending_callbacks = []
+                self._dirty_since = None
+
+            started = time.monotonic()
+            try:
+                self.backend.write_changes(changes)
+                error = None
+            except Exception as e:
+                error = e
+            elapsed = time.monotonic() - started
+
+            with self._cond:
+                if error is not None or generation >= self._requested_generation:
+                    self._flush_requested = False  # Otherwise a flush is still waiting on newer changes.
+                if error is None:
+                    self.writes += 1
+                    self.last_error = None
+                    self.last_write_seconds = elapsed
+                    self.max_write_seconds = max(self.max_write_seconds, elapsed)
+                    self.total_write_seconds += elapsed
+                    self._written_generation = max(self._written_generation, generation)
+                else:
+                    self.failures += 1
+                    self.last_error = error
+                    # Keep the failed changes, under any newer ones, so the next change or flush retries them.
+                    if self._pending is None:
+                        self._pending = changes
+                        self._dirty_since = time.monotonic()
+                    else:
+                        self._pending = merge_changes(changes, self._pending)
+                    self._pending_callbacks = callbacks + self._pending_callbacks
+                    callbacks = []
+                self._cond.notify_all()
+
+            if error is not None:
+                if self._on_error is not None:
+                    self._on_error(error)
+                with self._cond:
+                    if self._stopping:
+                        return  # Give up; the journal still covers anything unsaved.
+                    # Back off before retrying a failing write.
+                    self._cond.wait(max(self.delay, 1.0))
+                continue
+            for callback in callbacks:
+                try:
+                    callback()
+                except Exception as e:
+                    if self._on_error is not None:
+                        self._on_error(e)
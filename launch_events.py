@@ -0,0 +1,320 @@
+"""Launch-event sources and the dispatcher that turns launches into sounds.
+
+A LaunchEventSource watches for application launches on its own thread and
+calls a callback with a LaunchEvent for each one. Backends:
+
+  NSWorkspaceLaunchSource - macOS, pumps a CFRunLoop for NSWorkspace
+                            launch notifications.
+  LinuxProcLaunchSource   - Linux, netlink proc connector (needs root or
+                            CAP_NET_ADMIN), falling back to polling /proc.
+  ScriptedLaunchSource    - replays or injects events; for tests and
+                            latency benchmarks on machines without either.
+"""
+import errno
+import logging
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+
+logger = logging.getLogger("sound_replacer.launch")
+
+
+class LaunchEvent:
+    """One application launch. timestamp is time.monotonic() at detection."""
+    __slots__ = ("app_path", "app_name", "bundle_id", "pid", "timestamp")
+
+    def __init__(self, app_path, app_name=None, bundle_id=None, pid=None, timestamp=None):
+        self.app_path = app_path
+        self.app_name = app_name or os.path.basename(app_path or "")
+        self.bundle_id = bundle_id
+        self.pid = pid
+        self.timestamp = time.monotonic() if timestamp is None else timestamp
+
+    def __repr__(self):
+        return f"LaunchEvent({self.app_path!r}, pid={self.pid})"
+
+
+class LaunchEventSource:
+    """Base class: runs a watcher thread that calls callback(LaunchEvent)."""
+    name = "base"
+
+    def __init__(self):
+        self._callback = None
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def start(self, callback):
+        if self._thread is not None:
+            raise RuntimeError(f"{self.name} launch source already started")
+        self._callback = callback
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f"launch-source-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _emit(self, event):
+        callback = self._callback
+        if callback is not None:
+            callback(event)
+
+    def _run(self):
+        raise NotImplementedError
+
+
+# --- macOS ---
+
+_launch_observer_class = None
+
+
+def _get_launch_observer_class():
+    # The ObjC class can only be registered once per process, so build it lazily.
+    global _launch_observer_class
+    if _launch_observer_class is None:
+        from Foundation import NSObject
+
+        class LaunchObserver(NSObject):
+            def initWithSource_(self, source):
+                self = self.init()
+                if self is None:
+                    return None
+                self.source = source
+                return self
+
+            def applicationDidLaunch_(self, notification):
+                app_info = notification.userInfo()
+                self.source._emit(LaunchEvent(
+                    app_info.get('NSApplicationPath'),
+                    app_name=app_info.get('NSApplicationName'),
+                    bundle_id=app_info.get('NSApplicationBundleIdentifier'),
+                    pid=app_info.get('NSApplicationProcessIdentifier'),
+                ))
+
+        _launch_observer_class = LaunchObserver
+    return _launch_observer_class
+
+
+class NSWorkspaceLaunchSource(LaunchEventSource):
+    """Observes NSWorkspaceDidLaunchApplicationNotification on a thread with its own run loop."""
+    name = "nsworkspace"
+
+    def __init__(self, pump_interval=0.5):
+        super().__init__()
+        self.pump_interval = pump_interval
+        self._observer = None
+
+    def _run(self):
+        from AppKit import NSWorkspace
+        from CoreFoundation import CFRunLoopRunInMode, kCFRunLoopDefaultMode
+
+        nc = NSWorkspace.sharedWorkspace().notificationCenter()
+        self._observer = _get_launch_observer_class().alloc().initWithSource_(self)
+        nc.addObserver_selector_name_object_(
+            self._observer,
+            "applicationDidLaunch:",
+            "NSWorkspaceDidLaunchApplicationNotification",
+            None
+        )
+        try:
+            # Pump this thread's run loop in short slices so stop() is honoured.
+            while not self._stop_event.is_set():
+                CFRunLoopRunInMode(kCFRunLoopDefaultMode, self.pump_interval, False)
+        finally:
+            nc.removeObserver_(self._observer)
+            self._observer = None
+
+
+# --- Linux ---
+
+NETLINK_CONNECTOR = 11
+CN_IDX_PROC = 1
+CN_VAL_PROC = 1
+PROC_CN_MCAST_LISTEN = 1
+PROC_CN_MCAST_IGNORE = 2
+PROC_EVENT_EXEC = 0x00000002
+NLMSG_DONE = 3
+_NLMSGHDR = struct.Struct("=IHHII")
+_CN_MSG = struct.Struct("=IIIIHH")
+_PROC_EVENT_HEADER = struct.Struct("=IIQ")
+_EXEC_EVENT = struct.Struct("=II")
+
+
+def app_path_for_executable(exe_path):
+    """Maps an executable to its enclosing .app bundle, or returns it unchanged.
+
+    This lets .app-style bundles be monitored by the same paths on Linux as on macOS.
+    """
+    parts = exe_path.split(os.sep)
+    for i in range(len(parts) - 1, 0, -1):
+        if parts[i].endswith(".app"):
+            return os.sep.join(parts[:i + 1])
+    return exe_path
+
+
+class LinuxProcLaunchSource(LaunchEventSource):
+    """Detects exec() calls via the netlink proc connector, or by polling /proc."""
+    name = "linux-proc"
+
+    def __init__(self, poll_interval=0.25, use_netlink=True):
+        super().__init__()
+        self.poll_interval = poll_interval
+        self.use_netlink = use_netlink
+        self.mode = None  # "netlink" or "poll" once running
+
+    def _event_for_pid(self, pid, timestamp=None):
+        try:
+            exe_path = os.readlink(f"/proc/{pid}/exe")
+        except OSError:
+            return None  # Exited already, or not ours to inspect.
+        app_path = app_path_for_executable(exe_path)
+        return LaunchEvent(app_path, pid=pid, timestamp=timestamp)
+
+    def _open_netlink(self):
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_CONNECTOR)
+        try:
+            sock.bind((os.getpid(), CN_IDX_PROC))
+            op = struct.pack("=I", PROC_CN_MCAST_LISTEN)
+            cn_msg = _CN_MSG.pack(CN_IDX_PROC, CN_VAL_PROC, 0, 0, len(op), 0) + op
+            header = _NLMSGHDR.pack(_NLMSGHDR.size + len(cn_msg), NLMSG_DONE, 0, 0, os.getpid())
+            sock.send(header + cn_msg)
+            sock.settimeout(self.poll_interval)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def _run(self):
+        sock = None
+        if self.use_netlink:
+            try:
+                sock = self._open_netlink()
+            except OSError:
+                sock = None  # Usually EPERM without CAP_NET_ADMIN.
+        if sock is not None:
+            self.mode = "netlink"
+            try:
+                finished = self._run_netlink(sock)
+            finally:
+                sock.close()
+            if finished:
+                return
+        self.mode = "poll"
+        self._run_poll()
+
+    def _run_netlink(self, sock):
+        """Reads exec events until stopped (returns True) or the socket fails (returns False)."""
+        while not self._stop_event.is_set():
+            try:
+                data = sock.recv(4096)
+            except socket.timeout:
+                continue
+            except OSError as e:
+                if self._stop_event.is_set():
+                    return True
+                if e.errno == errno.ENOBUFS:
+                    # The kernel dropped events during a burst of processes; the socket itself is fine
+                    logger.warning("Netlink receive buffer overflowed; some launches were missed.")
+                    continue
+                logger.warning("Netlink launch events failed (%s); polling /proc instead.", e)
+                return False
+            detected_at = time.monotonic()
+            offset = 0
+            while offset + _NLMSGHDR.size <= len(data):
+                msg_len = _NLMSGHDR.unpack_from(data, offset)[0]
+                if msg_len < _NLMSGHDR.size:
+                    break
+                payload = offset + _NLMSGHDR.size + _CN_MSG.size
+                if payload + _PROC_EVENT_HEADER.size + _EXEC_EVENT.size <= len(data):
+                    what = _PROC_EVENT_HEADER.unpack_from(data, payload)[0]
+                    if what == PROC_EVENT_EXEC:
+                        pid, tgid = _EXEC_EVENT.unpack_from(data, payload + _PROC_EVENT_HEADER.size)
+                        if pid == tgid:  # Ignore exec from non-leader threads.
+                            event = self._event_for_pid(pid, detected_at)
+                            if event is not None:
+                                self._emit(event)
+                offset += (msg_len + 3) & ~3
+        return True
+
+    def _list_pids(self):
+        return {int(name) for name in os.listdir("/proc") if name.isdigit()}
+
+    def _run_poll(self):
+        known = self._list_pids()
+        while not self._stop_event.wait(self.poll_interval):
+            current = self._list_pids()
+            detected_at = time.monotonic()
+            for pid in sorted(current - known):
+                event = self._event_for_pid(pid, detected_at)
+                if event is not None:
+                    self._emit(event)
+            known = current
+
+
+# --- Scripted ---
+
+class ScriptedLaunchSource(LaunchEventSource):
+    """Replays a script of (delay_seconds, app_path) pairs, then accepts emit() calls."""
+    name = "scripted"
+
+    def __init__(self, script=()):
+        super().__init__()
+        self._script = list(script)
+        self.finished = threading.Event()
+
+    def emit(self, app_path, **kwargs):
+        """Injects a launch immediately, from any thread."""
+        self._emit(LaunchEvent(app_path, **kwargs))
+
+    def _run(self):
+        for delay, app_path in self._script:
+            if self._stop_event.wait(delay):
+                return
+            self._emit(LaunchEvent(app_path))
+        self.finished.set()
+        self._stop_event.wait()
+
+
+def default_launch_source():
+    """Returns the launch source for the current platform."""
+    if sys.platform == "darwin":
+        return NSWorkspaceLaunchSource()
+    if sys.platform.startswith("linux"):
+        return LinuxProcLaunchSource()
+    raise RuntimeError(f"No launch event source available for platform {sys.platform}")
+
+
+class LaunchDispatcher:
+    """Maps launch events to sounds and hands them to a play function.
+
+    lookup_sound(event) returns the sound path to play or None;
+    play(sound_path, event) queues it. Both are supplied by the caller so the
+    dispatch path can run (and be timed) without any GUI.
+    """
+
+    def __init__(self, lookup_sound, play):
+        self._lookup_sound = lookup_sound
+        self._play = play
+        self.dispatched = 0
+        self.ignored = 0
+        self.last_latency = None  # Seconds from detection to hand-off
+
+    def dispatch(self, event):
+        sound_path = self._lookup_sound(event)
+        if sound_path is None:
+            self.ignored += 1
+            return False
+        self._play(sound_path, event)
+        self.dispatched += 1
+        self.last_latency = time.monotonic() - event.timestamp
+        return True
@@ -0,0 +1,440 @@
+"""Launch rules: sounds for launches that aren't listed in monitored_apps.
+
+A rule matches launches by app path, bundle identifier and/or app name.
+Each criterion is an exact value or a glob ("*" matches any run of
+characters, "/" included; "?" one character; "[...]" one of a set), and
+every criterion a rule gives must match. Matching ignores case. A rule
+can also rate-limit itself:
+
+    "JetBrains IDEs": {"bundle_id": "com.jetbrains.*", "sound": "ide.wav",
+                       "cooldown_s": 30, "quiet_hours": "22:00-07:00"}
+
+Rules are tried by descending priority, then exact rules before glob
+rules, then by name, and the first that matches decides. If that rule
+played less than cooldown_s ago, or it is inside its quiet hours,
+nothing plays: a lower rule does not get a turn. A rule whose sound is
+None matches and plays nothing, which carves exceptions out of broader
+rules.
+
+compile_rules() turns the rules into a CompiledRules once per change,
+not once per launch, and each rule into a regular expression over the
+launch key "path NUL bundle_id NUL name":
+
+  - rules with a single exact criterion go into a hash index per field
+  - globs with a literal start ("com.jetbrains.*") go into a prefix index
+    per field, so a launch only tries the rules whose prefix it starts with
+  - other globs ("*Pro*") are indexed by their longest literal run in an
+    Aho-Corasick automaton per field; one pass over a launch's field finds
+    every rule whose literal it contains, and only those rules' regexes run
+  - the few with no literal at all ("*", "?*") become alternatives of one
+    regular expression, ordered by precedence, so the regex engine's first
+    full match is the best of them
+
+Results are memoized per launch key, so the next launch of the same app
+is a dict lookup.
+"""
+import os
+import plistlib
+import re
+import threading
+import time
+
+RULE_FIELDS = ("path", "bundle_id", "name")
+OUTCOME_PLAY = "play"
+OUTCOME_COOLDOWN = "cooldown"
+OUTCOME_QUIET_HOURS = "quiet_hours"
+
+_SEP = "\x00" # Joins the fields of a launch key; can't appear in paths, bundle ids or names
+_ANY = "[^\x00]*"
+_MEMO_MAX = 4096 # Launch keys remembered by CompiledRules.match() before the memo starts over
+_GLOB_CHARS = frozenset("*?[")
+
+
+def is_glob(pattern):
+    return any(char in _GLOB_CHARS for char in pattern)
+
+
+def literal_prefix(pattern):
+    """The part of a glob before its first wildcard."""
+    for i, char in enumerate(pattern):
+        if char in _GLOB_CHARS:
+            return pattern[:i]
+    return pattern
+
+
+def _set_end(pattern, i):
+    """Index of the "]" closing the [...] set that opens at pattern[i], or -1; "]" right after "[" or "[!" is a member."""
+    j = i + 1
+    if pattern[j:j + 1] == "!":
+        j += 1
+    if pattern[j:j + 1] == "]":
+        j += 1
+    return pattern.find("]", j)
+
+
+def _set_to_regex(body):
+    """Regex for the inside of a glob [...] set: members and a-z ranges, "!" first to negate."""
+    negate = body.startswith("!")
+    if negate:
+        body = body[1:]
+    members = []
+    k = 0
+    while k < len(body):
+        if body[k + 1:k + 2] == "-" and k + 2 < len(body):
+            members.append(f"{re.escape(body[k])}-{re.escape(body[k + 2])}")
+            k += 3
+        else:
+            members.append(re.escape(body[k])) # Escaped, so "^", "[", "&&" or "--" stay plain characters
+            k += 1
+    # A negated set must not swallow the separator between launch key fields
+    return f"[^\x00{''.join(members)}]" if negate else f"[{''.join(members)}]"
+
+
+def literal_runs(pattern):
+    """The runs of plain characters in a glob, between its wildcards and [...] sets."""
+    runs = []
+    start = i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        end = i
+        if char == "[":
+            end = _set_end(pattern, i)
+            if end == -1:
+                i += 1 # An unclosed "[" is just a character
+                continue
+        elif char not in _GLOB_CHARS:
+            i += 1
+            continue
+        if i > start:
+            runs.append(pattern[start:i])
+        start = i = end + 1
+    if i > start:
+        runs.append(pattern[start:i])
+    return runs
+
+
+def glob_to_regex(pattern):
+    """Regex source for a glob over one field of a launch key (see the module docstring)."""
+    parts = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "*":
+            parts.append(_ANY)
+        elif char == "?":
+            parts.append("[^\x00]")
+        elif char == "[":
+            end = _set_end(pattern, i)
+            if end == -1:
+                parts.append(re.escape(char)) # An unclosed "[" is just a character
+            else:
+                parts.append(_set_to_regex(pattern[i + 1:end]))
+                i = end
+        else:
+            parts.append(re.escape(char))
+        i += 1
+    return "".join(parts)
+
+
+def parse_quiet_hours(value):
+    """[(start_minute, end_minute)] from "22:00-07:00", a list of those, or None. Raises ValueError."""
+    if not value:
+        return []
+    spans = [value] if isinstance(value, str) else list(value)
+    windows = []
+    for span in spans:
+        try:
+            start, end = (part.strip() for part in str(span).split("-"))
+            minutes = []
+            for clock in (start, end):
+                hours, mins = clock.split(":")
+                hours, mins = int(hours), int(mins)
+                if not (0 <= hours <= 24 and 0 <= mins < 60) or hours * 60 + mins > 24 * 60:
+                    raise ValueError
+                minutes.append(hours * 60 + mins)
+        except ValueError:
+            raise ValueError(f"Bad quiet hours {span!r}; expected HH:MM-HH:MM") from None
+        windows.append(tuple(minutes))
+    return windows
+
+
+def in_quiet_hours(windows, minute_of_day):
+    """Whether minute_of_day falls in any window; a window may run past midnight."""
+    for start, end in windows:
+        if start <= end:
+            if start <= minute_of_day < end:
+                return True
+        elif minute_of_day >= start or minute_of_day < end:
+            return True
+    return False
+
+
+class LaunchRule:
+    """One parsed rule. criteria holds {field: lowercased pattern} for the fields it gives."""
+
+    __slots__ = ("name", "sound", "criteria", "cooldown", "quiet_hours", "priority", "exact")
+
+    def __init__(self, name, spec):
+        if not isinstance(spec, dict):
+            raise ValueError(f"Rule {name!r} must be an object")
+        self.name = name
+        self.criteria = {}
+        for field in RULE_FIELDS:
+            pattern = spec.get(field)
+            if pattern in (None, ""):
+                continue
+            if not isinstance(pattern, str):
+                raise ValueError(f"Rule {name!r}: {field} must be a string")
+            self.criteria[field] = pattern.lower()
+        if not self.criteria:
+            raise ValueError(f"Rule {name!r} needs a path, bundle_id or name to match")
+        if "sound" not in spec:
+            raise ValueError(f"Rule {name!r} has no sound")
+        sound = spec["sound"]
+        self.sound = None if sound in (None, "", "None") else str(sound)
+        try:
+            self.cooldown = float(spec.get("cooldown_s") or 0)
+            self.priority = int(spec.get("priority") or 0)
+        except (TypeError, ValueError):
+            raise ValueError(f"Rule {name!r}: cooldown_s and priority must be numbers") from None
+        try:
+            self.quiet_hours = parse_quiet_hours(spec.get("quiet_hours"))
+        except ValueError as e:
+            raise ValueError(f"Rule {name!r}: {e}") from None
+        self.exact = not any(is_glob(pattern) for pattern in self.criteria.values())
+        try:
+            re.compile(self.regex())
+        except re.error as e: # A set like "[z-a]"
+            raise ValueError(f"Rule {name!r}: bad pattern: {e}") from None
+
+    def precedence(self):
+        return (-self.priority, not self.exact, self.name)
+
+    def regex(self):
+        return _SEP.join(glob_to_regex(self.criteria[field]) if field in self.criteria else _ANY
+                         for field in RULE_FIELDS)
+
+
+class _SubstringIndex:
+    """Aho-Corasick automaton over literals: find(text) returns the values of every literal text contains."""
+
+    def __init__(self):
+        self._goto = [{}] # Per node: {char: child node}
+        self._fail = [0]
+        self._out = [()] # Per node: values of the literals ending here, including via fail links
+
+    def __bool__(self):
+        return len(self._goto) > 1
+
+    def add(self, literal, value):
+        node = 0
+        for char in literal:
+            child = self._goto[node].get(char)
+            if child is None:
+                child = self._goto[node][char] = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            node = child
+        self._out[node] += (value,)
+
+    def build(self):
+        """Sets the fail links, breadth first; call once after the last add()."""
+        goto, fail, out = self._goto, self._fail, self._out
+        level = list(goto[0].values())
+        while level:
+            next_level = []
+            for node in level:
+                for char, child in goto[node].items():
+                    state = fail[node]
+                    while state and char not in goto[state]:
+                        state = fail[state]
+                    fail[child] = goto[state].get(char, 0)
+                    out[child] += out[fail[child]]
+                    next_level.append(child)
+            level = next_level
+        return self
+
+    def find(self, text):
+        goto, fail, out = self._goto, self._fail, self._out
+        found = []
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                found.extend(out[state])
+        return found
+
+
+class CompiledRules:
+    """An immutable, precompiled rule set. See the module docstring."""
+
+    def __init__(self, rules=()):
+        self.rules = sorted(rules, key=LaunchRule.precedence)
+        self.uses_bundle_id = any("bundle_id" in rule.criteria for rule in self.rules)
+        self._exact = {field: {} for field in RULE_FIELDS} # {field: {value: rule index}}
+        self._prefixed = {field: {} for field in RULE_FIELDS} # {field: {literal prefix: [rule index]}}
+        self._contains = {field: _SubstringIndex() for field in RULE_FIELDS} # By each rule's longest literal run
+        self._rule_regex = {} # {rule index: compiled regex}, for the prefix- and substring-indexed rules
+        alternatives = []
+        for index, rule in enumerate(self.rules):
+            if rule.exact and len(rule.criteria) == 1:
+                (field, value), = rule.criteria.items()
+                self._exact[field].setdefault(value, index) # Sorted, so the first one wins
+                continue
+            field, prefix = max(((field, literal_prefix(pattern)) for field, pattern in rule.criteria.items()),
+                                key=lambda item: len(item[1]))
+            runs = [(len(run), field, run) for field, pattern in rule.criteria.items() for run in literal_runs(pattern)]
+            longest = max(runs, default=None)
+            if prefix and len(prefix) >= longest[0]:
+                self._prefixed[field].setdefault(prefix, []).append(index)
+            elif longest is not None:
+                _, field, run = longest
+                self._contains[field].add(run, index)
+            else:
+                alternatives.append(f"(?P<r{index}>{rule.regex()})")
+                continue
+            self._rule_regex[index] = re.compile(rule.regex(), re.DOTALL)
+        for index in self._contains.values():
+            index.build()
+        # Only prefixes of these lengths exist, so a lookup tries just those slices of the value
+        self._prefix_lengths = {field: sorted({len(prefix) for prefix in prefixes})
+                                for field, prefixes in self._prefixed.items()}
+        self._regex = re.compile("|".join(alternatives), re.DOTALL) if alternatives else None
+        self._memo = {}
+
+    def __len__(self):
+        return len(self.rules)
+
+    def match(self, path=None, bundle_id=None, name=None):
+        """The LaunchRule that decides this launch, or None."""
+        key = ((path or "").lower(), (bundle_id or "").lower(), (name or "").lower())
+        try:
+            return self._memo[key]
+        except KeyError:
+            pass
+        best = None
+        for field, value in zip(RULE_FIELDS, key):
+            if value:
+                index = self._exact[field].get(value)
+                if index is not None and (best is None or index < best):
+                    best = index
+        joined = _SEP.join(key)
+        candidates = []
+        for field, value in zip(RULE_FIELDS, key):
+            prefixed = self._prefixed[field]
+            for length in self._prefix_lengths[field]:
+                if length > len(value):
+                    break
+                candidates.extend(prefixed.get(value[:length], ()))
+            if value and self._contains[field]:
+                candidates.extend(self._contains[field].find(value))
+        for index in sorted(set(candidates)):
+            if best is not None and index >= best:
+                break
+            if self._rule_regex[index].fullmatch(joined):
+                best = index
+                break
+        if self._regex is not None:
+            found = self._regex.fullmatch(joined)
+            if found is not None:
+                index = int(found.lastgroup[1:])
+                if best is None or index < best:
+                    best = index
+        rule = None if best is None else self.rules[best]
+        if len(self._memo) >= _MEMO_MAX:
+            self._memo = {}
+        self._memo[key] = rule
+        return rule
+
+
+def compile_rules(specs):
+    """(CompiledRules, {rule name: error}) from {name: rule dict}. Disabled and invalid rules are left out."""
+    rules, errors = [], {}
+    for name, spec in specs.items():
+        if isinstance(spec, dict) and spec.get("enabled") is False:
+            continue
+        try:
+            rules.append(LaunchRule(name, spec))
+        except ValueError as e:
+            errors[name] = str(e)
+    return CompiledRules(rules), errors
+
+
+def read_bundle_id(app_path):
+    """CFBundleIdentifier from app_path's Info.plist, or None."""
+    try:
+        with open(os.path.join(app_path, "Contents", "Info.plist"), "rb") as f:
+            bundle_id = plistlib.load(f).get("CFBundleIdentifier")
+    except (OSError, ValueError, plistlib.InvalidFileException, AttributeError):
+        return None
+    return bundle_id if isinstance(bundle_id, str) else None
+
+
+class LaunchRuleEngine:
+    """Decides launches against the current CompiledRules and keeps each rule's cooldown.
+
+    load() swaps in a new rule set in one assignment, so decide() can keep
+    running on the launch source's thread meanwhile. Cooldowns survive a
+    reload for rules that keep their name.
+    """
+
+    def __init__(self, clock=time.monotonic, local_time=time.localtime):
+        self.compiled = CompiledRules()
+        self._clock = clock
+        self._local_time = local_time
+        self._last_played = {} # {rule name: monotonic time it last played}
+        self._bundle_ids = {} # {app path: bundle id or None}, for launch sources that don't report it
+        self._lock = threading.Lock()
+        self.decisions = {OUTCOME_PLAY: 0, OUTCOME_COOLDOWN: 0, OUTCOME_QUIET_HOURS: 0, "no_match": 0}
+
+    def load(self, specs):
+        """Compiles specs ({name: rule dict}) and starts using them. Returns {rule name: error}."""
+        compiled, errors = compile_rules(specs)
+        names = {rule.name for rule in compiled.rules}
+        with self._lock:
+            self.compiled = compiled
+            self._last_played = {name: t for name, t in self._last_played.items() if name in names}
+        return errors
+
+    def _bundle_id(self, app_path):
+        try:
+            return self._bundle_ids[app_path]
+        except KeyError:
+            bundle_id = self._bundle_ids[app_path] = read_bundle_id(app_path)
+            return bundle_id
+
+    def decide(self, app_path, bundle_id=None, app_name=None, now=None):
+        """(rule, outcome) for a launch: (None, None) when no rule matches, else outcome is
+        OUTCOME_PLAY, OUTCOME_COOLDOWN or OUTCOME_QUIET_HOURS. now is monotonic, defaulting to the clock.
+        """
+        compiled = self.compiled
+        if not len(compiled):
+            return None, None
+        if bundle_id is None and app_path and compiled.uses_bundle_id:
+            bundle_id = self._bundle_id(app_path)
+        if app_name is None and app_path:
+            app_name = os.path.basename(app_path.rstrip("/"))
+        if app_name and app_name.lower().endswith(".app"):
+            app_name = app_name[:-4] # "Safari", whether the source reported a display name or a file name
+        rule = compiled.match(app_path, bundle_id, app_name)
+        with self._lock:
+            if rule is None:
+                self.decisions["no_match"] += 1
+                return None, None
+            if rule.quiet_hours:
+                local = self._local_time()
+                if in_quiet_hours(rule.quiet_hours, local.tm_hour * 60 + local.tm_min):
+                    self.decisions[OUTCOME_QUIET_HOURS] += 1
+                    return rule, OUTCOME_QUIET_HOURS
+            now = self._clock() if now is None else now
+            if rule.cooldown:
+                last = self._last_played.get(rule.name)
+                if last is not None and now - last < rule.cooldown:
+                    self.decisions[OUTCOME_COOLDOWN] += 1
+                    return rule, OUTCOME_COOLDOWN
+            self._last_played[rule.name] = now
+            self.decisions[OUTCOME_PLAY] += 1
+            return rule, OUTCOME_PLAY
@@ -0,0 +1,244 @@
+"""Non-blocking logging for the app and the daemon.
+
+Every module logs through the standard logging module under the
+"sound_replacer" logger. LogPipeline puts a handler on that logger that
+only drops the record into a bounded queue: the launch-notification
+thread, playback workers and the Tk thread never wait for a file, the
+terminal or the system log. A QueueListener thread does the writing, to:
+
+  - a rotating JSON-lines file (one object per record, see JSONLinesFormatter)
+  - the terminal, as plain text
+  - NSLog on macOS (Console.app), imported on the listener thread
+
+Before a record is queued, RateLimitFilter lets through at most `burst`
+records from the same call site (same logger, level and message
+template) per `window` seconds. The next one that gets through carries a
+"suppressed" count. Records below the configured level are discarded by
+logging's own level check before any formatting, so logger.debug() calls
+cost close to nothing when debug logging is off.
+"""
+import copy
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+
+ROOT_LOGGER = "sound_replacer"
+DEFAULT_QUEUE_SIZE = 10000
+_RATE_LIMIT_KEYS_MAX = 2000 # Call sites remembered by RateLimitFilter before old ones are forgotten
+
+# Attributes every LogRecord has; anything else was passed with extra= and goes into the JSON object
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "suppressed"}
+
+
+def parse_level(level):
+    """A logging level from a name ("debug", "INFO") or a number. Raises ValueError."""
+    if isinstance(level, int):
+        return level
+    value = logging.getLevelName(str(level).upper())
+    if not isinstance(value, int):
+        raise ValueError(f"Unknown log level {level!r}")
+    return value
+
+
+class RateLimitFilter(logging.Filter):
+    """Passes at most burst records per call site every window seconds. See the module docstring."""
+
+    def __init__(self, burst=20, window=10.0):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self._sites = {} # {(logger, level, template): [window_start, passed, suppressed]}
+        self._lock = threading.Lock()
+        self.suppressed = 0
+
+    def filter(self, record):
+        if self.burst <= 0:
+            return True
+        key = (record.name, record.levelno, record.msg if isinstance(record.msg, str) else type(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= self.window:
+                if site is not None and site[2]:
+                    record.suppressed = site[2]
+                if site is None and len(self._sites) >= _RATE_LIMIT_KEYS_MAX:
+                    self._forget_expired(now)
+                self._sites[key] = [now, 1, 0]
+                return True
+            if site[1] < self.burst:
+                site[1] += 1
+                return True
+            site[2] += 1
+            self.suppressed += 1
+            return False
+
+    def _forget_expired(self, now):
+        # Expects self._lock to be held.
+        for key in [key for key, site in self._sites.items() if now - site[0] >= self.window]:
+            del self._sites[key]
+
+
+class JSONLinesFormatter(logging.Formatter):
+    """One JSON object per record: ts, level, logger, thread, msg, then extras, suppressed and exc."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Plain text for the terminal, noting how many similar records were suppressed."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(name)s %(levelname)s: %(message)s")
+
+    def format(self, record):
+        text = super().format(record)
+        if getattr(record, "suppressed", 0):
+            text += f" (similar message suppressed {record.suppressed} times)"
+        return text
+
+
+class NSLogHandler(logging.Handler):
+    """Sends records to NSLog, which only ever runs on the listener thread."""
+
+    def __init__(self):
+        super().__init__()
+        self._nslog = None
+
+    def emit(self, record):
+        try:
+            if self._nslog is None:
+                from Foundation import NSLog
+                self._nslog = NSLog
+            self._nslog("%@", self.format(record))
+        except Exception:
+            self.handleError(record)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Never blocks: a full queue drops the record and counts it."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Format the message here, while its arguments are still what the caller meant;
+        # keep the traceback as exc_text so the JSON formatter can report it separately
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def json_file_handler(path, max_bytes=5 * 1024 * 1024, backups=3):
+    """A rotating JSON-lines file handler. Raises OSError if path cannot be opened."""
+    handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups,
+                                                   encoding="utf-8", delay=True)
+    handler.setFormatter(JSONLinesFormatter())
+    return handler
+
+
+def console_handler(stream=None):
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(TextFormatter())
+    return handler
+
+
+def system_log_handler():
+    """NSLog on macOS (so messages still show up in Console.app), otherwise None."""
+    if sys.platform != "darwin":
+        return None
+    handler = NSLogHandler()
+    handler.setFormatter(logging.Formatter("%(name)s %(levelname)s: %(message)s"))
+    return handler
+
+
+class LogPipeline:
+    """Queue-backed logging for everything under the "sound_replacer" logger. See the module docstring.
+
+    install() can run long before start(): records logged in between wait
+    in the queue (up to max_queue) for the sinks.
+    """
+
+    def __init__(self, logger_name=ROOT_LOGGER, max_queue=DEFAULT_QUEUE_SIZE, burst=20, window=10.0):
+        self.logger = logging.getLogger(logger_name)
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.handler = _QueueHandler(self.queue)
+        self.rate_limit = RateLimitFilter(burst=burst, window=window)
+        self.handler.addFilter(self.rate_limit)
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def install(self, level=logging.INFO):
+        """Routes the logger's records into the queue instead of its parents' handlers."""
+        if self.handler not in self.logger.handlers:
+            self.logger.addHandler(self.handler)
+        self.logger.propagate = False
+        self.set_level(level)
+        return self
+
+    def set_level(self, level):
+        self.logger.setLevel(parse_level(level))
+
+    def set_rate_limit(self, burst, window):
+        self.rate_limit.burst = int(burst)
+        self.rate_limit.window = float(window)
+
+    def start(self, handlers):
+        """(Re)starts the listener thread writing to handlers. Records already queued go to the new ones."""
+        handlers = [handler for handler in handlers if handler is not None]
+        with self._lock:
+            previous = self._listener
+            if previous is not None:
+                previous.stop() # Drains what is queued into the old sinks
+                self._close_handlers(previous.handlers, keep=handlers)
+            self._listener = logging.handlers.QueueListener(self.queue, *handlers, respect_handler_level=True)
+            self._listener.start()
+        return self
+
+    def stop(self):
+        """Writes everything still queued, stops the listener and closes the sinks."""
+        with self._lock:
+            listener, self._listener = self._listener, None
+        if listener is not None:
+            listener.stop()
+            self._close_handlers(listener.handlers)
+
+    @staticmethod
+    def _close_handlers(handlers, keep=()):
+        for handler in handlers:
+            if handler not in keep:
+                handler.close()
+
+    def stats(self):
+        return {"queued": self.queue.qsize(), "dropped": self.handler.dropped, "suppressed": self.rate_limit.suppressed}
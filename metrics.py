@@ -0,0 +1,321 @@
+"""Launch-to-audio latency histograms and operation counters, in Prometheus text format.
+
+Every launch sound carries a PlaybackTrace (see playback.py) with
+monotonic timestamps for each step of its way to the speaker:
+
+  dispatch      launch detected -> sound queued on the playback pool
+  queue         queued -> picked up by a playback worker
+  decode        picked up -> PCM ready (a sound cache hit is near zero)
+  device_start  PCM ready -> the audio device was told to play
+  total         launch detected -> the audio device was told to play
+
+MetricsRegistry keeps, per stage, both overall and per launched app, a
+cumulative histogram (for Prometheus' histogram_quantile) and the last
+`window` samples (for p50/p95/p99 without a Prometheus server). It also
+holds counters for scans, applies, reverts and playback outcomes.
+
+The text is served on a localhost-only HTTP endpoint (MetricsHTTPServer)
+and/or written to a file every few seconds (MetricsFileWriter), e.g. for
+node_exporter's textfile collector.
+"""
+import bisect
+import logging
+import os
+import tempfile
+import threading
+from collections import deque
+
+logger = logging.getLogger("sound_replacer.metrics")
+
+METRIC_PREFIX = "sound_replacer_"
+LATENCY_STAGES = ("dispatch", "queue", "decode", "device_start", "total")
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUANTILES = (0.5, 0.95, 0.99)
+OTHER_APPS_LABEL = "other" # Apps beyond max_apps share this label, so a busy machine can't grow the output without bound
+LOCAL_HOSTS = ("127.0.0.1", "::1", "localhost")
+
+# Help text for the counters the core increments; anything else is exported with a generic one
+COUNTER_HELP = {
+    "scans_total": "Bundle scans finished, by result.",
+    "scan_seconds_total": "Time spent in bundle scans.",
+    "applies_total": "Apply operations, by result.",
+    "replacements_applied_total": "Sound files replaced by successful applies.",
+    "reverts_total": "Revert operations.",
+    "replacements_reverted_total": "Replacements removed by reverts.",
+    "playbacks_total": "Sounds played by the playback pool, by result.",
+}
+
+
+def _escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label_value(value)}"' for key, value in labels) + "}"
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value) if value == value else "NaN"
+    return str(value)
+
+
+class LatencyHistogram:
+    """Cumulative bucket counts, sum and count, plus a rolling window of recent samples."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS, window=1024):
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        if index < len(self.bucket_counts):
+            self.bucket_counts[index] += 1
+        self.count += 1
+        self.sum += seconds
+        self.recent.append(seconds)
+
+    def quantiles(self, quantiles=QUANTILES):
+        """{q: seconds} over the rolling window (nearest rank), or {} before the first sample."""
+        if not self.recent:
+            return {}
+        ordered = sorted(self.recent)
+        last = len(ordered) - 1
+        return {q: ordered[min(last, max(0, int(round(q * last))))] for q in quantiles}
+
+
+class MetricsRegistry:
+    """Thread-safe counters, gauges and launch latency histograms. See the module docstring.
+
+    max_apps caps how many launched apps get their own latency series.
+    """
+
+    def __init__(self, window=1024, max_apps=64):
+        self.window = window
+        self.max_apps = max_apps
+        self._lock = threading.Lock()
+        self._counters = {} # {(name, labels): value}
+        self._latency = {} # {(stage, app or None): LatencyHistogram}
+        self._apps = set()
+        self._collected = [] # [(name, type, help, fn)] read at render time
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def register(self, name, metric_type, help_text, fn):
+        """Exports fn()'s value at render time: a number, or [(labels_dict, number)].
+
+        For values another object already counts (queue depth, cache hits),
+        so they aren't counted twice.
+        """
+        with self._lock:
+            self._collected.append((name, metric_type, help_text, fn))
+
+    def _app_label(self, app_path):
+        # Expects self._lock to be held.
+        if app_path in self._apps:
+            return app_path
+        if len(self._apps) < self.max_apps:
+            self._apps.add(app_path)
+            return app_path
+        return OTHER_APPS_LABEL
+
+    def observe_launch(self, app_path, stages):
+        """Records {stage: seconds} for one launch sound, overall and for app_path."""
+        with self._lock:
+            app = self._app_label(app_path) if app_path else None
+            for stage, seconds in stages.items():
+                for key in ((stage, None), (stage, app)) if app else ((stage, None),):
+                    histogram = self._latency.get(key)
+                    if histogram is None:
+                        histogram = self._latency[key] = LatencyHistogram(window=self.window)
+                    histogram.observe(seconds)
+
+    def latency_summary(self, app_path=None):
+        """{stage: {"count", "p50", "p95", "p99"}} overall, or for one app."""
+        with self._lock:
+            summary = {}
+            for (stage, app), histogram in self._latency.items():
+                if app != app_path:
+                    continue
+                entry = {"count": histogram.count}
+                entry.update({f"p{int(q * 100)}": seconds for q, seconds in histogram.quantiles().items()})
+                summary[stage] = entry
+            return summary
+
+    def render(self):
+        """The current values in Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            counters = dict(self._counters)
+            latency = {key: (list(h.buckets), list(h.bucket_counts), h.count, h.sum, h.quantiles())
+                       for key, h in self._latency.items()}
+            collected = list(self._collected)
+
+        families = {}
+        for (name, labels), value in counters.items():
+            families.setdefault(name, []).append((labels, value))
+        for name in sorted(families):
+            full_name = METRIC_PREFIX + name
+            lines.append(f"# HELP {full_name} {COUNTER_HELP.get(name, 'Counter.')}")
+            lines.append(f"# TYPE {full_name} counter")
+            for labels, value in sorted(families[name]):
+                lines.append(f"{full_name}{_format_labels(labels)} {_format_value(value)}")
+
+        for name, metric_type, help_text, fn in collected:
+            try:
+                value = fn()
+            except Exception as e: # A broken collector must not take the endpoint down
+                logger.warning("Metric %s could not be collected: %s", name, e)
+                continue
+            samples = value if isinstance(value, list) else [({}, value)]
+            full_name = METRIC_PREFIX + name
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {metric_type}")
+            for labels, sample in samples:
+                lines.append(f"{full_name}{_format_labels(sorted(labels.items()))} {_format_value(sample)}")
+
+        if latency:
+            def _order(item):
+                (stage, app), _ = item
+                rank = LATENCY_STAGES.index(stage) if stage in LATENCY_STAGES else len(LATENCY_STAGES)
+                return rank, stage, app or ""
+            ordered = sorted(latency.items(), key=_order)
+            name = METRIC_PREFIX + "launch_latency_seconds"
+            lines.append(f"# HELP {name} Time from app launch detection to each playback stage.")
+            lines.append(f"# TYPE {name} histogram")
+            for (stage, app), (buckets, bucket_counts, count, total, _) in ordered:
+                labels = [("stage", stage)] + ([("app", app)] if app else [])
+                cumulative = 0
+                for bound, bucket_count in zip(buckets, bucket_counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{_format_labels(labels + [('le', repr(float(bound)))])} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(labels + [('le', '+Inf')])} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+            name = METRIC_PREFIX + "launch_latency_recent_seconds"
+            lines.append(f"# HELP {name} Quantiles of the last {self.window} launch latencies per stage.")
+            lines.append(f"# TYPE {name} gauge")
+            for (stage, app), (_, _, _, _, quantiles) in ordered:
+                labels = [("stage", stage)] + ([("app", app)] if app else [])
+                for q, seconds in quantiles.items():
+                    lines.append(f"{name}{_format_labels(labels + [('quantile', repr(q))])} {_format_value(seconds)}")
+        return "\n".join(lines) + "\n"
+
+
+def _metrics_handler_class():
+    # http.server pulls in email, html and socketserver; only import it when a server is started
+    from http.server import BaseHTTPRequestHandler
+
+    class _MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = self.server.registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass # Scrapes every few seconds would flood stderr
+
+    return _MetricsHandler
+
+
+class MetricsHTTPServer:
+    """Serves registry.render() at http://host:port/metrics on a daemon thread.
+
+    Only loopback addresses are accepted: the metrics name every launched
+    app, which is nobody else's business. port 0 picks a free port.
+    """
+
+    def __init__(self, registry, port, host="127.0.0.1"):
+        if host not in LOCAL_HOSTS:
+            raise ValueError(f"Metrics can only be served on localhost, not {host!r}")
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """Binds and starts serving. Raises OSError if the port is taken."""
+        from http.server import ThreadingHTTPServer
+        server = ThreadingHTTPServer((self.host, self.port), _metrics_handler_class())
+        server.daemon_threads = True
+        server.registry = self.registry
+        self._server = server
+        self.port = server.server_address[1]
+        self._thread = threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True)
+        self._thread.start()
+        return self
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/metrics"
+
+    def stop(self, timeout=2.0):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+class MetricsFileWriter:
+    """Rewrites path with registry.render() every interval seconds (atomically, and once more on stop())."""
+
+    def __init__(self, registry, path, interval=15.0):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="metrics-file", daemon=True)
+        self._thread.start()
+        return self
+
+    def write(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".metrics.", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(self.registry.render())
+            os.chmod(tmp_path, 0o644)  # mkstemp makes it 0600; the textfile collector may run as another user
+            os.replace(tmp_path, self.path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _run(self):
+        while True:
+            try:
+                self.write()
+            except OSError as e:
+                logger.warning("Could not write metrics to %s: %s", self.path, e)
+            if self._stop_event.is_set():
+                return
+            self._stop_event.wait(self.interval)
+
+    def stop(self, timeout=2.0):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
@@ -0,0 +1,251 @@
+"""Fixed-size playback worker pool fed by a bounded queue.
+
+Launch notifications and preview buttons hand sounds to a PlaybackExecutor
+instead of starting a thread per sound, so a burst of launches (e.g. at
+login) cannot spawn an unbounded number of threads or pile up audio.
+
+Each queued sound carries a PlaybackTrace. The play function marks the
+moments its sound was decoded and handed to the audio device with
+mark_decoded() / mark_audio_started(), which find the trace of the sound
+the calling worker is playing; metrics.py turns the timestamps into
+latency histograms.
+"""
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_DROP_NEWEST = "drop_newest"
+OVERFLOW_COALESCE = "coalesce"
+OVERFLOW_POLICIES = (OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST, OVERFLOW_COALESCE)
+
+# Command-line players tried by command_player(), in order, as argv prefixes
+_PLAYER_COMMANDS = (
+    ("afplay",),                                      # macOS
+    ("paplay",),                                      # PulseAudio / PipeWire
+    ("aplay", "-q"),                                  # ALSA (WAV only)
+    ("ffplay", "-nodisp", "-autoexit", "-loglevel", "quiet"),
+)
+
+
+class PlaybackTrace:
+    """Monotonic timestamps of one sound on its way to the audio device.
+
+    detected_at is when the launch that triggered it was detected (None
+    for previews); the rest are filled in as the sound moves along.
+    """
+
+    __slots__ = ("sound_path", "app_path", "detected_at", "submitted_at", "started_at",
+                 "decoded_at", "audio_started_at")
+
+    def __init__(self, sound_path, detected_at=None, app_path=None):
+        self.sound_path = sound_path
+        self.app_path = app_path
+        self.detected_at = detected_at
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.decoded_at = None
+        self.audio_started_at = None
+
+    def stages(self):
+        """{stage: seconds} for the stages this trace got through (see metrics.LATENCY_STAGES)."""
+        stages = {}
+        if self.detected_at is not None:
+            stages["dispatch"] = self.submitted_at - self.detected_at
+        if self.started_at is None:
+            return stages
+        stages["queue"] = self.started_at - self.submitted_at
+        if self.decoded_at is not None:
+            stages["decode"] = self.decoded_at - self.started_at
+        if self.audio_started_at is not None:
+            stages["device_start"] = self.audio_started_at - (self.decoded_at or self.started_at)
+            stages["total"] = self.audio_started_at - (self.detected_at or self.submitted_at)
+        return stages
+
+
+_worker_state = threading.local()
+
+
+def current_trace():
+    """The PlaybackTrace of the sound this worker thread is playing, or None outside the pool."""
+    return getattr(_worker_state, "trace", None)
+
+
+def mark_decoded():
+    trace = current_trace()
+    if trace is not None and trace.decoded_at is None:
+        trace.decoded_at = time.monotonic()
+
+
+def mark_audio_started(at=None):
+    """at is the monotonic time the audio started, when the player knows it better than "now"."""
+    trace = current_trace()
+    if trace is not None and trace.audio_started_at is None:
+        trace.audio_started_at = time.monotonic() if at is None else at
+
+
+def command_player():
+    """Returns play(sound_path) using the first available command-line player, or None.
+
+    Used by the headless daemon, which avoids loading AppKit; play() blocks
+    until the sound has finished, like the GUI's player.
+    """
+    candidates = _PLAYER_COMMANDS if sys.platform == "darwin" else _PLAYER_COMMANDS[1:]
+    for command in candidates:
+        if shutil.which(command[0]):
+            def play(sound_path, command=command):
+                process = subprocess.Popen(list(command) + [sound_path],
+                                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                # The player process owns decoding and the device; its start is as close as we can see
+                mark_audio_started()
+                if process.wait() != 0:
+                    raise subprocess.CalledProcessError(process.returncode, process.args)
+            play.command = command[0]
+            return play
+    return None
+
+
+class PlaybackExecutor:
+    """Runs play_func(sound_path) on a fixed number of worker threads.
+
+    Overflow policies, applied when a sound is submitted:
+      drop_oldest  - a full queue discards its oldest pending sound.
+      drop_newest  - a full queue rejects the new sound.
+      coalesce     - a sound identical to one submitted within
+                     coalesce_window seconds is merged into it; if the queue
+                     is still full the oldest pending sound is discarded.
+
+    on_finished(trace, succeeded), if given, is called on the worker thread
+    after each sound, with its PlaybackTrace.
+    """
+
+    def __init__(self, play_func, workers=2, max_queue=8,
+                 overflow_policy=OVERFLOW_COALESCE, coalesce_window=0.5,
+                 name="playback", on_finished=None):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {overflow_policy!r}; expected one of {OVERFLOW_POLICIES}")
+        if workers < 1 or max_queue < 1:
+            raise ValueError("workers and max_queue must both be at least 1")
+        self._play_func = play_func
+        self._max_queue = max_queue
+        self._overflow_policy = overflow_policy
+        self._coalesce_window = coalesce_window
+        self._on_finished = on_finished
+        self._queue = deque()
+        self._last_submitted = {}  # {sound_path: monotonic time of last accepted submit}
+        self._cond = threading.Condition()
+        self._shutdown = False
+        self._active = 0
+        self.submitted = 0
+        self.played = 0
+        self.failed = 0
+        self.dropped_oldest = 0
+        self.dropped_newest = 0
+        self.coalesced = 0
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"{name}-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, sound_path, detected_at=None, app_path=None):
+        """Queues sound_path for playback. Returns False if it was dropped or merged.
+
+        detected_at/app_path identify the launch that asked for it, for the trace.
+        """
+        now = time.monotonic()
+        with self._cond:
+            if self._shutdown:
+                return False
+            self.submitted += 1
+            if self._overflow_policy == OVERFLOW_COALESCE:
+                last = self._last_submitted.get(sound_path)
+                if last is not None and now - last < self._coalesce_window:
+                    self.coalesced += 1
+                    return False
+            if len(self._queue) >= self._max_queue:
+                if self._overflow_policy == OVERFLOW_DROP_NEWEST:
+                    self.dropped_newest += 1
+                    return False
+                self._queue.popleft()
+                self.dropped_oldest += 1
+            trace = PlaybackTrace(sound_path, detected_at, app_path)
+            trace.submitted_at = now
+            self._queue.append(trace)
+            self._last_submitted[sound_path] = now
+            if len(self._last_submitted) > 4 * self._max_queue:
+                self._prune_coalesce_history(now)
+            self._cond.notify()
+            return True
+
+    def stats(self):
+        with self._cond:
+            return {
+                "queue_depth": len(self._queue),
+                "max_queue": self._max_queue,
+                "active": self._active,
+                "workers": len(self._threads),
+                "overflow_policy": self._overflow_policy,
+                "submitted": self.submitted,
+                "played": self.played,
+                "failed": self.failed,
+                "dropped_oldest": self.dropped_oldest,
+                "dropped_newest": self.dropped_newest,
+                "coalesced": self.coalesced,
+            }
+
+    def shutdown(self, wait=True, timeout=None):
+        """Discards pending sounds and stops the workers.
+
+        Sounds already playing are allowed to finish; with wait=True this
+        waits up to timeout seconds (in total) for the workers to exit.
+        """
+        with self._cond:
+            self._shutdown = True
+            self._queue.clear()
+            self._cond.notify_all()
+        if wait:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            for thread in self._threads:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                thread.join(remaining)
+
+    def _prune_coalesce_history(self, now):
+        # Expects self._cond to be held.
+        expired = [path for path, ts in self._last_submitted.items() if now - ts >= self._coalesce_window]
+        for path in expired:
+            del self._last_submitted[path]
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._shutdown:
+                    self._cond.wait()
+                if self._shutdown:
+                    return
+                trace = self._queue.popleft()
+                self._active += 1
+            trace.started_at = time.monotonic()
+            _worker_state.trace = trace
+            try:
+                self._play_func(trace.sound_path)
+                succeeded = True
+            except Exception:
+                succeeded = False
+            finally:
+                _worker_state.trace = None
+            if self._on_finished is not None:
+                try:
+                    self._on_finished(trace, succeeded)
+                except Exception:
+                    pass # Bookkeeping must never stop a playback worker
+            with self._cond:
+                self._active -= 1
+                if succeeded:
+                    self.played += 1
+                else:
+                    self.failed += 1
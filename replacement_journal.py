@@ -0,0 +1,204 @@
+"""Write-ahead journal for filesystem changes made by sound replacements.
+
+Every rename/unlink/symlink a ReplacementTransaction performs is appended
+to the journal and fsynced *before* it touches the disk. A transaction then
+writes "commit" (with the config changes it implies) once its filesystem
+work is done, and "end" once the config file has been saved.
+
+On startup, recover_pending() finishes whatever a crash interrupted:
+  - committed but not ended: the config updates are replayed;
+  - not committed: every logged step is undone (each undo checks the
+    current state first, so steps that never ran are skipped).
+
+Journal lines are JSON objects:
+  {"txn": id, "op": "begin", "kind": "apply"}
+  {"txn": id, "op": "step", "action": ["rename", src, dst]}
+  {"txn": id, "op": "commit", "updates": {original: record|null}, "displaced": [...]}
+  {"txn": id, "op": "end"} / {"txn": id, "op": "abort"}
+"""
+import json
+import os
+import threading
+import time
+import uuid
+
+
+def undo_action(action):
+    """Reverses one journalled action if (and only if) it actually took effect.
+
+    Actions:
+      ["rename", src, dst]           - undone by moving dst back to src
+      ["unlink", path, old_target]   - a removed symlink; undone by recreating it
+      ["symlink", target, path]      - a created symlink; undone by removing it
+    """
+    kind = action[0]
+    if kind == "rename":
+        src, dst = action[1], action[2]
+        if os.path.lexists(dst) and not os.path.lexists(src):
+            os.rename(dst, src)
+    elif kind == "unlink":
+        path, old_target = action[1], action[2]
+        if not os.path.lexists(path):
+            os.symlink(old_target, path)
+    elif kind == "symlink":
+        target, path = action[1], action[2]
+        if os.path.islink(path) and os.readlink(path) == target:
+            os.remove(path)
+    else:
+        raise ValueError(f"Unknown journal action: {action!r}")
+
+
+class PendingTransaction:
+    """A journalled transaction that never reached "end" or "abort"."""
+
+    def __init__(self, txn_id, kind):
+        self.txn_id = txn_id
+        self.kind = kind
+        self.steps = []
+        self.committed = False
+        self.updates = {}
+        self.displaced = []
+
+
+class ReplacementJournal:
+    """Append-only, fsynced JSON-lines journal."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+        self._open_transactions = set()
+
+    def _write(self, entry):
+        with self._lock:
+            self._append(entry)
+
+    def _append(self, entry):
+        # Expects self._lock to be held.
+        line = json.dumps(entry) + "\n"
+        if self._file is None:
+            self._file = open(self.path, "a")
+        self._file.write(line)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def begin(self, kind):
+        txn_id = uuid.uuid4().hex
+        # Registered under the same lock as the write, so a concurrent end/abort can't truncate the begin line away
+        with self._lock:
+            self._open_transactions.add(txn_id)
+            try:
+                self._append({"txn": txn_id, "op": "begin", "kind": kind, "ts": time.time()})
+            except Exception:
+                self._open_transactions.discard(txn_id)
+                raise
+        return txn_id
+
+    def log_step(self, txn_id, action):
+        self._write({"txn": txn_id, "op": "step", "action": list(action)})
+
+    def log_commit(self, txn_id, updates, displaced=()):
+        self._write({"txn": txn_id, "op": "commit", "updates": updates, "displaced": list(displaced)})
+
+    def log_end(self, txn_id):
+        self._close_transaction(txn_id, "end")
+
+    def log_abort(self, txn_id):
+        self._close_transaction(txn_id, "abort")
+
+    def _close_transaction(self, txn_id, op):
+        with self._lock:
+            self._append({"txn": txn_id, "op": op})
+            self._open_transactions.discard(txn_id)
+            self._truncate_if_idle()
+
+    def pending(self):
+        """Returns the PendingTransactions left unfinished in the journal file, oldest first."""
+        transactions = {}
+        try:
+            with open(self.path, "r") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return []
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # Torn final line from a crash mid-write; that step never ran.
+            txn_id, op = entry.get("txn"), entry.get("op")
+            if op == "begin":
+                transactions[txn_id] = PendingTransaction(txn_id, entry.get("kind"))
+            elif txn_id not in transactions:
+                continue
+            elif op == "step":
+                transactions[txn_id].steps.append(entry["action"])
+            elif op == "commit":
+                transactions[txn_id].committed = True
+                transactions[txn_id].updates = entry.get("updates", {})
+                transactions[txn_id].displaced = entry.get("displaced", [])
+            elif op in ("end", "abort"):
+                del transactions[txn_id]
+        with self._lock:
+            # Keep the journal from being compacted until each one is ended or aborted.
+            self._open_transactions.update(transactions)
+        return list(transactions.values())
+
+    def compact(self):
+        """Truncates the journal when no transaction is in flight."""
+        with self._lock:
+            self._truncate_if_idle()
+
+    def _truncate_if_idle(self):
+        # Expects self._lock to be held, so no begin() can slip in between the check and the truncation.
+        if self._open_transactions:
+            return
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        try:
+            with open(self.path, "w") as f:
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError:
+            pass
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def recover_pending(journal, applied_file_modifications):
+    """Finishes or undoes transactions a crash left behind.
+
+    Committed transactions have their config updates replayed into
+    applied_file_modifications (the caller must save the config and then
+    call journal.log_end for each id in the returned "replayed" list);
+    uncommitted ones are rolled back on disk and marked aborted.
+    Returns {"replayed": [txn ids], "rolled_back": [txn ids], "failures": [(action, error)]}.
+    """
+    report = {"replayed": [], "rolled_back": [], "failures": []}
+    for txn in journal.pending():
+        if txn.committed:
+            for original_path, record in txn.updates.items():
+                if record is None:
+                    applied_file_modifications.pop(original_path, None)
+                else:
+                    applied_file_modifications[original_path] = record
+            for displaced in txn.displaced:
+                try:
+                    if os.path.lexists(displaced):
+                        os.remove(displaced)
+                except OSError as e:
+                    report["failures"].append((["remove", displaced], str(e)))
+            report["replayed"].append(txn.txn_id)
+        else:
+            for action in reversed(txn.steps):
+                try:
+                    undo_action(action)
+                except OSError as e:
+                    report["failures"].append((action, str(e)))
+            journal.log_abort(txn.txn_id)
+            report["rolled_back"].append(txn.txn_id)
+    return report
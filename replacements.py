@@ -0,0 +1,598 @@
+"""Filesystem side of sound replacement: backing up originals and symlinking targets.
+
+Replacements are applied and reverted through a ReplacementTransaction,
+which logs every rename/unlink/symlink it performs. If any step of a
+batch fails, everything the transaction already changed is rolled back,
+so a bundle is never left half-modified. With a ReplacementJournal each
+step is also written ahead to disk, so a crash can be recovered from on
+the next start (see replacement_journal.recover_pending).
+"""
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+
+from replacement_journal import undo_action
+
+BACKUP_SUFFIX = ".bak"
+_DISPLACED_SUFFIX = ".replaced"
+
+# Outcomes of ReplacementTransaction.revert()
+REVERT_RESTORED = "restored"                  # Backup moved back into place
+REVERT_BACKUP_MISSING = "backup_missing"      # Link removed, recorded backup not found
+REVERT_NO_BACKUP_INFO = "no_backup_info"      # Link removed, no backup was recorded
+REVERT_ORIGINAL_PRESENT = "original_present"  # No backup, and a real file (not our link) is in place
+REVERT_FAILED = "failed"                      # Raised an error; rolled back, record kept
+REVERT_SKIPPED = "skipped"                    # Not attempted because the bulk revert was cancelled
+
+
+# States reported by check_replacement()
+STATE_HEALTHY = "healthy"                # Our symlink is in place and its target exists
+STATE_BROKEN_TARGET = "broken_target"    # Our symlink is in place but the target sound is gone
+STATE_OVERWRITTEN = "overwritten"        # A real file or another link replaced ours (e.g. an app update)
+STATE_MISSING = "missing"                # Nothing exists at the original path
+STATE_BACKUP_MISSING = "backup_missing"  # Link is fine, but there is no backup left to revert to
+STATE_ORPHANED_BACKUP = "orphaned_backup"  # Our link is gone but its backup is still there
+STATE_UNCHECKED = "unchecked"            # check_replacements() ran out of time before reaching it
+
+
+class ReplacementError(Exception):
+    """Raised when a replacement cannot be applied (bad target, backup conflict)."""
+
+
+def backup_path_for(original_path):
+    return original_path + BACKUP_SUFFIX
+
+
+def has_backup_conflict(original_path):
+    """True if replacing original_path would overwrite an existing backup file."""
+    return (not os.path.islink(original_path) and os.path.exists(original_path)
+            and os.path.lexists(backup_path_for(original_path)))
+
+
+def check_replacement(original_path, record):
+    """Returns (state, detail) describing whether a recorded replacement is still intact."""
+    target_path = record.get("target_linked_to")
+    backup_path = record.get("backup_path")
+    try:
+        link_target = os.readlink(original_path)
+    except FileNotFoundError:
+        if backup_path and os.path.lexists(backup_path):
+            return STATE_ORPHANED_BACKUP, f"original path does not exist, backup is left at {backup_path}"
+        return STATE_MISSING, "original path does not exist"
+    except OSError:
+        return STATE_OVERWRITTEN, "original path is a regular file, not our symlink"
+    if link_target != target_path:
+        return STATE_OVERWRITTEN, f"symlink now points to {link_target}"
+    if not os.path.exists(original_path):
+        return STATE_BROKEN_TARGET, f"target sound is missing: {target_path}"
+    if backup_path and not os.path.lexists(backup_path):
+        return STATE_BACKUP_MISSING, f"backup is missing: {backup_path}"
+    return STATE_HEALTHY, ""
+
+
+class HealthReport:
+    """Result of check_replacements(): a (state, detail) per checked record, plus what was left unchecked."""
+
+    def __init__(self):
+        self.results = {}  # {original_path: (state, detail)}
+        self.unchecked = []
+        self.timed_out = False
+        self.elapsed = 0.0
+
+    def counts(self):
+        counts = {}
+        for state, _ in self.results.values():
+            counts[state] = counts.get(state, 0) + 1
+        if self.unchecked:
+            counts[STATE_UNCHECKED] = len(self.unchecked)
+        return counts
+
+    def problems(self):
+        return sorted((path, state, detail) for path, (state, detail) in self.results.items() if state != STATE_HEALTHY)
+
+    def state_of(self, original_path):
+        return self.results.get(original_path, (STATE_UNCHECKED, ""))[0]
+
+    def summary(self):
+        counts = self.counts()
+        if not counts:
+            return "No replacements to check"
+        parts = [f"{counts[state]} {state.replace('_', ' ')}" for state in
+                 (STATE_HEALTHY, STATE_BROKEN_TARGET, STATE_OVERWRITTEN, STATE_MISSING, STATE_ORPHANED_BACKUP,
+                  STATE_BACKUP_MISSING, STATE_UNCHECKED) if counts.get(state)]
+        text = ", ".join(parts)
+        if self.timed_out:
+            text += f" (stopped after {self.elapsed:.1f}s)"
+        return text
+
+
+def _check_folder(folder, items, target_exists):
+    """check_replacement() for every (original_path, record) in one folder, from a single listing.
+
+    One scandir answers "is it there, is it a link, is the backup next to
+    it" for the whole folder; only our links are readlink()ed, and each
+    distinct target is stat()ed once (target_exists is shared between
+    folders). Falls back to per-file checks if the folder can't be listed.
+    """
+    try:
+        with os.scandir(folder) as it:
+            entries = {entry.name: entry for entry in it}
+    except FileNotFoundError:
+        entries = {}  # The whole folder (or bundle) is gone
+    except OSError:
+        return [(path, check_replacement(path, record)) for path, record in items]
+    results = []
+    for original_path, record in items:
+        target_path = record.get("target_linked_to")
+        backup_path = record.get("backup_path")
+        if backup_path and os.path.dirname(backup_path) == folder:
+            backup_present = os.path.basename(backup_path) in entries
+        else:
+            backup_present = bool(backup_path) and os.path.lexists(backup_path)
+        entry = entries.get(os.path.basename(original_path))
+        try:
+            if entry is None:
+                raise FileNotFoundError(original_path)
+            if not entry.is_symlink():
+                results.append((original_path, (STATE_OVERWRITTEN, "original path is a regular file, not our symlink")))
+                continue
+            link_target = os.readlink(original_path)
+        except FileNotFoundError:
+            if backup_present:
+                results.append((original_path, (STATE_ORPHANED_BACKUP,
+                                                 f"original path does not exist, backup is left at {backup_path}")))
+            else:
+                results.append((original_path, (STATE_MISSING, "original path does not exist")))
+            continue
+        except OSError:
+            results.append((original_path, (STATE_OVERWRITTEN, "original path is a regular file, not our symlink")))
+            continue
+        if link_target != target_path:
+            results.append((original_path, (STATE_OVERWRITTEN, f"symlink now points to {link_target}")))
+            continue
+        exists = target_exists.get(target_path)
+        if exists is None:
+            # Links are absolute, so the target's existence is the link's
+            exists = target_exists[target_path] = os.path.exists(target_path)
+        if not exists:
+            results.append((original_path, (STATE_BROKEN_TARGET, f"target sound is missing: {target_path}")))
+        elif backup_path and not backup_present:
+            results.append((original_path, (STATE_BACKUP_MISSING, f"backup is missing: {backup_path}")))
+        else:
+            results.append((original_path, (STATE_HEALTHY, "")))
+    return results
+
+
+def check_replacements(records, workers=8, time_budget=None, cancel_event=None):
+    """Runs check_replacement() over {original_path: record} on a thread pool, one task per folder.
+
+    With time_budget (seconds) the call returns once the budget is spent,
+    even if some folders sit on a slow or hung disk; records not reached
+    are listed in report.unchecked. Returns a HealthReport.
+    """
+    report = HealthReport()
+    started = time.monotonic()
+    by_folder = defaultdict(list)
+    for original_path, record in records.items():
+        by_folder[os.path.dirname(original_path)].append((original_path, record or {}))
+    target_exists = {}
+    stop = threading.Event()
+
+    def run(folder, items):
+        if stop.is_set() or (cancel_event is not None and cancel_event.is_set()):
+            return None
+        return _check_folder(folder, items, target_exists)
+
+    pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="health-check")
+    futures = {pool.submit(run, folder, items): items for folder, items in by_folder.items()}
+    pending = set(futures)
+    try:
+        while pending:
+            timeout = None if time_budget is None else time_budget - (time.monotonic() - started)
+            if timeout is not None and timeout <= 0:
+                report.timed_out = True
+                break
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                results = future.result()
+                if results is None:
+                    report.unchecked.extend(path for path, _ in futures[future])
+                else:
+                    report.results.update(results)
+    finally:
+        stop.set()
+        # Don't wait for folders stuck on a slow disk; their threads finish in the background
+        pool.shutdown(wait=False, cancel_futures=True)
+    for future in pending:
+        report.unchecked.extend(path for path, _ in futures[future])
+    report.elapsed = time.monotonic() - started
+    return report
+
+
+class ReplacementTransaction:
+    """Applies and reverts replacements while keeping an undo log.
+
+    The undo log holds the forward actions performed (see
+    replacement_journal.undo_action); rollback() replays them in reverse.
+    Files displaced along the way (an overwritten backup, a real file in
+    the way of a restore) are kept until commit().
+
+    Typical use: apply()/revert() ..., commit(), save the config, finish().
+    """
+
+    def __init__(self, journal=None, kind="apply"):
+        self.journal = journal
+        self.kind = kind
+        self.txn_id = None
+        self.undo_log = []
+        self.updates = {}  # {original_path: record, or None to forget it}
+        self._displaced = []
+
+    def _do(self, action):
+        if self.journal is not None:
+            if self.txn_id is None:
+                self.txn_id = self.journal.begin(self.kind)
+            self.journal.log_step(self.txn_id, action)
+        kind = action[0]
+        if kind == "rename":
+            os.rename(action[1], action[2])
+        elif kind == "unlink":
+            os.remove(action[1])
+        elif kind == "symlink":
+            os.symlink(action[1], action[2])
+        self.undo_log.append(action)
+
+    def _displace(self, path):
+        displaced = path + _DISPLACED_SUFFIX
+        self._do(("rename", path, displaced))
+        self._displaced.append(displaced)
+
+    def apply(self, original_path, target_path, overwrite_backup=False):
+        """Replaces original_path with a symlink to target_path.
+
+        Returns the record stored in applied_file_modifications.
+        """
+        if not os.path.exists(target_path):
+            raise ReplacementError(f"Target sound file does not exist: {target_path}")
+        backup_path = backup_path_for(original_path)
+
+        if os.path.islink(original_path):
+            # Already replaced: swap the link, keep the existing backup.
+            self._do(("unlink", original_path, os.readlink(original_path)))
+        elif os.path.exists(original_path):
+            if os.path.lexists(backup_path):
+                if not overwrite_backup:
+                    raise ReplacementError(f"Backup file already exists: {backup_path}")
+                self._displace(backup_path)
+            self._do(("rename", original_path, backup_path))
+
+        self._do(("symlink", target_path, original_path))
+        record = {"backup_path": backup_path, "target_linked_to": target_path}
+        self.updates[original_path] = record
+        return record
+
+    def revert(self, original_path, backup_path):
+        """Removes our symlink at original_path and restores backup_path over it.
+
+        Returns one of the REVERT_* outcomes. A restored record is forgotten
+        automatically; for the other outcomes the caller decides via forget().
+        """
+        if os.path.islink(original_path):
+            self._do(("unlink", original_path, os.readlink(original_path)))
+
+        if backup_path and os.path.lexists(backup_path):
+            if os.path.lexists(original_path):
+                self._displace(original_path)  # A real file is in the way of the restore.
+            self._do(("rename", backup_path, original_path))
+            self.forget(original_path)
+            return REVERT_RESTORED
+        if os.path.lexists(original_path):
+            return REVERT_ORIGINAL_PRESENT
+        return REVERT_BACKUP_MISSING if backup_path else REVERT_NO_BACKUP_INFO
+
+    def forget(self, original_path):
+        """Marks original_path's record for removal from applied_file_modifications."""
+        self.updates[original_path] = None
+
+    def rollback(self):
+        """Undoes every step performed, newest first. Returns a list of (action, error) that failed."""
+        failures = []
+        while self.undo_log:
+            action = self.undo_log.pop()
+            try:
+                undo_action(action)
+            except OSError as e:
+                failures.append((action, str(e)))
+        if self.journal is not None and self.txn_id is not None:
+            self.journal.log_abort(self.txn_id)
+        self.txn_id = None
+        self.updates = {}
+        self._displaced = []
+        return failures
+
+    def commit(self):
+        """Marks the filesystem work done and deletes displaced files. Returns failures.
+
+        The config changes in self.updates are journalled here; call
+        finish() once they have been saved.
+        """
+        if self.journal is not None and self.txn_id is not None:
+            self.journal.log_commit(self.txn_id, self.updates, self._displaced)
+        failures = []
+        for displaced in self._displaced:
+            try:
+                os.remove(displaced)
+            except OSError as e:
+                failures.append((("remove", displaced), str(e)))
+        self._displaced = []
+        self.undo_log = []
+        return failures
+
+    def finish(self):
+        """Records that the config updates from commit() have been saved."""
+        if self.journal is not None and self.txn_id is not None:
+            self.journal.log_end(self.txn_id)
+        self.txn_id = None
+
+
+def bundle_keys_for(original_path):
+    """Normalized paths of every .app bundle that contains original_path, outermost first."""
+    parts = os.path.normpath(original_path).split(os.sep)
+    return [os.sep.join(parts[:i + 1]) for i in range(len(parts) - 1) if parts[i].endswith(".app")]
+
+
+class ModificationRecords(dict):
+    """applied_file_modifications with a per-app index.
+
+    Behaves as the plain {original_path: record} dict, but also keeps
+    {bundle_path: {original_path: None}} for every .app bundle containing
+    each original path (nested helper apps included), so one app's records
+    are found in O(k) instead of scanning every record. All mutating dict
+    methods keep the index in sync, and remember which original paths
+    were set or removed until pop_changed(), so saves only carry those.
+    """
+
+    def __init__(self, records=None):
+        super().__init__()
+        self._by_bundle = {}
+        self._by_dir = {}  # {folder: {original_path: None}}, for the bundle watcher
+        self._changed = {}  # {original_path: None} set or removed since the last pop_changed()
+        if records:
+            self.update(records)
+
+    def _index(self, original_path):
+        for key in bundle_keys_for(original_path):
+            self._by_bundle.setdefault(key, {})[original_path] = None
+        self._by_dir.setdefault(os.path.dirname(os.path.normpath(original_path)), {})[original_path] = None
+
+    def _unindex(self, original_path):
+        keys = [(self._by_bundle, key) for key in bundle_keys_for(original_path)]
+        keys.append((self._by_dir, os.path.dirname(os.path.normpath(original_path))))
+        for index, key in keys:
+            paths = index.get(key)
+            if paths is not None:
+                paths.pop(original_path, None)
+                if not paths:
+                    del index[key]
+
+    def __setitem__(self, original_path, record):
+        if original_path not in self:
+            self._index(original_path)
+        super().__setitem__(original_path, record)
+        self._changed[original_path] = None
+
+    def __delitem__(self, original_path):
+        super().__delitem__(original_path)
+        self._unindex(original_path)
+        self._changed[original_path] = None
+
+    def pop(self, original_path, *default):
+        if original_path in self:
+            self._unindex(original_path)
+            self._changed[original_path] = None
+        return super().pop(original_path, *default)
+
+    def popitem(self):
+        original_path, record = super().popitem()
+        self._unindex(original_path)
+        self._changed[original_path] = None
+        return original_path, record
+
+    def setdefault(self, original_path, record=None):
+        if original_path not in self:
+            self[original_path] = record
+        return self[original_path]
+
+    def update(self, *args, **kwargs):
+        for original_path, record in dict(*args, **kwargs).items():
+            self[original_path] = record
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def clear(self):
+        self._changed.update(dict.fromkeys(self))
+        super().clear()
+        self._by_bundle.clear()
+        self._by_dir.clear()
+
+    def pop_changed(self):
+        """The original paths set or removed since the last call, oldest first."""
+        changed, self._changed = list(self._changed), {}
+        return changed
+
+    def paths_for_app(self, app_path):
+        """Original paths inside app_path's bundle, in insertion order."""
+        key = os.path.normpath(app_path)
+        if key.endswith(".app"):
+            return list(self._by_bundle.get(key, ()))
+        # Not a bundle path, so it is not indexed; fall back to a prefix scan.
+        prefix = key + os.sep
+        return [path for path in self if os.path.normpath(path).startswith(prefix)]
+
+    def paths_in_dir(self, folder):
+        """Original paths directly inside folder."""
+        return list(self._by_dir.get(os.path.normpath(folder), ()))
+
+    def bundles_in_dir(self, folder):
+        """Bundles holding records that sit directly inside folder (e.g. /Applications)."""
+        folder = os.path.normpath(folder)
+        return [bundle for bundle in self._by_bundle if os.path.dirname(bundle) == folder]
+
+    def for_app(self, app_path):
+        """[(original_path, record)] for app_path's bundle."""
+        return [(path, self[path]) for path in self.paths_for_app(app_path)]
+
+
+class BatchApplyResult:
+    def __init__(self, applied=None, error=None, failed_path=None, cancelled=False, rollback_failures=(),
+                 transaction=None):
+        self.applied = applied or {}  # {original_path: record}; empty if rolled back
+        self.error = error
+        self.failed_path = failed_path
+        self.cancelled = cancelled
+        self.rollback_failures = list(rollback_failures)
+        self.transaction = transaction  # Committed transaction; call finish() after saving the config
+
+    @property
+    def ok(self):
+        return self.error is None and not self.cancelled
+
+
+def apply_replacements(pairs, overwrite_backups=False, progress=None, cancel_event=None, journal=None):
+    """Applies [(original_path, target_path)] as one all-or-nothing transaction.
+
+    progress(done, total, original_path) is called after each replacement.
+    If a step fails, or cancel_event is set, every change made so far is
+    rolled back and the result reports why.
+    """
+    txn = ReplacementTransaction(journal=journal, kind="apply")
+    applied = {}
+    total = len(pairs)
+    for done, (original_path, target_path) in enumerate(pairs, start=1):
+        if cancel_event is not None and cancel_event.is_set():
+            return BatchApplyResult(cancelled=True, rollback_failures=txn.rollback())
+        try:
+            applied[original_path] = txn.apply(original_path, target_path, overwrite_backup=overwrite_backups)
+        except (OSError, ReplacementError) as e:
+            return BatchApplyResult(error=str(e), failed_path=original_path, rollback_failures=txn.rollback())
+        if progress is not None:
+            progress(done, total, original_path)
+    txn.commit()
+    return BatchApplyResult(applied=applied, transaction=txn)
+
+
+class BulkRevertReport:
+    """Outcome of revert_replacements(): one entry per file, plus the transactions to finish."""
+
+    def __init__(self):
+        self.entries = []  # [{"original_path", "backup_path", "outcome", "reason"}]
+        self.transactions = []  # Committed transactions; call finish() after saving the config
+        self.cancelled = False
+        self.elapsed = 0.0
+
+    def add(self, original_path, backup_path, outcome, reason=""):
+        self.entries.append({"original_path": original_path, "backup_path": backup_path,
+                             "outcome": outcome, "reason": reason})
+
+    def counts(self):
+        counts = {}
+        for entry in self.entries:
+            counts[entry["outcome"]] = counts.get(entry["outcome"], 0) + 1
+        return counts
+
+    def updates(self):
+        """The config changes of every committed transaction: {original_path: record or None}."""
+        merged = {}
+        for txn in self.transactions:
+            merged.update(txn.updates)
+        return merged
+
+    def summary(self):
+        counts = self.counts()
+        parts = [f"{counts.get(REVERT_RESTORED, 0)} restored",
+                 f"{counts.get(REVERT_BACKUP_MISSING, 0) + counts.get(REVERT_NO_BACKUP_INFO, 0)} backup missing",
+                 f"{counts.get(REVERT_ORIGINAL_PRESENT, 0)} left in place",
+                 f"{counts.get(REVERT_FAILED, 0)} failed"]
+        if counts.get(REVERT_SKIPPED):
+            parts.append(f"{counts[REVERT_SKIPPED]} skipped (cancelled)")
+        return ", ".join(parts)
+
+    def to_dict(self):
+        return {"summary": self.counts(), "cancelled": self.cancelled, "elapsed_s": self.elapsed,
+                "entries": self.entries}
+
+    def to_text(self):
+        lines = [f"Bulk revert report: {self.summary()}", ""]
+        for entry in sorted(self.entries, key=lambda e: (e["outcome"], e["original_path"])):
+            line = f"[{entry['outcome']}] {entry['original_path']}"
+            if entry["reason"]:
+                line += f" - {entry['reason']}"
+            lines.append(line)
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        """Writes the report as JSON (for a .json path) or plain text."""
+        with open(path, "w") as f:
+            if path.lower().endswith(".json"):
+                json.dump(self.to_dict(), f, indent=2)
+            else:
+                f.write(self.to_text())
+
+
+def _revert_one(original_path, backup_path, journal, forget_always):
+    txn = ReplacementTransaction(journal=journal, kind="revert")
+    try:
+        outcome = txn.revert(original_path, backup_path)
+        if forget_always or outcome != REVERT_ORIGINAL_PRESENT:
+            txn.forget(original_path)
+        txn.commit()
+    except Exception as e: # Anything escaping here would lose the other files' results
+        reason = str(e) or type(e).__name__
+        try:
+            failures = txn.rollback()
+        except Exception as rollback_error:
+            failures = [(None, str(rollback_error))]
+        if failures:
+            reason += f" (rollback incomplete: {failures})"
+        return original_path, backup_path, REVERT_FAILED, reason, None
+    return original_path, backup_path, outcome, "", txn
+
+
+def revert_replacements(records, progress=None, cancel_event=None, journal=None, workers=4, forget_always=False):
+    """Reverts {original_path: record} on a thread pool, one transaction per file.
+
+    Files are independent: a failure is rolled back and reported without
+    touching the others. Records are forgotten unless a real file turned
+    out to be in place, or always with forget_always (the app is being
+    removed). Once cancel_event is set, files not yet started are reported
+    as skipped. progress(done, total, original_path) is called from the
+    calling thread.
+    """
+    report = BulkRevertReport()
+    started = time.monotonic()
+    items = list(records.items())
+    total = len(items)
+
+    def run(original_path, record):
+        backup_path = record.get("backup_path") if record else None
+        if cancel_event is not None and cancel_event.is_set():
+            return original_path, backup_path, REVERT_SKIPPED, "cancelled", None
+        return _revert_one(original_path, backup_path, journal, forget_always)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="bulk-revert") as pool:
+        futures = [pool.submit(run, original_path, record) for original_path, record in items]
+        for done, future in enumerate(as_completed(futures), start=1):
+            original_path, backup_path, outcome, reason, txn = future.result()
+            report.add(original_path, backup_path, outcome, reason)
+            if txn is not None:
+                report.transactions.append(txn)
+            if progress is not None:
+                progress(done, total, original_path)
+    report.cancelled = cancel_event is not None and cancel_event.is_set()
+    report.elapsed = time.monotonic() - started
+    return report
@@ -0,0 +1,962 @@
+"""GUI-free core of Sound Replacer: config, bundle scanning, replacements and launch monitoring.
+
+SoundReplacerCore owns the persisted state (monitored apps, applied file
+modifications, default sources, settings) and the services built on it.
+Nothing here imports Tk or AppKit, so the same core backs the Tk app
+(app_monitor.py), the command-line tool and the headless daemon
+(sound_replacer_cli.py). Problems are returned or raised, never shown;
+the front end decides how to present them.
+
+The state dicts are created once and only ever mutated in place, so a
+front end may keep its own references to them.
+"""
+import logging
+import os
+import threading
+
+from audio_cache import SoundCache, numpy_or_none
+from audio_mixer import AudioMixer, SoundDeviceSink, sounddevice_available
+from bundle_scanner import BundleScanner, DEFAULT_PRUNE_PATTERNS, SOUND_EXTENSIONS
+from bundle_watcher import default_bundle_watcher
+from config_store import DELETED, ConfigSaver, JSONConfigBackend, open_config_backend
+from launch_events import LaunchDispatcher, default_launch_source
+from launch_rules import OUTCOME_PLAY, LaunchRuleEngine
+from log_pipeline import json_file_handler
+from metrics import MetricsFileWriter, MetricsHTTPServer, MetricsRegistry
+from playback import PlaybackExecutor, mark_audio_started, mark_decoded
+from replacement_journal import ReplacementJournal, recover_pending
+from replacements import (BatchApplyResult, HealthReport, ModificationRecords, apply_replacements, bundle_keys_for, check_replacement,
+                          check_replacements, revert_replacements, STATE_MISSING, STATE_ORPHANED_BACKUP,
+                          STATE_OVERWRITTEN)
+from sound_inventory import SoundInventoryIndex
+from sound_library import SoundLibraryIndex
+from sound_metadata import MetadataIndexer, SoundMetadataIndex
+from transcode import TranscodeCache
+
+logger = logging.getLogger("sound_replacer.core")
+
+APP_CONFIG_FILE = "app_monitor_config.json"
+APP_CONFIG_DB_FILE = "app_monitor_config.sqlite3" # Used instead of the JSON file once migrated, see load_config()
+SOUND_INVENTORY_FILE = "sound_inventory.json" # Per-bundle scan index, kept next to the config file
+SOUND_LIBRARY_FILE = "sound_library.json" # Folder listing of the (nested) sounds folder, see sound_library.py
+SOUND_METADATA_FILE = "sound_metadata.json" # Duration/loudness/format per sound file, see sound_metadata.py
+REPLACEMENT_JOURNAL_FILE = "replacement_journal.jsonl" # Write-ahead log of in-flight bundle changes
+TRANSCODE_CACHE_DIR = "transcode_cache" # Targets converted to the format of the sound they replace
+SOUNDS_DIR = "sounds"
+
+DEFAULT_PLAYBACK_SETTINGS = { # Tunables for sound playback, persisted in the config file
+    "cache_budget_mb": 64,
+    "workers": 2,
+    "queue_size": 8,
+    "overflow_policy": "coalesce", # "drop_oldest", "drop_newest" or "coalesce"
+    "coalesce_window_s": 0.5,
+    "mixer": True, # Mix all sounds on one pre-opened output stream (needs numpy and sounddevice), see audio_mixer.py
+    "mixer_sample_rate": 48000,
+    "mixer_block_frames": 512, # Smaller blocks start sounds sooner but wake the audio thread more often
+    "max_voices": 8, # Sounds mixed at once; one more replaces the one playing longest
+    "gain": 1.0 # Master gain of the mixer; its limiter keeps loud overlaps from clipping
+}
+
+MIXER_START_TIMEOUT_S = 1.0 # How long a playback worker waits for the mixer to pick up its sound
+
+DEFAULT_SCAN_SETTINGS = { # Bundle scanner tunables, persisted in the config file
+    "prune_patterns": list(DEFAULT_PRUNE_PATTERNS), # Directory-name globs skipped while scanning
+    "max_depth": None, # Levels below the scan root to enter; None for unlimited
+    "workers": 4
+}
+
+
+WATCH_POLICY_REAPPLY = "reapply" # Re-apply lost replacements as soon as the update has settled
+WATCH_POLICY_QUEUE = "queue" # Collect them in pending_reapply until the user re-applies them
+
+DEFAULT_WATCH_SETTINGS = { # Bundle watcher tunables, persisted in the config file
+    "enabled": True,
+    "policy": WATCH_POLICY_REAPPLY, # "reapply" or "queue"
+    "debounce_s": 2.0 # Quiet time after the last change before affected replacements are checked
+}
+
+DEFAULT_TRANSCODE_SETTINGS = { # Target conversion tunables, persisted in the config file
+    "match_format": False, # Convert targets to the replaced sound's container, sample rate and channels
+    "workers": 0 # Converter processes run at once; 0 for one per CPU
+}
+
+DEFAULT_HEALTH_SETTINGS = { # Replacement health check tunables, persisted in the config file
+    "check_on_startup": True,
+    "workers": 8, # Folders checked in parallel
+    "time_budget_s": 3.0 # The startup check gives up after this long; unreached records show as unchecked
+}
+
+DEFAULT_LOG_SETTINGS = { # Logging tunables, persisted in the config file
+    "level": "INFO", # "DEBUG" also logs every preview, scan path and config save
+    "file": "sound_replacer.log.jsonl", # JSON-lines log next to the config file; empty for none
+    "max_mb": 5, # Rotated at this size...
+    "backups": 3, # ...keeping this many old files
+    "rate_limit_burst": 20, # Records per call site let through every rate_limit_window_s; 0 disables the limit
+    "rate_limit_window_s": 10.0
+}
+
+DEFAULT_METRICS_SETTINGS = { # Latency/counter export, persisted in the config file; both exports are off by default
+    "http_port": 0, # Serve Prometheus text at http://127.0.0.1:<port>/metrics; 0 disables
+    "file_path": "", # Rewrite this file with the same text every interval_s; empty disables
+    "interval_s": 15.0,
+    "window": 1024 # Recent launches per stage the p50/p95/p99 gauges are computed over
+}
+
+_USE_SETTINGS = object() # check_health()'s default budget: health_settings, as opposed to None (no limit)
+
+
+def list_sound_files(folder_path, extensions=SOUND_EXTENSIONS):
+    """Returns full paths of the sound files directly inside folder_path. Raises OSError."""
+    return [os.path.join(folder_path, name) for name in sorted(os.listdir(folder_path))
+            if name.lower().endswith(extensions) and os.path.isfile(os.path.join(folder_path, name))]
+
+
+class SoundReplacerCore:
+    """Persisted state plus the services that act on it. See the module docstring."""
+
+    def __init__(self, base_dir="."):
+        self.base_dir = base_dir
+        self.config_path = os.path.join(base_dir, APP_CONFIG_FILE)
+        self.config_db_path = os.path.join(base_dir, APP_CONFIG_DB_FILE)
+        self.sounds_dir = os.path.join(base_dir, SOUNDS_DIR)
+
+        self.monitored_apps = {} # {"app_path": "sound_file_name.mp3"}
+        self.applied_file_modifications = ModificationRecords() # {"original_path": {"backup_path", "target_linked_to"}}, indexed per app
+        self.app_default_symlink_sources = {} # {"app_path": "default_source_sound_for_symlinks.wav"}
+        self.playback_settings = dict(DEFAULT_PLAYBACK_SETTINGS)
+        self.scan_settings = dict(DEFAULT_SCAN_SETTINGS)
+        self.watch_settings = dict(DEFAULT_WATCH_SETTINGS)
+        self.health_settings = dict(DEFAULT_HEALTH_SETTINGS)
+        self.transcode_settings = dict(DEFAULT_TRANSCODE_SETTINGS)
+        self.metrics_settings = dict(DEFAULT_METRICS_SETTINGS)
+        self.log_settings = dict(DEFAULT_LOG_SETTINGS)
+        self.launch_rules = {} # {"rule name": {"path"/"bundle_id"/"name": glob, "sound", "cooldown_s", ...}}, see launch_rules.py
+        self.storage_backend = "auto" # "json", "sqlite", or "auto" (SQLite once there are many file modifications)
+
+        # Config writes happen on a background thread; starts on the JSON file, load_config() may switch to SQLite
+        self.config_saver = ConfigSaver(JSONConfigBackend(self.config_path), self.config_changes, delay=0.5,
+                                        on_error=lambda e: logger.error("Error saving config: %s", e))
+        # Remembers what earlier scans found so rescans only list changed directories
+        self.sound_inventory = SoundInventoryIndex(os.path.join(base_dir, SOUND_INVENTORY_FILE))
+        # Every sound under the sounds folder, kept current by start_library_watch()
+        self.sound_library = SoundLibraryIndex(self.sounds_dir, os.path.join(base_dir, SOUND_LIBRARY_FILE))
+        self.library_watcher = None
+        # Duration and loudness of library and bundle sounds, analyzed once per file version
+        self.sound_metadata = SoundMetadataIndex(os.path.join(base_dir, SOUND_METADATA_FILE))
+        self.metadata_indexer = None # Started by start_metadata_indexer()
+        # Every rename/symlink made to a bundle is journalled first, so a crash can be replayed or undone on start
+        self.replacement_journal = ReplacementJournal(os.path.join(base_dir, REPLACEMENT_JOURNAL_FILE))
+        # Converted targets, shared by every app that uses the same sound in the same format
+        self.transcode_cache = TranscodeCache(os.path.abspath(os.path.join(base_dir, TRANSCODE_CACHE_DIR)))
+
+        # Decoded PCM for launch sounds and previews, so repeated plays skip the disk and decoder
+        self.sound_cache = SoundCache(budget_bytes=self.playback_settings["cache_budget_mb"] * 1024 * 1024)
+        self.playback_executor = None # Bounded worker pool for all sound playback, see start_playback()
+        self.audio_mixer = None # One open output stream that sounds are mixed into, see start_audio_mixer()
+        self._mixer_lock = threading.Lock() # start_audio_mixer() may race between playback workers and a warm-up thread
+        self._mixer_unavailable = False # The default device failed once; don't retry on every sound
+        self.launch_source = None
+        # launch_rules, compiled; decides launches of apps that monitored_apps doesn't list
+        self.launch_rule_engine = LaunchRuleEngine()
+        # Launch-to-audio latency and operation counters, exported by start_metrics_export()
+        self.metrics = MetricsRegistry(window=int(self.metrics_settings["window"]))
+        self.metrics_exporters = []
+        # Dispatch path shared by every launch source (and by benchmarks using a scripted source)
+        self.launch_dispatcher = LaunchDispatcher(self.lookup_launch_sound, self._play_launch_sound)
+
+        self.bundle_watcher = None # Started by start_bundle_watch()
+        self.pending_reapply = {} # {original_path: state} lost to an app update, waiting to be re-applied
+        self.removed_by_update = {} # {original_path: state} whose file an app update deleted; see forget_removed()
+        self._suspended_paths = {} # {original_path: count} being applied/reverted; the watcher leaves them alone
+        self._suspended_lock = threading.Lock()
+        self.replacement_health = HealthReport() # Last check_health() result; empty until one has run
+        self._register_metrics()
+
+    # --- Configuration ---
+
+    def load_config(self):
+        """Loads the config into the state dicts (in place). Returns a list of warning messages."""
+        warnings = []
+        data = {}
+        try:
+            # Large setups live in SQLite (migrated once from the JSON file); small ones stay in JSON
+            backend, loaded = open_config_backend(self.config_path, self.config_db_path, self.storage_backend)
+            self.config_saver.backend = backend
+            logger.info("Using %s config storage", backend.name)
+            if loaded is None:
+                logger.info("Config file %s not found. Starting with empty configuration.", self.config_path)
+            else:
+                data = loaded
+        except ValueError as e:
+            logger.error("Error decoding JSON from %s: %s", self.config_path, e)
+            warnings.append(f"Could not parse {self.config_path}. Using default settings.")
+        except Exception as e:
+            logger.error("Unexpected error loading config: %s", e)
+            warnings.append(f"An unexpected error occurred while loading the configuration: {e}")
+
+        self.monitored_apps.clear()
+        self.monitored_apps.update(data.get("monitored_apps", {}))
+        self.applied_file_modifications.clear()
+        self.applied_file_modifications.update(data.get("applied_file_modifications", {})) # Builds the per-app index
+        self.applied_file_modifications.pop_changed() # Just loaded, so nothing to save
+        self.app_default_symlink_sources.clear()
+        self.app_default_symlink_sources.update(data.get("app_default_symlink_sources", {}))
+        self.playback_settings.update(data.get("playback_settings", {}))
+        self.scan_settings.update(data.get("scan_settings", {}))
+        self.watch_settings.update(data.get("watch_settings", {}))
+        self.health_settings.update(data.get("health_settings", {}))
+        self.transcode_settings.update(data.get("transcode_settings", {}))
+        self.metrics_settings.update(data.get("metrics_settings", {}))
+        self.log_settings.update(data.get("log_settings", {}))
+        self.launch_rules.clear()
+        self.launch_rules.update(data.get("launch_rules", {}))
+        warnings.extend(self.compile_launch_rules())
+        self.metrics.window = int(self.metrics_settings.get("window", 1024))
+        self.transcode_cache.workers = int(self.transcode_settings.get("workers", 0))
+        self.storage_backend = data.get("storage_backend", self.storage_backend)
+
+        self.sound_cache.set_budget(int(self.playback_settings.get("cache_budget_mb", 64) * 1024 * 1024))
+        self.sound_inventory.load()
+        self.sound_library.load()
+        self.sound_metadata.load()
+        return warnings
+
+    def configure_logging(self, pipeline, handlers=()):
+        """(Re)starts a LogPipeline with log_settings' level, rate limit and log file, plus handlers.
+
+        Returns a list of warning messages (bad level, unwritable log file).
+        """
+        warnings = []
+        try:
+            pipeline.set_level(self.log_settings.get("level", "INFO"))
+        except ValueError as e:
+            warnings.append(f"{e}; logging at INFO.")
+            pipeline.set_level("INFO")
+        pipeline.set_rate_limit(self.log_settings.get("rate_limit_burst", 20),
+                                self.log_settings.get("rate_limit_window_s", 10.0))
+        handlers = list(handlers)
+        log_file = self.log_settings.get("file")
+        if log_file:
+            path = log_file if os.path.isabs(log_file) else os.path.join(self.base_dir, log_file)
+            try:
+                handlers.append(json_file_handler(path, max_bytes=int(float(self.log_settings.get("max_mb", 5)) * 1024 * 1024),
+                                                  backups=int(self.log_settings.get("backups", 3))))
+            except (OSError, ValueError) as e:
+                warnings.append(f"Could not open the log file {path}: {e}")
+        pipeline.start(handlers)
+        return warnings
+
+    def recover_journal(self):
+        """Finishes or undoes bundle changes that a crash interrupted. Returns recover_pending's report."""
+        report = recover_pending(self.replacement_journal, self.applied_file_modifications)
+        if report["replayed"]:
+            replayed = list(report["replayed"])
+            journal = self.replacement_journal
+            self.save(on_saved=lambda: [journal.log_end(txn_id) for txn_id in replayed])
+        if report["replayed"] or report["rolled_back"]:
+            logger.info("Recovered from interrupted changes: replayed %d, rolled back %d.",
+                        len(report["replayed"]), len(report["rolled_back"]))
+        if report["failures"]:
+            logger.warning("Journal recovery could not undo some steps: %s", report["failures"])
+        return report
+
+    def snapshot(self):
+        """Copies the persisted state, so the saver thread never sees it mid-update."""
+        snapshot = self._settings_snapshot()
+        snapshot["applied_file_modifications"] = {path: dict(record) for path, record in self.applied_file_modifications.items()}
+        return snapshot
+
+    def config_changes(self):
+        """The saver's partial snapshot: like snapshot(), but only with the records changed since the last call.
+
+        Runs on the thread that changed the state, at a cost proportional to
+        the change: the other sections are small.
+        """
+        records = self.applied_file_modifications
+        changes = self._settings_snapshot()
+        changes["applied_file_modifications"] = {path: dict(records[path]) if path in records else DELETED
+                                                 for path in records.pop_changed()}
+        return changes
+
+    def _settings_snapshot(self):
+        return {
+            "monitored_apps": dict(self.monitored_apps),
+            "app_default_symlink_sources": dict(self.app_default_symlink_sources),
+            "playback_settings": dict(self.playback_settings),
+            "scan_settings": dict(self.scan_settings),
+            "watch_settings": dict(self.watch_settings),
+            "health_settings": dict(self.health_settings),
+            "transcode_settings": dict(self.transcode_settings),
+            "metrics_settings": dict(self.metrics_settings),
+            "log_settings": dict(self.log_settings),
+            "launch_rules": {name: dict(rule) if isinstance(rule, dict) else rule
+                             for name, rule in self.launch_rules.items()},
+            "storage_backend": self.storage_backend
+        }
+
+    def save(self, on_saved=None):
+        """Schedules a coalesced background save; on_saved() runs on the saver thread once it is on disk."""
+        self.config_saver.mark_dirty(on_saved)
+
+    def close(self, timeout=5.0):
+        """Flushes the config and closes the storage backend. Returns False if the final save failed."""
+        self.stop_metadata_indexer()
+        self.stop_library_watch()
+        self.stop_metrics_export()
+        flushed = self.config_saver.stop(timeout)
+        self.config_saver.backend.close()
+        self.replacement_journal.close()
+        return flushed
+
+    # --- Sound metadata ---
+
+    def library_sound_paths(self):
+        """Every sound file under the sounds folder, as full paths."""
+        try:
+            self.refresh_library()
+        except OSError:
+            return []
+        return [os.path.join(self.sounds_dir, name) for name in self.sound_library.names()]
+
+    def refresh_library(self):
+        """Updates the sound library index from disk (re-listing only changed folders) and saves it.
+
+        Returns the sound names relative to the sounds folder. Raises OSError
+        if the sounds folder cannot be read.
+        """
+        if self.sound_library.refresh():
+            try:
+                self.sound_library.save()
+            except OSError as e:
+                logger.warning("Could not save %s: %s", self.sound_library.index_path, e)
+        return self.sound_library.names()
+
+    def start_library_watch(self, on_change, watcher=None):
+        """Watches the sounds folder and its subfolders; on_change(names) runs on the watcher thread after a change."""
+        self.stop_library_watch()
+        library_watcher = watcher or default_bundle_watcher(debounce=0.5, max_delay=3.0)
+
+        def _changed(changed_dirs):
+            try:
+                changed = self.sound_library.refresh()
+            except OSError as e:
+                logger.warning("Could not re-list %s: %s", self.sounds_dir, e)
+                return
+            library_watcher.set_paths(self.sound_library.folders()) # Follow added/removed subfolders
+            if changed:
+                try:
+                    self.sound_library.save()
+                except OSError as e:
+                    logger.warning("Could not save %s: %s", self.sound_library.index_path, e)
+                on_change(self.sound_library.names())
+
+        library_watcher.set_paths(self.sound_library.folders())
+        library_watcher.start(_changed)
+        self.library_watcher = library_watcher
+        return library_watcher
+
+    def stop_library_watch(self):
+        if self.library_watcher is not None:
+            self.library_watcher.stop()
+            self.library_watcher = None
+
+    def start_metadata_indexer(self, on_indexed=None):
+        """Analyzes submitted sounds in the background; on_indexed({path: meta}) runs on the indexer thread."""
+        if self.metadata_indexer is None:
+            self.metadata_indexer = MetadataIndexer(self.sound_metadata, on_indexed)
+            self.metadata_indexer.start()
+        return self.metadata_indexer
+
+    def index_sounds(self, paths):
+        """Queues paths for analysis; only new or changed files are decoded."""
+        if self.metadata_indexer is not None:
+            self.metadata_indexer.submit(paths)
+
+    def stop_metadata_indexer(self):
+        if self.metadata_indexer is not None:
+            self.metadata_indexer.stop()
+            self.metadata_indexer = None
+
+    # --- Playback and launch monitoring ---
+
+    def sound_path(self, sound_name):
+        """Resolves a sound name from the sounds folder (absolute paths are kept)."""
+        return sound_name if os.path.isabs(sound_name) else os.path.join(self.sounds_dir, sound_name)
+
+    def compile_launch_rules(self):
+        """Recompiles launch_rules; call after changing them. Returns warnings for rules that were left out."""
+        errors = self.launch_rule_engine.load(self.launch_rules)
+        for message in errors.values():
+            logger.warning("Launch rule ignored: %s", message)
+        return [f"Launch rule ignored: {message}" for message in errors.values()]
+
+    def lookup_launch_sound(self, event):
+        """Returns the sound file to play for a LaunchEvent, or None.
+
+        An exact monitored_apps entry decides first; other launches go
+        through launch_rules, whose cooldowns and quiet hours may hold the sound back.
+        """
+        sound_to_play = self.monitored_apps.get(event.app_path)
+        if sound_to_play and sound_to_play != "None":
+            return self.sound_path(sound_to_play)
+        rule, outcome = self.launch_rule_engine.decide(event.app_path, event.bundle_id, event.app_name,
+                                                       now=event.timestamp)
+        if rule is None:
+            return None
+        if outcome != OUTCOME_PLAY:
+            logger.debug("Launch of %s matched rule %r, held back by its %s", event.app_path, rule.name, outcome)
+            return None
+        return self.sound_path(rule.sound) if rule.sound else None
+
+    def _play_launch_sound(self, full_sound_path, event=None):
+        logger.info("Monitored app launched. Playing sound: %s", full_sound_path,
+                    extra={"app": event.app_path if event is not None else None, "sound": full_sound_path})
+        try:
+            # Hand off to the playback pool to avoid blocking the launch source
+            if event is not None:
+                self.enqueue_sound(full_sound_path, detected_at=event.timestamp, app_path=event.app_path)
+            else:
+                self.enqueue_sound(full_sound_path)
+        except Exception as e:
+            logger.error("Error playing sound %s: %s", full_sound_path, e)
+
+    def start_playback(self, play_func):
+        """Starts the playback worker pool, running play_func(sound_path), with the current playback_settings."""
+        if self.playback_executor is not None:
+            return self.playback_executor
+        self.playback_executor = PlaybackExecutor(
+            play_func,
+            workers=int(self.playback_settings.get("workers", 2)),
+            max_queue=int(self.playback_settings.get("queue_size", 8)),
+            overflow_policy=self.playback_settings.get("overflow_policy", "coalesce"),
+            coalesce_window=float(self.playback_settings.get("coalesce_window_s", 0.5)),
+            on_finished=self._record_playback
+        )
+        logger.info("Playback executor started: %s", self.playback_executor.stats())
+        return self.playback_executor
+
+    def start_audio_mixer(self, sink=None):
+        """Opens the output stream and starts mixing with playback_settings. Returns the AudioMixer.
+
+        Without a sink, the default output device is used, and None is
+        returned (after logging why) when playback_settings["mixer"] is off,
+        NumPy or sounddevice is missing, or the device can't be opened; the
+        front end then keeps its own player. That outcome is remembered
+        until stop_audio_mixer(). Importing NumPy and sounddevice and opening
+        PortAudio takes a while, so front ends call this off their UI thread.
+        """
+        with self._mixer_lock:
+            if self.audio_mixer is not None:
+                return self.audio_mixer
+            if sink is None:
+                if self._mixer_unavailable or not self.playback_settings.get("mixer", True):
+                    return None
+                if numpy_or_none() is None or not sounddevice_available():
+                    logger.info("Audio mixer unavailable (needs numpy and sounddevice); using the system player.")
+                    self._mixer_unavailable = True
+                    return None
+                sink = SoundDeviceSink()
+            try:
+                mixer = AudioMixer(sink,
+                                   sample_rate=int(self.playback_settings.get("mixer_sample_rate", 48000)),
+                                   block_frames=int(self.playback_settings.get("mixer_block_frames", 512)),
+                                   max_voices=int(self.playback_settings.get("max_voices", 8)),
+                                   gain=float(self.playback_settings.get("gain", 1.0))).start()
+            except Exception as e: # No output device, PortAudio errors, bad settings
+                logger.warning("Could not start the audio mixer, using the system player: %s", e)
+                self._mixer_unavailable = True
+                return None
+            self.audio_mixer = mixer
+            logger.info("Audio mixer started: %s", mixer.stats())
+            return mixer
+
+    def play_mixed(self, sound_path, gain=1.0):
+        """Play function for start_playback(): decodes through the sound cache and adds a voice to audio_mixer.
+
+        Returns once the mixer has started the sound, so a worker isn't held
+        for the whole sound. Raises OSError or SoundDecodeError if the file
+        can't be read, RuntimeError if the mixer isn't running.
+        """
+        mixer = self.audio_mixer
+        if mixer is None:
+            raise RuntimeError("The audio mixer has not been started")
+        decoded = self.sound_cache.get(sound_path)
+        mark_decoded()
+        voice = mixer.play(decoded, gain=gain)
+        if not voice.started.wait(MIXER_START_TIMEOUT_S):
+            raise RuntimeError(f"The audio mixer did not start {sound_path}")
+        mark_audio_started(voice.started_at)
+
+    def stop_audio_mixer(self):
+        with self._mixer_lock:
+            self._mixer_unavailable = False
+            if self.audio_mixer is not None:
+                logger.info("Audio mixer stats at exit: %s", self.audio_mixer.stats())
+                self.audio_mixer.stop()
+                self.audio_mixer = None
+
+    def enqueue_sound(self, sound_path, detected_at=None, app_path=None):
+        """Queues a sound on the playback pool. Returns False if the overflow policy dropped it.
+
+        detected_at (monotonic) and app_path identify the launch that asked for it, for the latency metrics.
+        """
+        if self.playback_executor is None:
+            raise RuntimeError("Playback has not been started")
+        accepted = self.playback_executor.submit(sound_path, detected_at=detected_at, app_path=app_path)
+        if not accepted:
+            logger.info("Playback queue dropped or coalesced %s: %s", sound_path, self.playback_executor.stats())
+        return accepted
+
+    def _record_playback(self, trace, succeeded):
+        self.metrics.inc("playbacks_total", result="played" if succeeded else "failed")
+        if succeeded and trace.detected_at is not None:
+            self.metrics.observe_launch(trace.app_path, trace.stages())
+
+    def shutdown_playback(self, timeout=1.0):
+        if self.playback_executor is not None:
+            logger.info("Playback executor stats at exit: %s", self.playback_executor.stats())
+            self.playback_executor.shutdown(wait=True, timeout=timeout)
+            self.playback_executor = None
+        self.stop_audio_mixer()
+
+    def start_monitoring(self, source=None):
+        """Starts the launch-event source (the platform default unless given). Raises if it cannot start."""
+        self.stop_monitoring()
+        source = source or default_launch_source()
+        source.start(self.launch_dispatcher.dispatch)
+        self.launch_source = source
+        logger.info("App monitoring started (%s).", source.name)
+        return source
+
+    def stop_monitoring(self):
+        if self.launch_source is not None:
+            self.launch_source.stop()
+            self.launch_source = None
+            logger.info("App monitoring stopped.")
+
+    # --- Metrics ---
+
+    def _register_metrics(self):
+        """Exports values other objects already count, read when the metrics are rendered."""
+        dispatcher = self.launch_dispatcher
+        self.metrics.register("launches_total", "counter", "Launches of any app seen by the launch source, by result.",
+                              lambda: [({"result": "dispatched"}, dispatcher.dispatched),
+                                       ({"result": "ignored"}, dispatcher.ignored)])
+        self.metrics.register("launch_rule_decisions_total", "counter",
+                              "Launches decided by launch_rules, by outcome.",
+                              lambda: [({"outcome": outcome}, count)
+                                       for outcome, count in self.launch_rule_engine.decisions.items()])
+
+        def _playback_stats(keys):
+            executor = self.playback_executor
+            stats = executor.stats() if executor is not None else {}
+            return [({"outcome": key}, stats.get(key, 0)) for key in keys]
+        self.metrics.register("playback_queue_total", "counter", "Sounds submitted to the playback pool, by outcome.",
+                              lambda: _playback_stats(("submitted", "dropped_oldest", "dropped_newest", "coalesced")))
+        self.metrics.register("playback_queue_depth", "gauge", "Sounds waiting for a playback worker.",
+                              lambda: (self.playback_executor.stats()["queue_depth"]
+                                       if self.playback_executor is not None else 0))
+        self.metrics.register("sound_cache_lookups_total", "counter", "Decoded sound cache lookups, by result.",
+                              lambda: [({"result": "hit"}, self.sound_cache.stats()["hits"]),
+                                       ({"result": "miss"}, self.sound_cache.stats()["misses"])])
+        self.metrics.register("mixer_voices", "gauge", "Sounds being mixed right now.",
+                              lambda: self.audio_mixer.stats()["active_voices"] if self.audio_mixer is not None else 0)
+        self.metrics.register("mixer_voices_total", "counter", "Sounds added to the mixer, and those cut off by max_voices.",
+                              lambda: [({"outcome": "started"}, self.audio_mixer.voices_started if self.audio_mixer else 0),
+                                       ({"outcome": "stolen"}, self.audio_mixer.voices_stolen if self.audio_mixer else 0)])
+        self.metrics.register("mixer_limited_blocks_total", "counter", "Mixed blocks the limiter turned down to avoid clipping.",
+                              lambda: self.audio_mixer.limited_blocks if self.audio_mixer is not None else 0)
+        self.metrics.register("replacements", "gauge", "Replacements currently recorded.",
+                              lambda: len(self.applied_file_modifications))
+        self.metrics.register("pending_reapply", "gauge", "Replacements lost to app updates, waiting to be re-applied.",
+                              lambda: len(self.pending_reapply))
+        self.metrics.register("removed_by_update", "gauge", "Replacements whose original file an app update deleted.",
+                              lambda: len(self.removed_by_update))
+
+    def start_metrics_export(self, http_port=None, file_path=None):
+        """Starts the exports enabled in metrics_settings (or by the arguments). Returns descriptions of them.
+
+        Raises OSError if the HTTP port cannot be bound.
+        """
+        self.stop_metrics_export()
+        http_port = int(self.metrics_settings.get("http_port", 0) if http_port is None else http_port)
+        file_path = self.metrics_settings.get("file_path", "") if file_path is None else file_path
+        started = []
+        if http_port:
+            server = MetricsHTTPServer(self.metrics, http_port).start()
+            self.metrics_exporters.append(server)
+            started.append(server.url)
+        if file_path:
+            writer = MetricsFileWriter(self.metrics, os.path.abspath(file_path),
+                                       interval=float(self.metrics_settings.get("interval_s", 15.0))).start()
+            self.metrics_exporters.append(writer)
+            started.append(writer.path)
+        if started:
+            logger.info("Exporting metrics to %s", ", ".join(started))
+        return started
+
+    def stop_metrics_export(self):
+        for exporter in self.metrics_exporters:
+            exporter.stop()
+        self.metrics_exporters = []
+
+    # --- Scanning ---
+
+    def make_scanner(self, scan_root, bundle_path=None):
+        """Returns a BundleScanner for scan_root using scan_settings and the sound inventory."""
+        return BundleScanner(scan_root,
+                             prune_patterns=self.scan_settings.get("prune_patterns", DEFAULT_PRUNE_PATTERNS),
+                             max_depth=self.scan_settings.get("max_depth"),
+                             workers=int(self.scan_settings.get("workers", 4)),
+                             inventory=self.sound_inventory, bundle_path=bundle_path or scan_root,
+                             on_finished=self._record_scan)
+
+    def _record_scan(self, progress, error):
+        result = "failed" if error is not None else "cancelled" if progress.cancelled else "completed"
+        self.metrics.inc("scans_total", result=result)
+        self.metrics.inc("scan_seconds_total", progress.elapsed)
+
+    def remove_app(self, app_path):
+        """Stops monitoring app_path and forgets its settings and scan index. Its records are left to revert."""
+        for original_path in self.applied_file_modifications.paths_for_app(app_path):
+            self.pending_reapply.pop(original_path, None)
+            self.removed_by_update.pop(original_path, None)
+        self.monitored_apps.pop(app_path, None)
+        self.app_default_symlink_sources.pop(app_path, None)
+        self.sound_inventory.invalidate(app_path)
+        try:
+            self.sound_inventory.save()
+        except OSError as e:
+            logger.warning("Could not save sound inventory after removing %s: %s", app_path, e)
+        self.save()
+
+    # --- Replacements ---
+
+    def suspend_watch(self, paths):
+        """Keeps the bundle watcher away from paths being changed outside apply()/revert(). Pair with resume_watch()."""
+        self._suspend(paths)
+
+    def resume_watch(self, paths):
+        self._resume(paths)
+
+    def _suspend(self, paths):
+        with self._suspended_lock:
+            for path in paths:
+                self._suspended_paths[path] = self._suspended_paths.get(path, 0) + 1
+
+    def _resume(self, paths):
+        with self._suspended_lock:
+            for path in paths:
+                count = self._suspended_paths.get(path, 0) - 1
+                if count > 0:
+                    self._suspended_paths[path] = count
+                else:
+                    self._suspended_paths.pop(path, None)
+
+    def prepare_targets(self, pairs, progress=None, cancel_event=None):
+        """Converts targets to their originals' formats (see transcode.py). Returns (pairs, errors)."""
+        prepared, errors = self.transcode_cache.prepare(pairs, progress=progress, cancel_event=cancel_event)
+        for original_path, message in errors.items():
+            logger.warning("Could not convert the target for %s: %s", original_path, message)
+        return prepared, errors
+
+    def apply(self, pairs, overwrite_backups=False, progress=None, cancel_event=None, match_format=None):
+        """Applies [(original_path, target_path)] all-or-nothing.
+
+        With match_format (default: transcode_settings), targets are first
+        converted to each original's format; if any conversion fails,
+        nothing is applied.
+
+        Always pass the result to record_apply(), even if it failed: until
+        then the bundle watcher leaves these paths alone.
+        """
+        paths = [original for original, _ in pairs]
+        self._suspend(paths)
+        if match_format is None:
+            match_format = self.transcode_settings.get("match_format", False)
+        sources = {}
+        if match_format:
+            converted, errors = self.prepare_targets(pairs, progress=progress, cancel_event=cancel_event)
+            if errors:
+                failed_path = next(iter(errors))
+                result = BatchApplyResult(error=errors[failed_path], failed_path=failed_path,
+                                          cancelled=cancel_event is not None and cancel_event.is_set())
+                result.suspended_paths = paths
+                return result
+            sources = {original: target for original, target in pairs}
+            pairs = converted
+        result = apply_replacements(pairs, overwrite_backups=overwrite_backups, progress=progress,
+                                    cancel_event=cancel_event, journal=self.replacement_journal)
+        for original_path, record in result.applied.items():
+            if sources.get(original_path, record["target_linked_to"]) != record["target_linked_to"]:
+                record["converted_from"] = sources[original_path] # The sound the user picked
+        result.suspended_paths = paths
+        return result
+
+    def record_apply(self, result, on_saved=None):
+        """Records a successful BatchApplyResult and saves; its transaction is finished once saved.
+
+        A failed result records nothing but still releases the watcher suspension.
+        """
+        self._resume(getattr(result, "suspended_paths", ()))
+        result.suspended_paths = ()
+        self.metrics.inc("applies_total", result="ok" if result.ok else "cancelled" if result.cancelled else "failed")
+        if not result.ok:
+            return
+        self.metrics.inc("replacements_applied_total", len(result.applied))
+        self.applied_file_modifications.update(result.applied)
+        for original_path in result.applied:
+            self.pending_reapply.pop(original_path, None)
+            self.removed_by_update.pop(original_path, None)
+        self.recheck_health(result.applied)
+        self.refresh_bundle_watch()
+        txn = result.transaction
+
+        def _saved():
+            txn.finish()
+            if on_saved is not None:
+                on_saved()
+        self.save(on_saved=_saved)
+
+    def revert(self, records, progress=None, cancel_event=None, forget_always=False, workers=4):
+        """Reverts {original_path: record} in parallel. Always pass the report to record_revert()."""
+        paths = list(records)
+        self._suspend(paths)
+        report = None
+        try:
+            report = revert_replacements(records, progress=progress, cancel_event=cancel_event,
+                                         journal=self.replacement_journal, workers=workers, forget_always=forget_always)
+            report.suspended_paths = paths
+        finally:
+            if report is None: # Raised before there was a report to hand to record_revert()
+                self._resume(paths)
+        return report
+
+    def record_revert(self, report, on_saved=None):
+        """Applies a BulkRevertReport's record changes and saves; its transactions are finished once saved."""
+        self._resume(getattr(report, "suspended_paths", ()))
+        report.suspended_paths = ()
+        self.metrics.inc("reverts_total")
+        for original_path, record in report.updates().items():
+            if record is None:
+                self.metrics.inc("replacements_reverted_total")
+                self.applied_file_modifications.pop(original_path, None)
+                self.pending_reapply.pop(original_path, None)
+                self.removed_by_update.pop(original_path, None)
+            else:
+                self.applied_file_modifications[original_path] = record
+        self.recheck_health(report.updates())
+        self.refresh_bundle_watch()
+        transactions = report.transactions
+
+        def _saved():
+            for txn in transactions:
+                txn.finish()
+            if on_saved is not None:
+                on_saved()
+        self.save(on_saved=_saved)
+
+    def records_for(self, app_path=None):
+        """{original_path: record} for one app, or for every app when app_path is None."""
+        if app_path is None:
+            return dict(self.applied_file_modifications)
+        return dict(self.applied_file_modifications.for_app(app_path))
+
+    # --- Watching bundles for app updates ---
+
+    def watch_paths(self):
+        """Directories to watch: each replaced file's folder, every enclosing bundle and the bundles' parents."""
+        paths = set()
+        for original_path in self.applied_file_modifications:
+            paths.add(os.path.dirname(original_path))
+            for bundle in bundle_keys_for(original_path):
+                paths.add(bundle)
+                paths.add(os.path.dirname(bundle)) # Sees the bundle itself being swapped out
+        return paths
+
+    def start_bundle_watch(self, on_changes, watcher=None):
+        """Starts watching bundles that hold replacements; on_changes(changed_dirs) runs on the watcher thread.
+
+        The front end should pass the directories to handle_bundle_changes()
+        on whatever thread it mutates state from.
+        """
+        if not self.watch_settings.get("enabled", True):
+            return None
+        self.stop_bundle_watch()
+        debounce = float(self.watch_settings.get("debounce_s", 2.0))
+        self.bundle_watcher = watcher or default_bundle_watcher(debounce=debounce, max_delay=max(10.0, debounce * 5))
+        self.bundle_watcher.set_paths(self.watch_paths())
+        self.bundle_watcher.start(on_changes)
+        logger.info("Watching %d folder(s) for app updates (%s).", len(self.bundle_watcher.watched_paths()),
+                    self.bundle_watcher.name)
+        return self.bundle_watcher
+
+    def refresh_bundle_watch(self):
+        """Re-targets the watcher after records were added or removed."""
+        if self.bundle_watcher is not None:
+            self.bundle_watcher.set_paths(self.watch_paths())
+
+    def stop_bundle_watch(self):
+        if self.bundle_watcher is not None:
+            self.bundle_watcher.stop()
+            self.bundle_watcher = None
+
+    def _records_affected_by(self, changed_dirs):
+        """Original paths whose folder, or an enclosing bundle (or its parent), changed."""
+        affected = set()
+        for changed in changed_dirs:
+            changed = os.path.normpath(changed)
+            if changed.endswith(".app"):
+                affected.update(self.applied_file_modifications.paths_for_app(changed))
+                continue
+            for original_path in self.applied_file_modifications.paths_in_dir(changed):
+                affected.add(original_path)
+            # A bundle's parent changed: every bundle directly inside it may have been swapped
+            for bundle in self.applied_file_modifications.bundles_in_dir(changed):
+                affected.update(self.applied_file_modifications.paths_for_app(bundle))
+        return affected
+
+    def handle_bundle_changes(self, changed_dirs, policy=None):
+        """Checks the replacements in changed_dirs and re-applies or queues the ones an update overwrote.
+
+        Records whose original file the update deleted can't be re-applied;
+        they move to removed_by_update instead, until the file comes back or
+        forget_removed() drops them. Returns {"checked": n, "reapplied":
+        [paths], "queued": [paths], "failed": [(path, reason)], "removed":
+        [paths newly in removed_by_update]}.
+        """
+        policy = policy or self.watch_settings.get("policy", WATCH_POLICY_REAPPLY)
+        with self._suspended_lock:
+            suspended = set(self._suspended_paths)
+        affected = sorted(self._records_affected_by(changed_dirs) - suspended)
+        lost = {}
+        outcome = {"checked": len(affected), "reapplied": [], "queued": [], "failed": [], "removed": []}
+        for original_path in affected:
+            state, detail = check_replacement(original_path, self.applied_file_modifications[original_path])
+            if state in (STATE_MISSING, STATE_ORPHANED_BACKUP):
+                self.pending_reapply.pop(original_path, None)
+                if original_path not in self.removed_by_update:
+                    outcome["removed"].append(original_path)
+                    logger.info("Replacement removed by an update (%s): %s: %s", state, original_path, detail)
+                self.removed_by_update[original_path] = state
+                continue
+            self.removed_by_update.pop(original_path, None) # The file is back
+            if state == STATE_OVERWRITTEN:
+                lost[original_path] = state
+                logger.info("Replacement lost (%s): %s: %s", state, original_path, detail)
+        if outcome["removed"]:
+            self.recheck_health(outcome["removed"])
+        if not lost:
+            return outcome
+        self.pending_reapply.update(lost)
+        if policy == WATCH_POLICY_REAPPLY:
+            result = self.reapply_pending(list(lost))
+            outcome["reapplied"] = result["reapplied"]
+            outcome["failed"] = result["failed"]
+        outcome["queued"] = [path for path in lost if path in self.pending_reapply]
+        self.recheck_health(outcome["queued"])
+        return outcome
+
+    def reapply_pending(self, paths=None):
+        """Re-applies queued replacements whose original file exists again (the update's new copy).
+
+        The new original becomes the backup. Each file is its own
+        transaction, so one failure does not hold back the rest; failures
+        stay queued. Returns {"reapplied": [paths], "failed": [(path, reason)]}.
+        """
+        paths = list(self.pending_reapply) if paths is None else [p for p in paths if p in self.pending_reapply]
+        reapplied, failed = [], []
+        for original_path in paths:
+            record = self.applied_file_modifications.get(original_path)
+            if record is None:
+                self.pending_reapply.pop(original_path, None)
+                continue
+            if not os.path.lexists(original_path):
+                # Removed since it was queued; nothing to re-apply until the file comes back
+                self.pending_reapply.pop(original_path, None)
+                self.removed_by_update[original_path] = STATE_MISSING
+                failed.append((original_path, "the app update removed this file"))
+                continue
+            result = self.apply([(original_path, record["target_linked_to"])], overwrite_backups=True)
+            if result.ok:
+                reapplied.append(original_path)
+                self.record_apply(result)
+            else:
+                self.record_apply(result) # Releases the watcher suspension
+                failed.append((original_path, result.error))
+        if reapplied:
+            logger.info("Re-applied %d replacement(s) lost to app updates.", len(reapplied))
+        return {"reapplied": reapplied, "failed": failed}
+
+    def forget_removed(self, paths=None, on_saved=None):
+        """Drops the records of removed_by_update (or just paths among them) and saves. Returns the forgotten paths.
+
+        Their files are gone, so there is nothing to revert; a backup left
+        next to one (an orphaned backup) stays on disk.
+        """
+        paths = list(self.removed_by_update) if paths is None else [p for p in paths if p in self.removed_by_update]
+        for original_path in paths:
+            del self.removed_by_update[original_path]
+            self.applied_file_modifications.pop(original_path, None)
+        if paths:
+            self.recheck_health(paths)
+            self.refresh_bundle_watch()
+            self.save(on_saved=on_saved)
+            logger.info("Forgot %d replacement(s) removed by app updates.", len(paths))
+        return paths
+
+    # --- Reporting ---
+
+    def status(self):
+        """Summary of the configuration, one entry per monitored app."""
+        apps = []
+        for app_path, sound in sorted(self.monitored_apps.items()):
+            apps.append({
+                "app_path": app_path,
+                "launch_sound": None if sound in (None, "None") else sound,
+                "default_source": self.app_default_symlink_sources.get(app_path),
+                "replacements": len(self.applied_file_modifications.paths_for_app(app_path)),
+            })
+        return {
+            "config_storage": self.config_saver.backend.name,
+            "monitored_apps": apps,
+            "total_replacements": len(self.applied_file_modifications),
+            "monitoring": self.launch_source.name if self.launch_source is not None else None,
+            "pending_reapply": sorted(self.pending_reapply),
+            "removed_by_update": sorted(self.removed_by_update),
+        }
+
+    def verify(self, app_path=None):
+        """Checks recorded replacements on disk, without a time limit. Returns [(original_path, state, detail)]."""
+        report = check_replacements(self.records_for(app_path), workers=int(self.health_settings.get("workers", 8)))
+        return sorted((path,) + result for path, result in report.results.items())
+
+    def check_health(self, records=None, time_budget=_USE_SETTINGS, cancel_event=None):
+        """Checks recorded replacements within time_budget seconds; keeps the result in replacement_health.
+
+        time_budget defaults to health_settings["time_budget_s"]; None means
+        no limit. To run it on a worker thread, pass records copied on the
+        thread that owns applied_file_modifications.
+        """
+        if records is None:
+            records = dict(self.applied_file_modifications)
+        if time_budget is _USE_SETTINGS:
+            time_budget = self.health_settings.get("time_budget_s")
+        report = check_replacements(records,
+                                    workers=int(self.health_settings.get("workers", 8)),
+                                    time_budget=time_budget, cancel_event=cancel_event)
+        self.replacement_health = report
+        logger.info("Replacement health: %s in %.2fs", report.summary(), report.elapsed)
+        return report
+
+    def recheck_health(self, paths):
+        """Updates replacement_health for a few paths that were just applied or reverted."""
+        health = self.replacement_health
+        for original_path in paths:
+            record = self.applied_file_modifications.get(original_path)
+            if record is None:
+                health.results.pop(original_path, None)
+            else:
+                health.results[original_path] = check_replacement(original_path, record)
+            if original_path in health.unchecked:
+                health.unchecked.remove(original_path)
@@ -0,0 +1,140 @@
+"""Persistent per-bundle index of discovered sound files.
+
+For every scanned directory the index keeps its mtime/inode, the sound
+files it contained and the subdirectories the scanner descended into. A
+later scan only lists directories whose mtime or inode changed; unchanged
+directories are answered from the index with a single stat() each.
+
+A bundle's entries are dropped when its Info.plist version changes, since
+app updates replace the bundle wholesale.
+"""
+import json
+import os
+import plistlib
+import tempfile
+import threading
+
+INDEX_FORMAT_VERSION = 1
+
+
+def read_bundle_version(bundle_path):
+    """Returns "<CFBundleShortVersionString>/<CFBundleVersion>" from Info.plist, or None."""
+    plist_path = os.path.join(bundle_path, "Contents", "Info.plist")
+    try:
+        with open(plist_path, "rb") as f:
+            info = plistlib.load(f)
+    except (OSError, plistlib.InvalidFileException, ValueError):
+        return None
+    return f"{info.get('CFBundleShortVersionString', '')}/{info.get('CFBundleVersion', '')}"
+
+
+def dir_signature(path):
+    """The (mtime_ns, inode) pair used to decide whether a directory must be re-listed."""
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_ino]
+
+
+class SoundInventoryIndex:
+    """On-disk index: {bundle_path: {"bundle_version", "scans": {scan_root: {...}}}}.
+
+    Each scan entry stores the scanner settings it was built with and a
+    "dirs" map of {dir_path: {"sig", "sounds", "subdirs", "files"}}.
+    """
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self._bundles = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Reads the index from disk. A missing or corrupt file starts an empty index."""
+        try:
+            with open(self.index_path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        with self._lock:
+            if data.get("format_version") == INDEX_FORMAT_VERSION:
+                self._bundles = data.get("bundles", {})
+            else:
+                self._bundles = {}
+
+    def save(self):
+        """Writes the index atomically (temp file + rename)."""
+        with self._lock:
+            payload = json.dumps({"format_version": INDEX_FORMAT_VERSION, "bundles": self._bundles})
+        directory = os.path.dirname(os.path.abspath(self.index_path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".sound_inventory.", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def get_scan(self, bundle_path, scan_root, settings_key):
+        """Returns the cached dirs map for scan_root, or {} if absent or stale.
+
+        Drops the bundle's entries first if its Info.plist version changed.
+        """
+        bundle_key = os.path.normpath(bundle_path)
+        version = read_bundle_version(bundle_key)
+        with self._lock:
+            bundle = self._bundles.get(bundle_key)
+            if bundle is None:
+                return {}
+            if bundle.get("bundle_version") != version:
+                del self._bundles[bundle_key]
+                return {}
+            scan = bundle.get("scans", {}).get(os.path.normpath(scan_root))
+            if not scan or scan.get("settings_key") != settings_key:
+                return {}
+            return dict(scan.get("dirs", {}))
+
+    def update_scan(self, bundle_path, scan_root, settings_key, dirs, complete=True):
+        """Stores the dirs visited by a scan.
+
+        A complete scan replaces the previous entry, dropping directories that
+        no longer exist; an incomplete (cancelled) one is merged into it.
+        """
+        bundle_key = os.path.normpath(bundle_path)
+        root_key = os.path.normpath(scan_root)
+        version = read_bundle_version(bundle_key)
+        with self._lock:
+            bundle = self._bundles.get(bundle_key)
+            if bundle is None or bundle.get("bundle_version") != version:
+                bundle = {"bundle_version": version, "scans": {}}
+                self._bundles[bundle_key] = bundle
+            scan = bundle["scans"].get(root_key)
+            if complete or scan is None or scan.get("settings_key") != settings_key:
+                bundle["scans"][root_key] = {"settings_key": settings_key, "dirs": dict(dirs)}
+            else:
+                scan["dirs"].update(dirs)
+
+    def invalidate(self, bundle_path=None):
+        """Forgets one bundle, or everything when bundle_path is None."""
+        with self._lock:
+            if bundle_path is None:
+                self._bundles.clear()
+            else:
+                self._bundles.pop(os.path.normpath(bundle_path), None)
+
+    def bundle_paths(self):
+        with self._lock:
+            return list(self._bundles.keys())
+
+    def sound_paths(self):
+        """Every sound file recorded by any scan, without duplicates."""
+        with self._lock:
+            found = {}
+            for bundle in self._bundles.values():
+                for scan in bundle.get("scans", {}).values():
+                    for entry in scan.get("dirs", {}).values():
+                        found.update(dict.fromkeys(entry.get("sounds", ())))
+            return list(found)
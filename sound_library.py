@@ -0,0 +1,178 @@
+"""Recursive, persistent index of the sounds folder, plus fuzzy name search.
+
+SoundLibraryIndex lists every sound under the sounds folder, including
+nested sound packs. Like the bundle inventory (sound_inventory.py) it
+remembers each folder's (mtime, inode) and contents in
+sound_library.json, so a refresh only re-lists folders that changed and
+answers the rest with one stat() each. Names are paths relative to the
+sounds folder ("Pack/ding.wav"), which is what monitored_apps stores.
+
+FuzzyIndex answers type-ahead queries over those names: substring hits
+first, then in-order subsequence matches ("dngwv" finds "ding.wav"),
+with a precomputed character mask per name to skip most candidates
+without looking at them.
+"""
+import heapq
+import json
+import os
+import re
+import tempfile
+import threading
+
+from bundle_scanner import SOUND_EXTENSIONS
+from sound_inventory import dir_signature
+
+INDEX_FORMAT_VERSION = 1
+FUZZY_RESULT_LIMIT = 200  # Matches shown in the launch-sound dropdown
+
+
+class SoundLibraryIndex:
+    """{relative_dir: {"sig", "files", "subdirs"}} for every folder under root."""
+
+    def __init__(self, root, index_path, extensions=SOUND_EXTENSIONS):
+        self.root = root
+        self.index_path = index_path
+        self.extensions = extensions
+        self._dirs = {}
+        self._names = []
+        self._lock = threading.Lock()
+        self.dirs_listed = 0
+
+    def load(self):
+        """Reads the index from disk. A missing or corrupt file starts an empty index."""
+        try:
+            with open(self.index_path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        with self._lock:
+            valid = data.get("format_version") == INDEX_FORMAT_VERSION and data.get("root") == os.path.abspath(self.root)
+            self._dirs = data.get("dirs", {}) if valid else {}
+
+    def save(self):
+        """Writes the index atomically (temp file + rename)."""
+        with self._lock:
+            payload = json.dumps({"format_version": INDEX_FORMAT_VERSION, "root": os.path.abspath(self.root),
+                                  "dirs": self._dirs})
+        directory = os.path.dirname(os.path.abspath(self.index_path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".sound_library.", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(payload)
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _list_dir(self, path):
+        files, subdirs = [], []
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.name.startswith("."):
+                    continue
+                try:
+                    if entry.is_dir():
+                        subdirs.append(entry.name)
+                    elif entry.name.lower().endswith(self.extensions) and entry.is_file():
+                        files.append(entry.name)
+                except OSError:
+                    continue
+        self.dirs_listed += 1
+        return sorted(files), sorted(subdirs)
+
+    def refresh(self):
+        """Brings the index up to date with the disk. Returns True if the set of sounds changed.
+
+        Raises OSError if the root folder itself cannot be read.
+        """
+        with self._lock:
+            old_dirs = dict(self._dirs)
+        dirs = {}
+        pending = [""]
+        while pending:
+            rel_dir = pending.pop()
+            path = os.path.join(self.root, rel_dir) if rel_dir else self.root
+            try:
+                signature = dir_signature(path)
+                cached = old_dirs.get(rel_dir)
+                if cached is not None and cached["sig"] == signature:
+                    files, subdirs = cached["files"], cached["subdirs"]
+                else:
+                    files, subdirs = self._list_dir(path)
+            except OSError:
+                if not rel_dir:
+                    raise
+                continue  # Removed while we walked; the next refresh settles it
+            dirs[rel_dir] = {"sig": signature, "files": files, "subdirs": subdirs}
+            pending.extend(os.path.join(rel_dir, name) for name in subdirs)
+        names = sorted(os.path.join(rel_dir, name) for rel_dir, entry in dirs.items() for name in entry["files"])
+        with self._lock:
+            changed = names != self._names
+            self._dirs = dirs
+            self._names = names
+        return changed
+
+    def names(self):
+        """Sound paths relative to root, sorted."""
+        with self._lock:
+            return list(self._names)
+
+    def folders(self):
+        """Absolute paths of every indexed folder (what a watcher should watch)."""
+        with self._lock:
+            return [os.path.join(self.root, rel_dir) if rel_dir else self.root for rel_dir in self._dirs]
+
+
+def _char_mask(text):
+    mask = 0
+    for char in text:
+        mask |= 1 << (ord(char) & 63)
+    return mask
+
+
+class FuzzyIndex:
+    """Type-ahead search over a fixed list of names. See the module docstring."""
+
+    def __init__(self, names):
+        self.names = list(names)
+        self._keys = [name.lower() for name in self.names]
+        self._masks = [_char_mask(key) for key in self._keys]
+        self._last_query = None
+        self._last_candidates = None
+
+    def search(self, query, limit=FUZZY_RESULT_LIMIT):
+        """Names matching query, best first."""
+        query = query.strip().lower()
+        if not query:
+            return self.names[:limit]
+        # Typing narrows the previous query: only its matches can match the longer one
+        if self._last_query and query.startswith(self._last_query) and self._last_candidates is not None:
+            candidates = self._last_candidates
+        else:
+            candidates = range(len(self._keys))
+        query_mask = _char_mask(query)
+        masks = self._masks
+        candidates = [i for i in candidates if masks[i] & query_mask == query_mask]
+        # A superset of this query's matches, so also of any longer query's
+        self._last_query, self._last_candidates = query, candidates
+        keys = self._keys
+        substring_hits = []
+        for i in candidates:
+            position = keys[i].find(query)
+            if position >= 0:
+                substring_hits.append((0, position, len(keys[i]), i))
+        scored = substring_hits
+        if len(substring_hits) < limit:
+            # Not enough plain substring hits to fill the list; add in-order subsequence matches
+            pattern = re.compile(".*?".join(re.escape(char) for char in query))
+            hit = {i for _, _, _, i in substring_hits}
+            for i in candidates:
+                if i in hit:
+                    continue
+                match = pattern.search(keys[i])
+                if match is not None:
+                    scored.append((1, match.end() - match.start(), len(keys[i]), i))
+        return [self.names[i] for _, _, _, i in heapq.nsmallest(limit, scored)]
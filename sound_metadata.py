@@ -0,0 +1,265 @@
+"""Duration, loudness and format of sound files, cached on disk.
+
+The launch-sound list and the scanned bundle sounds only have file names;
+this index adds what is needed to tell them apart without previewing
+each one: duration, peak and RMS level (dBFS) and the stored format.
+
+Each file is decoded once (see audio_cache.decode_sound) and reduced with
+NumPy when it is installed (a pure-Python fallback handles 8/16-bit PCM
+otherwise). Results are kept in sound_metadata.json keyed by path and
+invalidated by (size, mtime), so a restart only analyzes new or changed
+files.
+"""
+import array
+import json
+import logging
+import math
+import os
+import queue
+import sys
+import tempfile
+import threading
+from concurrent.futures import CancelledError, ThreadPoolExecutor, as_completed
+
+from audio_cache import SoundDecodeError, decode_sound, numpy_or_none
+
+logger = logging.getLogger("sound_replacer.metadata")
+
+INDEX_FORMAT_VERSION = 1
+SILENCE_DBFS = -120.0  # Reported for digital silence instead of -inf
+
+
+def _dbfs(level):
+    return round(20.0 * math.log10(level), 2) if level > 0 else SILENCE_DBFS
+
+
+def _pcm_levels_numpy(frames, channels, sample_width):
+    """(peak, rms) in 0..1 full scale, as vectorized reductions over every sample."""
+    np = numpy_or_none()
+    if sample_width == 1:
+        samples = np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128.0
+        full_scale = 128.0
+    elif sample_width == 3:
+        raw = np.frombuffer(frames, dtype=np.uint8)[: len(frames) // 3 * 3].reshape(-1, 3).astype(np.int32)
+        samples = (raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)).astype(np.int32)
+        samples = np.where(samples >= 1 << 23, samples - (1 << 24), samples).astype(np.float32)
+        full_scale = float(1 << 23)
+    else:
+        dtype = {2: "<i2", 4: "<i4"}[sample_width]
+        samples = np.frombuffer(frames, dtype=dtype).astype(np.float32)
+        full_scale = float(1 << (8 * sample_width - 1))
+    if samples.size == 0:
+        return 0.0, 0.0
+    samples = samples[: samples.size // channels * channels] / full_scale
+    peak = float(np.max(np.abs(samples)))
+    rms = float(np.sqrt(np.mean(np.square(samples, dtype=np.float64))))
+    return peak, rms
+
+
+def _pcm_levels_python(frames, channels, sample_width):
+    if sample_width == 1:
+        samples = [value - 128 for value in frames]
+        full_scale = 128.0
+    elif sample_width == 2:
+        samples = array.array("h", frames[: len(frames) // 2 * 2])
+        if sys.byteorder == "big":
+            samples.byteswap()
+        full_scale = 32768.0
+    else:
+        raise SoundDecodeError(f"{8 * sample_width}-bit audio needs NumPy to analyze")
+    if not samples:
+        return 0.0, 0.0
+    peak = max(abs(value) for value in samples) / full_scale
+    rms = math.sqrt(sum(value * value for value in samples) / len(samples)) / full_scale
+    return peak, rms
+
+
+def analyze_sound(path, decoder=decode_sound):
+    """Decodes path and returns its metadata dict. Raises OSError or SoundDecodeError."""
+    decoded = decoder(path)
+    levels = _pcm_levels_numpy if numpy_or_none() is not None else _pcm_levels_python
+    peak, rms = levels(decoded.frames, decoded.channels, decoded.sample_width)
+    return {
+        "duration_s": round(decoded.duration, 3),
+        "peak_dbfs": _dbfs(peak),
+        "rms_dbfs": _dbfs(rms),
+        "sample_rate": decoded.sample_rate,
+        "channels": decoded.channels,
+        "format": os.path.splitext(path)[1].lstrip(".").lower(),
+    }
+
+
+def describe(meta):
+    """One-line summary for the UI, e.g. "1.2 s, peak -3.0 dBFS, RMS -18.5 dBFS, wav 44.1 kHz stereo"."""
+    if not meta:
+        return ""
+    if meta.get("error"):
+        return "Could not analyze"
+    channels = {1: "mono", 2: "stereo"}.get(meta["channels"], f"{meta['channels']} ch")
+    return (f"{meta['duration_s']:.1f} s, peak {meta['peak_dbfs']:.1f} dBFS, RMS {meta['rms_dbfs']:.1f} dBFS, "
+            f"{meta['format']} {meta['sample_rate'] / 1000:g} kHz {channels}")
+
+
+class SoundMetadataIndex:
+    """On-disk {abs_path: {"key": [size, mtime_ns], "meta": {...}}} map.
+
+    Files that fail to decode are stored too (meta {"error": ...}) so they
+    are not retried until they change.
+    """
+
+    def __init__(self, index_path, decoder=decode_sound, workers=2):
+        self.index_path = index_path
+        self.decoder = decoder
+        self.workers = workers
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.analyzed = 0
+
+    @staticmethod
+    def _stat_key(path):
+        st = os.stat(path)
+        return [st.st_size, st.st_mtime_ns]
+
+    def load(self):
+        """Reads the index from disk. A missing or corrupt file starts an empty index."""
+        try:
+            with open(self.index_path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        with self._lock:
+            self._entries = data.get("sounds", {}) if data.get("format_version") == INDEX_FORMAT_VERSION else {}
+            self._dirty = False
+
+    def save(self):
+        """Writes the index atomically (temp file + rename), if anything changed."""
+        with self._lock:
+            if not self._dirty:
+                return
+            payload = json.dumps({"format_version": INDEX_FORMAT_VERSION, "sounds": self._entries})
+            self._dirty = False
+        directory = os.path.dirname(os.path.abspath(self.index_path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".sound_metadata.", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(payload)
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def get(self, path):
+        """The cached metadata for path, or None if it was never analyzed or has changed since."""
+        key = os.path.abspath(path)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        try:
+            if self._stat_key(key) != entry["key"]:
+                return None
+        except OSError:
+            return None
+        return entry["meta"]
+
+    def stale(self, paths):
+        """The paths with no up-to-date entry."""
+        return [path for path in paths if self.get(path) is None]
+
+    def _analyze_one(self, path, cancel_event=None):
+        if cancel_event is not None and cancel_event.is_set():
+            return None  # Dequeued after a stop; skip rather than decode
+        key = os.path.abspath(path)
+        try:
+            stat_key = self._stat_key(key)
+        except OSError:
+            return None
+        try:
+            meta = analyze_sound(key, self.decoder)
+        except (OSError, SoundDecodeError, ValueError) as e:
+            meta = {"error": str(e)}
+        with self._lock:
+            self._entries[key] = {"key": stat_key, "meta": meta}
+            self._dirty = True
+            self.analyzed += 1
+        return meta
+
+    def update(self, paths, progress=None, cancel_event=None):
+        """Analyzes the stale paths on a small thread pool and saves. Returns {path: meta} of those analyzed.
+
+        Decoding waits on converter processes and NumPy releases the GIL,
+        so a few threads overlap well. progress(done, total, path) is
+        called from the calling thread.
+        """
+        stale = self.stale(dict.fromkeys(paths))
+        results = {}
+        if stale:
+            with ThreadPoolExecutor(max_workers=max(1, self.workers), thread_name_prefix="sound-metadata") as pool:
+                futures = {pool.submit(self._analyze_one, path, cancel_event): path for path in stale}
+                cancelled = False
+                for done, future in enumerate(as_completed(futures), start=1):
+                    if not cancelled and cancel_event is not None and cancel_event.is_set():
+                        cancelled = True
+                        for pending in futures:
+                            pending.cancel()  # No-op for analyses already running or finished
+                    path = futures[future]
+                    try:
+                        meta = future.result()
+                    except CancelledError:
+                        meta = None
+                    if meta is not None:
+                        results[path] = meta
+                    if progress is not None:
+                        progress(done, len(futures), path)
+            try:
+                self.save()
+            except OSError as e:
+                logger.warning("Could not save %s: %s", self.index_path, e)
+        return results
+
+
+class MetadataIndexer:
+    """Background thread that feeds submitted paths through SoundMetadataIndex.update().
+
+    on_indexed({path: meta}) is called on the indexer thread after each
+    submitted batch that analyzed something.
+    """
+
+    def __init__(self, index, on_indexed=None):
+        self.index = index
+        self.on_indexed = on_indexed
+        self._queue = queue.Queue()
+        self._cancel_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="sound-metadata-indexer", daemon=True)
+            self._thread.start()
+
+    def submit(self, paths):
+        self._queue.put(list(paths))
+
+    def stop(self, timeout=2.0):
+        self._cancel_event.set()
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while True:
+            paths = self._queue.get()
+            if paths is None or self._cancel_event.is_set():
+                return
+            try:
+                results = self.index.update(paths, cancel_event=self._cancel_event)
+            except Exception as e:  # Keep the indexer alive for the next batch
+                logger.error("Sound metadata indexing failed: %s", e)
+                continue
+            if results and self.on_indexed is not None:
+                self.on_indexed(results)
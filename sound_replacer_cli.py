@@ -0,0 +1,394 @@
+"""Command-line interface and headless daemon for Sound Replacer.
+
+Shares the config, journal and sound inventory with the Tk app through
+replacer_core, without loading Tk or AppKit:
+
+  python sound_replacer_cli.py status
+  python sound_replacer_cli.py scan /Applications/Foo.app
+  python sound_replacer_cli.py apply ~/Desktop/new.wav /Applications/Foo.app/Contents/Resources/ding.wav
+  python sound_replacer_cli.py revert --app /Applications/Foo.app
+  python sound_replacer_cli.py verify
+  python sound_replacer_cli.py rules add IDEs --bundle-id 'com.jetbrains.*' --sound ide.wav --cooldown 30
+  python sound_replacer_cli.py daemon
+
+Don't change replacements from the command line while the Tk app is open:
+both save the whole config, and the last one to save wins.
+"""
+import argparse
+import json
+import logging
+import os
+import queue
+import signal
+import sys
+import threading
+
+from launch_rules import OUTCOME_PLAY, LaunchRule
+from log_pipeline import LogPipeline, console_handler
+from playback import command_player
+from replacer_core import SoundReplacerCore
+from replacements import STATE_HEALTHY, has_backup_conflict
+from sound_metadata import describe
+
+logger = logging.getLogger("sound_replacer.cli")
+
+
+def _print_json(data):
+    json.dump(data, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+def cmd_status(core, args):
+    status = core.status()
+    if args.json:
+        _print_json(status)
+        return 0
+    print(f"Config storage: {status['config_storage']}")
+    print(f"Replacements recorded: {status['total_replacements']}")
+    if not status["monitored_apps"]:
+        print("No monitored apps.")
+    for app in status["monitored_apps"]:
+        print(f"{app['app_path']}")
+        print(f"    launch sound: {app['launch_sound'] or '-'}")
+        print(f"    default source: {app['default_source'] or '-'}")
+        print(f"    replacements: {app['replacements']}")
+    return 0
+
+
+def cmd_scan(core, args):
+    app_path = os.path.abspath(args.app)
+    scanner = core.make_scanner(os.path.abspath(args.root) if args.root else app_path, bundle_path=app_path)
+    try:
+        found = scanner.scan()
+    except OSError as e:
+        print(f"error: cannot scan {app_path}: {e}", file=sys.stderr)
+        return 1
+    progress = scanner.progress
+    if args.json:
+        _print_json({"sounds": found, "progress": progress.snapshot(), "errors": progress.errors})
+    else:
+        for path in found:
+            replaced = " (replaced)" if path in core.applied_file_modifications else ""
+            print(path + replaced)
+        pruned = f", {progress.dirs_pruned} skipped by prune_patterns" if progress.dirs_pruned else ""
+        print(f"{len(found)} sound(s) in {progress.dirs_scanned} folder(s) "
+              f"({progress.dirs_reused} unchanged{pruned}) in {progress.elapsed:.2f}s", file=sys.stderr)
+        for path, message in progress.errors:
+            print(f"warning: could not read {path}: {message}", file=sys.stderr)
+    return 0
+
+
+def cmd_apply(core, args):
+    target_path = os.path.abspath(args.target)
+    pairs = [(os.path.abspath(original), target_path) for original in args.originals]
+    conflicts = [original for original, _ in pairs if has_backup_conflict(original)]
+    if conflicts and not args.overwrite_backups:
+        for original in conflicts:
+            print(f"error: a backup already exists for {original}", file=sys.stderr)
+        print("Use --overwrite-backups to replace them.", file=sys.stderr)
+        return 1
+    result = core.apply(pairs, overwrite_backups=args.overwrite_backups, match_format=args.match_format)
+    core.record_apply(result) # Only records if ok, but always releases the bundle watcher's hold on these paths
+    if not result.ok:
+        print(f"error: {result.failed_path}: {result.error}; no files were changed", file=sys.stderr)
+        for action, error in result.rollback_failures:
+            print(f"error: could not undo {action}: {error}", file=sys.stderr)
+        return 1
+    print(f"Replaced {len(result.applied)} sound(s) with {target_path}")
+    return 0
+
+
+def cmd_revert(core, args):
+    if args.all:
+        records = core.records_for()
+    elif args.app:
+        records = core.records_for(os.path.abspath(args.app))
+    else:
+        records = {}
+        for original in args.originals:
+            original = os.path.abspath(original)
+            if original not in core.applied_file_modifications:
+                print(f"error: no replacement is recorded for {original}", file=sys.stderr)
+                return 1
+            records[original] = core.applied_file_modifications[original]
+    if not records:
+        print("Nothing to revert.")
+        return 0
+    report = core.revert(records)
+    core.record_revert(report)
+    if args.report:
+        report.export(args.report)
+    if args.json:
+        _print_json(report.to_dict())
+    else:
+        sys.stdout.write(report.to_text())
+    return 0 if all(entry["outcome"] != "failed" for entry in report.entries) else 1
+
+
+def cmd_verify(core, args):
+    results = core.verify(os.path.abspath(args.app) if args.app else None)
+    problems = [(path, state, detail) for path, state, detail in results if state != STATE_HEALTHY]
+    if args.json:
+        _print_json([{"original_path": path, "state": state, "detail": detail} for path, state, detail in results])
+    else:
+        for path, state, detail in problems:
+            print(f"[{state}] {path}: {detail}")
+        print(f"{len(results) - len(problems)} healthy, {len(problems)} with problems")
+    return 1 if problems else 0
+
+
+def _log_bundle_changes(outcome):
+    if outcome["reapplied"]:
+        logger.info("App update detected: re-applied %d replacement(s)", len(outcome["reapplied"]))
+    if outcome["queued"]:
+        logger.warning("App update detected: %d replacement(s) queued; run the GUI or set watch_settings.policy "
+                       "to \"reapply\" to restore them", len(outcome["queued"]))
+    if outcome["removed"]:
+        logger.warning("App update detected: %d replaced file(s) were removed by the update; they stay recorded "
+                       "and are re-applied if the files come back (the GUI can forget them)", len(outcome["removed"]))
+    for path, reason in outcome["failed"]:
+        logger.warning("Could not re-apply %s: %s", path, reason)
+
+
+def cmd_library(core, args):
+    """Lists the sound library with duration, loudness and format (analyzing new or changed files first)."""
+    paths = core.library_sound_paths()
+    if args.bundles:
+        paths += core.sound_inventory.sound_paths()
+    core.sound_metadata.update(paths)
+    entries = [{"path": path, "metadata": core.sound_metadata.get(path)} for path in paths]
+    if args.json:
+        _print_json(entries)
+        return 0
+    for entry in entries:
+        name = os.path.relpath(entry["path"], core.sounds_dir) if entry["path"].startswith(core.sounds_dir) else entry["path"]
+        print(f"{name}: {describe(entry['metadata']) or '-'}")
+    return 0
+
+
+def cmd_rules(core, args):
+    """Lists, tests, adds or removes launch_rules."""
+    if args.rules_command == "add":
+        spec = {"sound": args.sound, "cooldown_s": args.cooldown, "priority": args.priority}
+        spec.update({field: value for field, value in (("path", args.path), ("bundle_id", args.bundle_id),
+                                                       ("name", args.app_name), ("quiet_hours", args.quiet_hours))
+                     if value})
+        try:
+            LaunchRule(args.rule, spec)
+        except ValueError as e:
+            print(f"error: {e}", file=sys.stderr)
+            return 2
+        core.launch_rules[args.rule] = spec
+        core.compile_launch_rules()
+        core.save()
+        return 0
+    if args.rules_command == "remove":
+        if core.launch_rules.pop(args.rule, None) is None:
+            print(f"error: no launch rule named {args.rule!r}", file=sys.stderr)
+            return 1
+        core.compile_launch_rules()
+        core.save()
+        return 0
+    if args.rules_command == "test":
+        app_path = os.path.abspath(args.app)
+        if core.monitored_apps.get(app_path) not in (None, "", "None"):
+            print(f"monitored app: plays {core.monitored_apps[app_path]}")
+            return 0
+        rule, outcome = core.launch_rule_engine.decide(app_path, args.bundle_id, args.app_name)
+        if rule is None:
+            print("no rule matches")
+            return 1
+        held_back = f" (held back now: {outcome})" if outcome != OUTCOME_PLAY else ""
+        print(f"rule {rule.name!r}: plays {rule.sound or 'nothing'}{held_back}")
+        return 0
+    if args.json:
+        _print_json(core.launch_rules)
+        return 0
+    if not core.launch_rules:
+        print("No launch rules.")
+    for rule in core.launch_rule_engine.compiled.rules: # In the order they are tried
+        spec = core.launch_rules[rule.name]
+        print(f"{rule.name}")
+        for key in ("path", "bundle_id", "name", "sound", "cooldown_s", "quiet_hours", "priority"):
+            if spec.get(key) not in (None, "", 0):
+                print(f"    {key}: {spec[key]}")
+    disabled = [name for name, spec in core.launch_rules.items() if isinstance(spec, dict) and spec.get("enabled") is False]
+    for name in disabled:
+        print(f"{name} (disabled)")
+    return 0
+
+
+def cmd_daemon(core, args):
+    """Plays launch sounds without the GUI until SIGINT/SIGTERM. SIGHUP reloads the config."""
+    if core.start_audio_mixer() is not None:
+        player = core.play_mixed
+        player_name = "the audio mixer"
+    else:
+        player = command_player()
+        if player is None:
+            print("error: no audio mixer (needs numpy and sounddevice) and no command-line audio player found "
+                  "(afplay, paplay, aplay or ffplay)", file=sys.stderr)
+            return 1
+        player_name = player.command
+    core.start_playback(player)
+    source = None
+    if args.source == "poll":
+        from launch_events import LinuxProcLaunchSource
+        source = LinuxProcLaunchSource(use_netlink=False)
+    try:
+        core.start_monitoring(source)
+    except Exception as e:
+        print(f"error: could not start app monitoring: {e}", file=sys.stderr)
+        core.shutdown_playback()
+        return 1
+    logger.info("Daemon running with %s, playing through %s", core.launch_source.name, player_name)
+    # Changed folders are handled on this thread, like the GUI does on the Tk thread, so a re-apply
+    # never runs while a SIGHUP reload refills the same dicts
+    bundle_changes = queue.Queue()
+    try:
+        core.start_bundle_watch(bundle_changes.put)
+    except Exception as e:
+        logger.warning("Could not start the bundle watcher: %s", e)
+    try:
+        core.start_metrics_export(http_port=args.metrics_port, file_path=args.metrics_file)
+    except (OSError, ValueError) as e:
+        logger.warning("Could not start the metrics endpoint: %s", e)
+
+    stop_event = threading.Event()
+    reload_event = threading.Event()
+    signal.signal(signal.SIGINT, lambda signum, frame: stop_event.set())
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, lambda signum, frame: reload_event.set())
+    while not stop_event.is_set():
+        try:
+            changed_dirs = bundle_changes.get(timeout=1.0)
+        except queue.Empty:
+            changed_dirs = None
+        if changed_dirs is not None:
+            try:
+                _log_bundle_changes(core.handle_bundle_changes(changed_dirs))
+            except Exception as e:
+                logger.error("Could not handle changes in %s: %s", sorted(changed_dirs), e)
+        if reload_event.is_set():
+            reload_event.clear()
+            for warning in core.load_config():
+                logger.warning(warning)
+            logger.info("Config reloaded: %d monitored app(s), %d launch rule(s)", len(core.monitored_apps),
+                        len(core.launch_rule_engine.compiled))
+            core.refresh_bundle_watch()
+    core.stop_bundle_watch()
+    core.stop_monitoring()
+    core.shutdown_playback()
+    total = core.metrics.latency_summary().get("total")
+    if total:
+        logger.info("Launch-to-audio latency over %d launch(es): p50 %.1f ms, p95 %.1f ms, p99 %.1f ms",
+                    total["count"], total["p50"] * 1000, total["p95"] * 1000, total["p99"] * 1000)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="sound_replacer_cli.py", description="Sound Replacer without the GUI.")
+    parser.add_argument("--config-dir", default=".", help="folder holding app_monitor_config.json (default: current folder)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log progress to stderr")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    status = subparsers.add_parser("status", help="show monitored apps and replacement counts")
+    status.add_argument("--json", action="store_true")
+    status.set_defaults(func=cmd_status)
+
+    scan = subparsers.add_parser("scan", help="list the sound files inside an app bundle")
+    scan.add_argument("app", help="path to the .app bundle")
+    scan.add_argument("--root", help="scan this folder instead of the whole bundle")
+    scan.add_argument("--json", action="store_true")
+    scan.set_defaults(func=cmd_scan)
+
+    apply = subparsers.add_parser("apply", help="replace sound files with a symlink to a target sound")
+    apply.add_argument("target", help="sound file to link to")
+    apply.add_argument("originals", nargs="+", help="sound files inside app bundles to replace")
+    apply.add_argument("--overwrite-backups", action="store_true", help="replace existing .bak files")
+    apply.add_argument("--match-format", action="store_true", default=None,
+                       help="convert the target to each original's format first (default: transcode_settings)")
+    apply.set_defaults(func=cmd_apply)
+
+    revert = subparsers.add_parser("revert", help="restore original sounds from their backups")
+    which = revert.add_mutually_exclusive_group(required=True)
+    which.add_argument("--app", help="revert every replacement in this app")
+    which.add_argument("--all", action="store_true", help="revert every replacement in every app")
+    which.add_argument("originals", nargs="*", default=[], help="replaced sound files to revert")
+    revert.add_argument("--report", help="also write the report to this file (.json or text)")
+    revert.add_argument("--json", action="store_true")
+    revert.set_defaults(func=cmd_revert)
+
+    verify = subparsers.add_parser("verify", help="check that recorded replacements are still in place")
+    verify.add_argument("--app", help="only check this app")
+    verify.add_argument("--json", action="store_true")
+    verify.set_defaults(func=cmd_verify)
+
+    library = subparsers.add_parser("library", help="list sounds with their duration, loudness and format")
+    library.add_argument("--bundles", action="store_true", help="also list every sound found by earlier scans")
+    library.add_argument("--json", action="store_true")
+    library.set_defaults(func=cmd_library)
+
+    rules = subparsers.add_parser("rules", help="list, test, add or remove launch rules (glob/bundle id matching)")
+    rules.add_argument("--json", action="store_true")
+    rules.set_defaults(func=cmd_rules, rules_command="list")
+    rules_commands = rules.add_subparsers(dest="rules_command")
+    rules_test = rules_commands.add_parser("test", help="show which rule a launch of an app would use")
+    rules_test.add_argument("app", help="path to the .app bundle")
+    rules_test.add_argument("--bundle-id", help="bundle identifier (default: read from the bundle's Info.plist)")
+    rules_test.add_argument("--name", dest="app_name", help="app name (default: the bundle's file name)")
+    rules_add = rules_commands.add_parser("add", help="add or replace a launch rule")
+    rules_add.add_argument("rule", help="rule name")
+    rules_add.add_argument("--sound", required=True, help="sound in the sounds folder, or None to play nothing")
+    rules_add.add_argument("--path", help="app path glob, e.g. '/Applications/JetBrains/*'")
+    rules_add.add_argument("--bundle-id", help="bundle identifier glob, e.g. 'com.jetbrains.*'")
+    rules_add.add_argument("--name", dest="app_name", help="app name glob, e.g. 'Microsoft *'")
+    rules_add.add_argument("--cooldown", type=float, default=0, help="seconds before the rule plays again")
+    rules_add.add_argument("--quiet-hours", help="local times it stays silent, e.g. 22:00-07:00")
+    rules_add.add_argument("--priority", type=int, default=0, help="higher priorities are tried first")
+    rules_remove = rules_commands.add_parser("remove", help="remove a launch rule")
+    rules_remove.add_argument("rule", help="rule name")
+
+    daemon = subparsers.add_parser("daemon", help="play launch sounds in the background without the GUI")
+    daemon.add_argument("--source", choices=("auto", "poll"), default="auto",
+                        help="launch detection: platform default, or /proc polling on Linux")
+    daemon.add_argument("--metrics-port", type=int,
+                        help="serve Prometheus metrics on http://127.0.0.1:PORT/metrics (default: metrics_settings)")
+    daemon.add_argument("--metrics-file", help="rewrite this file with the metrics periodically (default: metrics_settings)")
+    daemon.set_defaults(func=cmd_daemon)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    # Records are queued and written on a listener thread: to stderr, and to log_settings' file once loaded
+    console = console_handler()
+    console.setLevel(logging.INFO if args.verbose or args.command == "daemon" else logging.WARNING)
+    pipeline = LogPipeline().install()
+    pipeline.start([console])
+    try:
+        return _run(args, pipeline, console)
+    finally:
+        pipeline.stop()
+
+
+def _run(args, pipeline, console):
+    core = SoundReplacerCore(args.config_dir)
+    for warning in core.load_config():
+        print(f"warning: {warning}", file=sys.stderr)
+    for warning in core.configure_logging(pipeline, [console]):
+        print(f"warning: {warning}", file=sys.stderr)
+    report = core.recover_journal()
+    if report["failures"]:
+        print(f"warning: {len(report['failures'])} step(s) of an interrupted operation could not be undone",
+              file=sys.stderr)
+    try:
+        return args.func(core, args)
+    finally:
+        if not core.close():
+            print(f"error: could not save the configuration: {core.config_saver.stats()['last_error']}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+"""Per-phase startup timing, printed by `python app_monitor.py --profile-startup`.
+
+Phases may overlap (the sound library is listed on a worker thread while
+the Tk thread builds tabs), so each is recorded with its start offset and
+duration rather than as a strict sequence.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StartupProfiler:
+    """Collects (phase, start offset, duration) triples relative to started (a perf_counter value)."""
+
+    def __init__(self, started=None):
+        self.started = time.perf_counter() if started is None else started
+        self.phases = []
+        self._open = {}
+        self._lock = threading.Lock()
+
+    def begin(self, phase):
+        with self._lock:
+            self._open[phase] = time.perf_counter()
+
+    def end(self, phase):
+        now = time.perf_counter()
+        with self._lock:
+            began = self._open.pop(phase, None)
+            if began is not None:
+                self.phases.append((phase, began - self.started, now - began))
+
+    def record(self, phase, began, ended=None):
+        """Records a phase measured elsewhere, from perf_counter values."""
+        ended = time.perf_counter() if ended is None else ended
+        with self._lock:
+            self.phases.append((phase, began - self.started, ended - began))
+
+    @contextmanager
+    def measure(self, phase):
+        self.begin(phase)
+        try:
+            yield
+        finally:
+            self.end(phase)
+
+    def total(self):
+        with self._lock:
+            return max((start + duration for _, start, duration in self.phases), default=0.0)
+
+    def format_report(self):
+        with self._lock:
+            phases = sorted(self.phases, key=lambda p: p[1])
+        width = max((len(name) for name, _, _ in phases), default=5)
+        lines = [f"{'phase':<{width}}  {'start ms':>9}  {'took ms':>9}"]
+        for name, start, duration in phases:
+            lines.append(f"{name:<{width}}  {start * 1000:9.1f}  {duration * 1000:9.1f}")
+        lines.append(f"{'total':<{width}}  {'':>9}  {self.total() * 1000:9.1f}")
+        return "\n".join(lines)
@@ -0,0 +1,279 @@
+"""Converts target sounds to the format of the app sound they replace.
+
+Apps often only play the container (and sometimes the sample rate and
+channel layout) they shipped with, so an .mp3 linked over a .wav may
+play nothing. TranscodeCache converts each target once per output
+format and keeps the result in a content-addressed folder:
+
+  <cache_dir>/<sha256[:2]>/<sha256>-<rate>hz-<channels>ch.<ext>
+
+keyed by the target's contents, so the same sound used in many apps (or
+renamed, or copied) is converted only once. Conversions run in parallel,
+each in its own afconvert (macOS) or ffmpeg process.
+"""
+import hashlib
+import os
+import re
+import shutil
+import struct
+import subprocess
+import sys
+import threading
+import wave
+from collections import namedtuple
+from concurrent.futures import CancelledError, ThreadPoolExecutor, as_completed
+
+from replacements import BACKUP_SUFFIX
+
+# container is one of CONTAINER_EXTENSIONS' keys; sample_rate/channels are None when unknown
+AudioFormat = namedtuple("AudioFormat", "container sample_rate channels")
+
+CONTAINER_EXTENSIONS = {"wav": ".wav", "aiff": ".aiff", "m4a": ".m4a", "mp3": ".mp3", "caf": ".caf"}
+_EXTENSION_CONTAINERS = {".wav": "wav", ".wave": "wav", ".aif": "aiff", ".aiff": "aiff", ".aifc": "aiff",
+                         ".m4a": "m4a", ".mp4": "m4a", ".aac": "m4a", ".mp3": "mp3", ".caf": "caf"}
+
+# afconvert file type and data format per container (afconvert cannot encode mp3)
+_AFCONVERT_FORMATS = {"wav": ("WAVE", "LEI16"), "aiff": ("AIFF", "BEI16"), "m4a": ("m4af", "aac"),
+                      "caf": ("caff", "LEI16")}
+_FFMPEG_CODECS = {"wav": "pcm_s16le", "aiff": "pcm_s16be", "m4a": "aac", "mp3": "libmp3lame", "caf": "pcm_s16le"}
+
+
+class TranscodeError(Exception):
+    """Raised when a sound's format cannot be read or a conversion fails."""
+
+
+def container_for(path):
+    return _EXTENSION_CONTAINERS.get(os.path.splitext(path)[1].lower())
+
+
+def _read_aiff_format(path):
+    """(sample_rate, channels) from an AIFF/AIFC COMM chunk."""
+    with open(path, "rb") as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b"FORM" or header[8:12] not in (b"AIFF", b"AIFC"):
+            raise TranscodeError(f"Not an AIFF file: {path}")
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                raise TranscodeError(f"No COMM chunk in {path}")
+            chunk_id, size = struct.unpack(">4sI", chunk)
+            if chunk_id == b"COMM":
+                channels, _frames, _bits, exponent, mantissa = struct.unpack(">hIhHQ", f.read(18))
+                # 80-bit IEEE extended sample rate
+                rate = mantissa * 2.0 ** ((exponent & 0x7FFF) - 16383 - 63) if mantissa else 0.0
+                return int(round(rate)), channels
+            f.seek(size + (size & 1), os.SEEK_CUR)
+
+
+def _probe_with_tool(path):
+    """(sample_rate, channels) from afinfo or ffprobe, or (None, None)."""
+    if sys.platform == "darwin" and shutil.which("afinfo"):
+        result = subprocess.run(["afinfo", path], capture_output=True, text=True)
+        match = re.search(r"(\d+) ch,\s+(\d+) Hz", result.stdout)
+        if match:
+            return int(match.group(2)), int(match.group(1))
+    if shutil.which("ffprobe"):
+        result = subprocess.run(["ffprobe", "-v", "error", "-select_streams", "a:0", "-show_entries",
+                                 "stream=sample_rate,channels", "-of", "csv=p=0", path], capture_output=True, text=True)
+        fields = result.stdout.strip().split(",")
+        if result.returncode == 0 and len(fields) == 2 and all(field.isdigit() for field in fields):
+            return int(fields[0]), int(fields[1])
+    return None, None
+
+
+def probe_format(path, container=None):
+    """Returns the AudioFormat of path (container defaults to the extension's).
+
+    Raises TranscodeError for containers we cannot write.
+    """
+    container = container or container_for(path)
+    if container is None:
+        raise TranscodeError(f"Unsupported sound format: {os.path.basename(path)}")
+    try:
+        if container == "wav":
+            try:
+                with wave.open(path, "rb") as wav_in:
+                    return AudioFormat(container, wav_in.getframerate(), wav_in.getnchannels())
+            except (wave.Error, EOFError):
+                pass  # Compressed WAV; ask a tool
+        elif container == "aiff":
+            try:
+                return AudioFormat(container, *_read_aiff_format(path))
+            except (TranscodeError, struct.error):
+                pass
+        return AudioFormat(container, *_probe_with_tool(path))
+    except OSError as e:
+        raise TranscodeError(f"Could not read {path}: {e}") from e
+
+
+def original_format(original_path):
+    """The format an app expects at original_path: the backup's once we have replaced it."""
+    if os.path.islink(original_path) and os.path.exists(original_path + BACKUP_SUFFIX):
+        return probe_format(original_path + BACKUP_SUFFIX, container_for(original_path))
+    return probe_format(original_path)
+
+
+def satisfies(source, wanted):
+    """True if a sound in format source can be linked where wanted is expected, as is."""
+    return (source.container == wanted.container
+            and (wanted.sample_rate is None or source.sample_rate == wanted.sample_rate)
+            and (wanted.channels is None or source.channels == wanted.channels))
+
+
+def converter_command(source_path, dest_path, fmt):
+    """The command converting source_path to fmt at dest_path. Raises TranscodeError if no tool can."""
+    if sys.platform == "darwin" and fmt.container in _AFCONVERT_FORMATS and shutil.which("afconvert"):
+        file_type, data_format = _AFCONVERT_FORMATS[fmt.container]
+        if fmt.sample_rate:
+            data_format += f"@{fmt.sample_rate}"
+        command = ["afconvert", "-f", file_type, "-d", data_format]
+        if fmt.channels:
+            command += ["-c", str(fmt.channels)]
+        return command + [source_path, dest_path]
+    if shutil.which("ffmpeg"):
+        command = ["ffmpeg", "-v", "error", "-y", "-i", source_path, "-vn"]
+        if fmt.sample_rate:
+            command += ["-ar", str(fmt.sample_rate)]
+        if fmt.channels:
+            command += ["-ac", str(fmt.channels)]
+        return command + ["-acodec", _FFMPEG_CODECS[fmt.container], dest_path]
+    raise TranscodeError(f"No converter available for {fmt.container} (need afconvert or ffmpeg)")
+
+
+def transcode(source_path, dest_path, fmt):
+    """Converts source_path into dest_path, which only appears once it is complete."""
+    folder, name = os.path.split(dest_path)
+    os.makedirs(folder, exist_ok=True)
+    # Keep the extension: converters pick the output container from it
+    temp_path = os.path.join(folder, f".partial-{os.getpid()}-{threading.get_ident()}-{name}")
+    try:
+        result = subprocess.run(converter_command(source_path, temp_path, fmt), capture_output=True)
+        if result.returncode != 0:
+            raise TranscodeError(f"Converting {os.path.basename(source_path)} failed: "
+                                 f"{result.stderr.decode(errors='replace').strip()}")
+        os.replace(temp_path, dest_path)
+    except OSError as e:
+        raise TranscodeError(f"Converting {os.path.basename(source_path)} failed: {e}") from e
+    finally:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+    return dest_path
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class TranscodeCache:
+    """Content-addressed store of converted sounds. See the module docstring.
+
+    workers caps how many converter processes run at once (0 for one per
+    CPU). Entries are never evicted automatically: replacements link to
+    them, so deleting the folder breaks those links.
+    """
+
+    def __init__(self, cache_dir, workers=0):
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self._digests = {}  # {abs_path: ((size, mtime_ns), sha256)}
+        self._lock = threading.Lock()
+        self.conversions = 0
+        self.reused = 0
+
+    def _digest(self, path):
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        stat_key = (st.st_size, st.st_mtime_ns)
+        with self._lock:
+            cached = self._digests.get(path)
+        if cached is not None and cached[0] == stat_key:
+            return cached[1]
+        digest = file_digest(path)
+        with self._lock:
+            self._digests[path] = (stat_key, digest)
+        return digest
+
+    def cached_path(self, digest, fmt):
+        tag = f"{fmt.sample_rate or 'src'}hz-{fmt.channels or 'src'}ch"
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}-{tag}{CONTAINER_EXTENSIONS[fmt.container]}")
+
+    def is_cached(self, path):
+        """True if path is a file this cache produced (a replacement already linked to a conversion)."""
+        return os.path.abspath(path).startswith(os.path.abspath(self.cache_dir) + os.sep)
+
+    def prepare(self, pairs, progress=None, cancel_event=None):
+        """Converts each target in [(original_path, target_path)] to its original's format where needed.
+
+        Returns (pairs, errors): the pairs with targets swapped for
+        converted copies, and {original_path: message} for pairs that could
+        not be prepared. Targets that already fit are left alone; each
+        (target contents, format) is converted at most once.
+        progress(done, total, converted_path) is called from the calling thread as conversions finish.
+        """
+        prepared = []
+        errors = {}
+        jobs = {}  # {dest_path: (source_path, fmt)}
+        for original_path, target_path in pairs:
+            try:
+                wanted = original_format(original_path)
+                if self.is_cached(target_path) or satisfies(probe_format(target_path), wanted):
+                    prepared.append((original_path, target_path))
+                    continue
+                dest_path = self.cached_path(self._digest(target_path), wanted)
+            except (OSError, TranscodeError) as e:
+                errors[original_path] = str(e)
+                continue
+            if os.path.exists(dest_path):
+                self.reused += 1
+            else:
+                jobs.setdefault(dest_path, (target_path, wanted))
+            prepared.append((original_path, dest_path))
+
+        failed = {}
+        total = len(jobs)
+        if jobs:
+            workers = self.workers or os.cpu_count() or 2
+            # Threads suffice: each one waits on its own converter process, which does the work
+            with ThreadPoolExecutor(max_workers=min(workers, total), thread_name_prefix="transcode") as pool:
+                futures = {pool.submit(self._transcode_unless_cancelled, source_path, dest_path, fmt, cancel_event):
+                           dest_path for dest_path, (source_path, fmt) in jobs.items()}
+                cancelled = False
+                for done, future in enumerate(as_completed(futures), start=1):
+                    if not cancelled and cancel_event is not None and cancel_event.is_set():
+                        cancelled = True
+                        for pending in futures:
+                            pending.cancel()  # No-op for jobs already running or finished
+                    dest_path = futures[future]
+                    try:
+                        future.result()
+                        self.conversions += 1
+                    except CancelledError:
+                        failed[dest_path] = "cancelled"
+                    except TranscodeError as e:
+                        failed[dest_path] = str(e)
+                    if progress is not None:
+                        progress(done, total, dest_path)
+
+        result = []
+        for original_path, target_path in prepared:
+            if target_path in failed:
+                errors[original_path] = failed[target_path]
+            else:
+                result.append((original_path, target_path))
+        return result, errors
+
+    @staticmethod
+    def _transcode_unless_cancelled(source_path, dest_path, fmt, cancel_event):
+        # Checked again on the worker: cancel() cannot stop a job the pool has already dequeued
+        if cancel_event is not None and cancel_event.is_set():
+            raise CancelledError()
+        return transcode(source_path, dest_path, fmt)
+
+    def stats(self):
+        return {"conversions": self.conversions, "reused": self.reused}